@@ -1,10 +1,17 @@
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.urls import path
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from .models import (
     Profile, Skill, Project, Experience, Education,
-    Category, Tag, BlogPost, Comment, ContactMessage
+    Category, Tag, BlogPost, Comment, ContactMessage, Job, ArchivedBatch,
+    MediaDownload
 )
+from . import archive, caching, exports, surrogates, typeahead
 
 # Register your models here.
 
@@ -176,20 +183,86 @@ class BlogPostAdmin(admin.ModelAdmin):
     image_preview.short_description = 'Image'
     
     # Actions personnalisées
+    # update() n'émet pas de signaux : archives et caches mis à jour ici
+    def change_status(self, queryset, status):
+        rows = list(queryset.values_list('pk', 'slug', 'category__slug'))
+        posts = {pk: slug for pk, slug, _ in rows}
+        before = archive.counts(posts)
+        if status == 'published':
+            queryset.filter(published_date__isnull=True).update(published_date=timezone.now())
+        queryset.update(status=status)
+        archive.apply_counts(before, archive.counts(posts))
+        caching.invalidate('home', 'blog:sidebar', *(f'blog_detail:{slug}' for slug in posts.values()))
+        typeahead.refresh(BlogPost, posts)
+        # Listes, catégories et tags où les articles entrent ou d'où ils sortent
+        tags = BlogPost.tags.through.objects.filter(blogpost_id__in=posts).values_list('tag__slug', flat=True)
+        surrogates.purge(
+            'posts', *(f'post-{pk}' for pk in posts), *(f'category-{slug}' for _, _, slug in rows if slug),
+            *(f'tag-{slug}' for slug in tags),
+        )
+    
     def make_published(self, request, queryset):
-        queryset.update(status='published')
+        self.change_status(queryset, 'published')
     make_published.short_description = "Marquer comme publié"
     
     def make_draft(self, request, queryset):
-        queryset.update(status='draft')
+        self.change_status(queryset, 'draft')
     make_draft.short_description = "Marquer comme brouillon"
     
     actions = ['make_published', 'make_draft']
 
+class StreamingExportMixin:
+    """Export CSV/JSONL en flux : actions sur la sélection, et page export/
+    qui reprend les filtres, la recherche et le tri de la liste.
+
+    Un export occupe son worker jusqu'au dernier octet. Avec le worker sync
+    de gunicorn, l'arbitre le tue au-delà de GUNICORN_TIMEOUT (30 s) même
+    si les octets partent : servir l'admin avec GUNICORN_WORKER_CLASS=gthread
+    (le worker signale sa vie pendant l'envoi), ou, en sync, porter
+    GUNICORN_TIMEOUT au-delà de la durée du plus gros export."""
+    export_fields = ()
+    export_chunk_size = 2000
+    change_list_template = 'admin/folio/export_change_list.html'
+    
+    def get_urls(self):
+        name = f'{self.opts.app_label}_{self.opts.model_name}_export'
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view), name=name),
+        ] + super().get_urls()
+    
+    def export(self, queryset, fmt, gzip=False):
+        return exports.export_response(
+            queryset, self.export_fields, fmt, name=self.opts.model_name,
+            gzip=gzip, chunk_size=self.export_chunk_size,
+        )
+    
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        fmt = request.GET.get('format')
+        gzip = request.GET.get('gzip') == '1'
+        # Le reste de la query string est celle de la liste filtrée
+        request.GET = request.GET.copy()
+        for key in ('format', 'gzip'):
+            request.GET.pop(key, None)
+        try:
+            changelist = self.get_changelist_instance(request)
+        except IncorrectLookupParameters:
+            return redirect(f'admin:{self.opts.app_label}_{self.opts.model_name}_changelist')
+        return self.export(changelist.get_queryset(request), fmt if fmt in exports.FORMATS else 'csv', gzip)
+    
+    def export_csv(self, request, queryset):
+        return self.export(queryset, 'csv')
+    export_csv.short_description = "Exporter en CSV"
+    
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, 'jsonl')
+    export_jsonl.short_description = "Exporter en JSONL"
+
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ['name', 'post', 'created_date', 'active', 'is_reply']
-    list_filter = ['active', 'created_date', 'post']
+class CommentAdmin(StreamingExportMixin, admin.ModelAdmin):
+    list_display = ['name', 'post', 'created_date', 'active', 'rejected', 'is_reply']
+    list_filter = ['active', 'rejected', 'created_date', 'post']
     search_fields = ['name', 'email', 'content']
     date_hierarchy = 'created_date'
     ordering = ['-created_date']
@@ -199,7 +272,7 @@ class CommentAdmin(admin.ModelAdmin):
             'fields': ('post', 'name', 'email', 'content', 'parent')
         }),
         ('Modération', {
-            'fields': ('active',)
+            'fields': ('active', 'rejected')
         }),
     )
     
@@ -208,25 +281,36 @@ class CommentAdmin(admin.ModelAdmin):
     is_reply.boolean = True
     is_reply.short_description = 'Réponse'
     
+    export_fields = ['id', 'post__slug', 'post__title', 'parent_id', 'name', 'email',
+                     'content', 'created_date', 'active', 'rejected']
+    
     # Actions personnalisées
+    # update() n'émet pas de signaux : pages des articles purgées ici
+    def moderate(self, queryset, **fields):
+        posts = set(queryset.values_list('post_id', flat=True))
+        queryset.update(**fields)
+        surrogates.purge('comments', *(f'post-{pk}' for pk in posts))
+    
     def make_active(self, request, queryset):
-        queryset.update(active=True)
+        self.moderate(queryset, active=True, rejected=False)
     make_active.short_description = "Activer les commentaires"
     
+    # Rejetés : supprimés par la rétention (politique comments)
     def make_inactive(self, request, queryset):
-        queryset.update(active=False)
-    make_inactive.short_description = "Désactiver les commentaires"
+        self.moderate(queryset, active=False, rejected=True)
+    make_inactive.short_description = "Rejeter les commentaires"
     
-    actions = ['make_active', 'make_inactive']
+    actions = ['make_active', 'make_inactive', 'export_csv', 'export_jsonl']
 
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
+class ContactMessageAdmin(StreamingExportMixin, admin.ModelAdmin):
     list_display = ['name', 'subject', 'email', 'created_date', 'read', 'message_preview']
     list_filter = ['read', 'created_date']
     search_fields = ['name', 'email', 'subject', 'message']
     date_hierarchy = 'created_date'
     ordering = ['-created_date']
     readonly_fields = ['name', 'email', 'subject', 'message', 'created_date']
+    export_fields = ['id', 'name', 'email', 'subject', 'message', 'created_date', 'read']
     
     fieldsets = (
         ('Expéditeur', {
@@ -258,7 +342,46 @@ class ContactMessageAdmin(admin.ModelAdmin):
         queryset.update(read=False)
     mark_as_unread.short_description = "Marquer comme non lu"
     
-    actions = ['mark_as_read', 'mark_as_unread']
+    actions = ['mark_as_read', 'mark_as_unread', 'export_csv', 'export_jsonl']
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'status', 'attempts', 'run_at', 'locked_until', 'created_date', 'finished_date']
+    list_filter = ['status', 'kind']
+    date_hierarchy = 'created_date'
+    ordering = ['-created_date']
+    readonly_fields = ['last_error']
+    
+    # Actions personnalisées
+    def retry(self, request, queryset):
+        queryset.update(status='pending', run_at=timezone.now(), locked_until=None)
+    retry.short_description = "Relancer les tâches"
+    
+    actions = ['retry']
+
+@admin.register(ArchivedBatch)
+class ArchivedBatchAdmin(admin.ModelAdmin):
+    list_display = ['policy', 'model', 'count', 'first_id', 'last_id', 'created_date']
+    list_filter = ['policy']
+    date_hierarchy = 'created_date'
+    exclude = ['data']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(MediaDownload)
+class MediaDownloadAdmin(admin.ModelAdmin):
+    list_display = ['name', 'count', 'last_download']
+    search_fields = ['name']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
 
 # Configuration du dashboard
 class PortfolioAdminSite(admin.AdminSite):
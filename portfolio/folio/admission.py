@@ -0,0 +1,265 @@
+"""
+Contrôle d'admission : délester tôt plutôt que laisser la file s'allonger.
+
+- délai d'attente (mécanisme principal, seul actif avec le worker sync de
+  gunicorn, qui ne sert qu'une requête à la fois et n'a donc pas de file
+  à lui) : une requête déjà restée plus de `timeout` secondes dans la file
+  du proxy ou le backlog de gunicorn est rejetée sans être traitée, le
+  client a probablement abandonné. nginx doit poser l'heure d'arrivée :
+
+      proxy_set_header X-Request-Start "t=${msec}";
+
+- chaque requête reçoit une classe de route (search, detail, list, admin,
+  contact, other) : recherche du blog et pagination profonde comptent comme
+  search, la plus coûteuse ;
+- avec gthread, par classe et par worker, un nombre de requêtes
+  simultanées ; au-delà, une file d'attente bornée par les threads que la
+  limite laisse libres (FOLIO_ADMISSION_THREADS - limite : une requête en
+  attente garde son thread), le délai compris. File pleine ou délai
+  dépassé : 503 et Retry-After ;
+- les requêtes servies par le cache (visiteur anonyme, sans paramètre)
+  passent en tête de file ;
+- limite adaptative (AIMD) : la latence observée au-dessus de la cible de
+  la classe réduit la limite d'un quart, une latence sous la cible avec
+  des requêtes en attente l'augmente d'un, entre min_limit et max_limit ;
+- limite partagée optionnelle entre workers (FOLIO_ADMISSION_SHARED) :
+  jetons posés par cache.add(), qui expirent seuls si un worker meurt.
+
+Configuration : FOLIO_ADMISSION ({classe: options}), voir settings.py.
+"""
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger('folio')
+
+PREFIX = 'folio:admission:'
+DEFAULTS = {
+    'limit': 4,  # requêtes simultanées au départ
+    'min_limit': 1,
+    'max_limit': 8,
+    'queue': None,  # requêtes en attente au plus ; None : threads moins la limite
+    'timeout': 1.0,  # attente maximale (s), dans la file de gunicorn comprise
+    'target': 0.5,  # latence visée (s) pour la limite adaptative
+}
+CONFIG = getattr(settings, 'FOLIO_ADMISSION', {})
+# Threads d'un worker : GUNICORN_THREADS avec gthread, 1 avec sync
+THREADS = getattr(settings, 'FOLIO_ADMISSION_THREADS', 1)
+SHARED = getattr(settings, 'FOLIO_ADMISSION_SHARED', {})
+# Durée de vie d'un jeton partagé : au plus la durée d'une requête (timeout gunicorn)
+SHARED_TTL = getattr(settings, 'FOLIO_ADMISSION_SHARED_TTL', 30)
+RETRY_AFTER = getattr(settings, 'FOLIO_ADMISSION_RETRY_AFTER', 5)
+# Page à partir de laquelle une liste est traitée comme une recherche
+DEEP_PAGE = getattr(settings, 'FOLIO_ADMISSION_DEEP_PAGE', 10)
+# Mesures entre deux ajustements de la limite
+WINDOW = 20
+
+ROUTES = {
+    'blog_detail': 'detail',
+    'project_detail': 'detail',
+    'api_detail': 'detail',
+    'home': 'list',
+    'about': 'list',
+    'portfolio': 'list',
+    'blog': 'list',
+    'blog_category': 'list',
+    'blog_tag': 'list',
+    'blog_archive_year': 'list',
+    'blog_archive_month': 'list',
+    'api_list': 'list',
+    'search_suggest': 'search',
+    'contact': 'contact',
+    'csrf_token': 'contact',
+    'add_comment': 'contact',
+}
+
+
+def route_class(request):
+    if request.path_info.startswith('/admin/'):
+        return 'admin'
+    try:
+        name = resolve(request.path_info).url_name
+    except Resolver404:
+        return 'other'
+    kind = ROUTES.get(name, 'other')
+    if kind == 'list':
+        page = request.GET.get('page', '')
+        if request.GET.get('search') or request.GET.get('q') or (page.isdigit() and int(page) >= DEEP_PAGE):
+            return 'search'
+    return kind
+
+
+def cache_servable(request):
+    """Visiteur anonyme sans paramètre : page servie par le cache de données"""
+    return getattr(request, 'folio_public', False) and not request.GET
+
+
+class Limiter:
+    """Sémaphore à limite variable, file bornée à deux priorités"""
+
+    def __init__(self, name, limit=4, min_limit=1, max_limit=8, queue=None, timeout=1.0, target=0.5,
+                 threads=THREADS):
+        self.name = name
+        self.limit, self.min_limit, self.max_limit = limit, min_limit, max_limit
+        self.queue, self.timeout, self.target = queue, timeout, target
+        self.threads = threads
+        self.active = 0
+        self.lock = threading.Lock()
+        # Événements des requêtes en attente : prioritaires, puis les autres
+        self.waiters = (deque(), deque())
+        self.samples = []
+        self.stats = Counter()
+
+    def waiting(self):
+        return len(self.waiters[0]) + len(self.waiters[1])
+
+    def capacity(self):
+        """Places en file : les threads que la limite courante laisse libres"""
+        if self.queue is not None:
+            return self.queue
+        return max(0, self.threads - self.limit)
+
+    def acquire(self, priority=False, timeout=None):
+        """True si la requête peut passer, après au plus timeout secondes"""
+        with self.lock:
+            if self.active < self.limit and not self.waiting():
+                self.active += 1
+                return True
+            if self.waiting() >= self.capacity() or not timeout or timeout <= 0:
+                self.stats['rejected'] += 1
+                return False
+            event = threading.Event()
+            self.waiters[0 if priority else 1].append(event)
+            self.stats['queued'] += 1
+        if event.wait(timeout):
+            return True
+        with self.lock:
+            try:
+                self.waiters[0 if priority else 1].remove(event)
+            except ValueError:
+                # Place cédée entre l'expiration et le verrou
+                return True
+            self.stats['timeouts'] += 1
+            return False
+
+    def wake(self):
+        """Cède les places libres aux requêtes en attente ; verrou tenu"""
+        for waiters in self.waiters:
+            while waiters and self.active < self.limit:
+                self.active += 1
+                waiters.popleft().set()
+
+    def release(self, latency=None):
+        with self.lock:
+            self.active -= 1
+            if latency is not None:
+                self.samples.append(latency)
+                if len(self.samples) >= WINDOW:
+                    self.adapt()
+            self.wake()
+
+    def adapt(self):
+        """AIMD sur la latence médiane de la fenêtre ; verrou tenu"""
+        median = sorted(self.samples)[len(self.samples) // 2]
+        self.samples = []
+        if median > self.target:
+            limit = max(self.min_limit, int(self.limit * 0.75))
+            if limit < self.limit:
+                logger.warning("Admission : %s à %.0f ms, limite %d -> %d",
+                               self.name, median * 1000, self.limit, limit)
+            self.limit = limit
+        elif self.waiting() and self.limit < self.max_limit:
+            self.limit += 1
+
+
+class SharedSlots:
+    """Limite entre workers : un jeton par place, posé dans le cache"""
+
+    def __init__(self, name, size):
+        self.keys = [f'{PREFIX}{name}:{i}' for i in range(size)]
+
+    def acquire(self):
+        token = uuid.uuid4().hex
+        start = random.randrange(len(self.keys))
+        for key in self.keys[start:] + self.keys[:start]:
+            if cache.add(key, token, SHARED_TTL):
+                return key, token
+        return None
+
+    def release(self, slot):
+        key, token = slot
+        # Un jeton expiré a pu être repris par un autre worker
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+LIMITERS = {name: Limiter(name, **{**DEFAULTS, **options}) for name, options in CONFIG.items()}
+SHARED_SLOTS = {name: SharedSlots(name, size) for name, size in SHARED.items()}
+
+
+def queued_for(request):
+    """Temps passé dans les files en amont, d'après X-Request-Start (t=secondes, ms ou µs)"""
+    match = re.search(r'(\d+(?:\.\d+)?)', request.headers.get('X-Request-Start', ''))
+    if not match:
+        return 0
+    start = float(match.group(1))
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    return max(0, time.time() - start)
+
+
+def overloaded():
+    response = HttpResponse("Service momentanément surchargé, réessayez dans quelques secondes.\n",
+                            status=503, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(RETRY_AFTER)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def admit(request, get_response):
+    kind = route_class(request)
+    limiter = LIMITERS.get(kind)
+    if limiter is None:
+        return get_response(request)
+    remaining = limiter.timeout - queued_for(request)
+    if remaining <= 0:
+        # Délai déjà épuisé en amont : seul délestage possible en worker sync
+        limiter.stats['expired'] += 1
+        return overloaded()
+    if not limiter.acquire(priority=cache_servable(request), timeout=remaining):
+        return overloaded()
+    slot = None
+    shared = SHARED_SLOTS.get(kind)
+    if shared is not None:
+        slot = shared.acquire()
+        if slot is None:
+            limiter.release()
+            limiter.stats['shared_rejected'] += 1
+            return overloaded()
+    start = time.perf_counter()
+    try:
+        return get_response(request)
+    finally:
+        limiter.release(time.perf_counter() - start)
+        if slot is not None:
+            shared.release(slot)
+
+
+def stats():
+    """État de chaque classe dans ce worker"""
+    return {
+        name: {'limit': limiter.limit, 'active': limiter.active, 'waiting': limiter.waiting(),
+               **limiter.stats}
+        for name, limiter in LIMITERS.items()
+    }
@@ -0,0 +1,321 @@
+"""
+API JSON en lecture seule : portfolio, parcours et blog.
+
+Les lignes sont lues avec values_list(), sans instancier de modèles, et
+encodées par orjson s'il est installé (json de la stdlib sinon).
+
+Paramètres communs des listes :
+- ?fields=title,slug   champs partiels (id toujours inclus) ;
+- ?limit=50            taille de page (500 au plus) ;
+- ?cursor=...          pagination par clé, renvoyée dans « next » ;
+- filtres propres à chaque ressource (?category=, ?tag=, ?featured=1...).
+
+Chaque réponse porte un ETag ; If-None-Match donne un 304.
+"""
+import base64
+import hashlib
+import json
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+from . import surrogates
+from .models import BlogPost, Category, Comment, Education, Experience, Project, Skill, Tag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+MAX_AGE = 60
+
+
+class ApiError(Exception):
+    pass
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_UTC_Z)
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def media_url(path):
+    return default_storage.url(path) if path else None
+
+
+def truthy(value):
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def encode_cursor(key):
+    data = json.dumps(key, separators=(',', ':'), default=lambda v: v.isoformat()).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        key = None
+    if not isinstance(key, list):
+        raise ApiError("Curseur invalide")
+    return key
+
+
+class Resource:
+    """Description d'une ressource exposée.
+
+    fields : nom public -> lookup ORM, ou (lookup, transformation)
+    m2m : nom public -> (table intermédiaire, colonne du propriétaire, lookup de la valeur)
+    ordering : clé de pagination, terminée par une colonne unique
+    """
+
+    def __init__(self, queryset, fields, m2m=None, exclude_default=(), ordering=('-id',),
+                 filters=None, lookup='pk'):
+        self.queryset = queryset
+        self.fields = {'id': 'id', **fields}
+        self.m2m = m2m or {}
+        self.default = [name for name in [*self.fields, *self.m2m] if name not in exclude_default]
+        self.ordering = ordering
+        self.filters = filters or {}
+        self.lookup = lookup
+
+    def get_queryset(self):
+        return self.queryset()
+
+    def select(self, requested):
+        if not requested:
+            return self.default
+        names = ['id']
+        for name in requested.split(','):
+            name = name.strip()
+            if name not in self.fields and name not in self.m2m:
+                raise ApiError(f"Champ inconnu : {name}")
+            if name not in names:
+                names.append(name)
+        return names
+
+    def filter(self, queryset, params):
+        for param, (lookup, convert) in self.filters.items():
+            if param in params:
+                queryset = queryset.filter(**{lookup: convert(params[param])})
+        return queryset
+
+    def after(self, key):
+        """Lignes strictement après la clé, dans l'ordre de pagination"""
+        if len(key) != len(self.ordering):
+            raise ApiError("Curseur invalide")
+        condition, equal = Q(), {}
+        for field, value in zip(self.ordering, key):
+            name = field.lstrip('-')
+            operator = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{operator}': value})
+            equal[name] = value
+        return condition
+
+    def rows(self, queryset, names, with_key=False):
+        """Dictionnaires prêts à encoder, et la clé de pagination de chaque ligne"""
+        columns = [name for name in names if name in self.fields]
+        lookups = []
+        transforms = {}
+        for name in columns:
+            spec = self.fields[name]
+            if isinstance(spec, tuple):
+                spec, transforms[name] = spec
+            lookups.append(spec)
+        key_lookups = [field.lstrip('-') for field in self.ordering] if with_key else []
+
+        rows, keys = [], []
+        width = len(lookups)
+        for values in queryset.values_list(*lookups, *key_lookups):
+            rows.append(dict(zip(columns, values[:width])))
+            keys.append(values[width:])
+        for name, transform in transforms.items():
+            for row in rows:
+                row[name] = transform(row[name])
+
+        # Une requête par relation multiple, sur la table intermédiaire
+        for name in names:
+            if name not in self.m2m:
+                continue
+            through, owner, value = self.m2m[name]
+            groups = defaultdict(list)
+            ids = [row['id'] for row in rows]
+            for owner_id, item in through.objects.filter(**{f'{owner}__in': ids}).values_list(owner, value):
+                groups[owner_id].append(item)
+            for row in rows:
+                row[name] = groups.get(row['id'], [])
+        return rows, keys
+
+
+RESOURCES = {
+    'projects': Resource(
+        lambda: Project.objects.all(),
+        fields={
+            'title': 'title',
+            'short_description': 'short_description',
+            'description': 'description',
+            'image': ('image', media_url),
+            'github_url': 'github_url',
+            'live_url': 'live_url',
+            'featured': 'featured',
+            'created_date': 'created_date',
+        },
+        m2m={'technologies': (Project.technologies.through, 'project_id', 'skill__name')},
+        exclude_default=('description',),
+        ordering=('order', '-created_date', '-id'),
+        filters={
+            'featured': ('featured', truthy),
+            'tech': ('technologies__name__iexact', str),
+        },
+    ),
+    'skills': Resource(
+        lambda: Skill.objects.all(),
+        fields={'name': 'name', 'level': 'level', 'category': 'category', 'icon': 'icon'},
+        ordering=('category', '-level', 'id'),
+        filters={'category': ('category', str)},
+    ),
+    'experiences': Resource(
+        lambda: Experience.objects.all(),
+        fields={
+            'company': 'company',
+            'position': 'position',
+            'description': 'description',
+            'start_date': 'start_date',
+            'end_date': 'end_date',
+            'current': 'current',
+            'location': 'location',
+        },
+        ordering=('-start_date', '-id'),
+    ),
+    'education': Resource(
+        lambda: Education.objects.all(),
+        fields={
+            'institution': 'institution',
+            'degree': 'degree',
+            'field': 'field',
+            'start_date': 'start_date',
+            'end_date': 'end_date',
+            'current': 'current',
+            'description': 'description',
+        },
+        ordering=('-start_date', '-id'),
+    ),
+    'posts': Resource(
+        lambda: BlogPost.objects.filter(status='published'),
+        fields={
+            'title': 'title',
+            'slug': 'slug',
+            'excerpt': 'excerpt',
+            'content': 'content',
+            'featured_image': ('featured_image', media_url),
+            'category': 'category__slug',
+            'author': 'author__username',
+            'featured': 'featured',
+            'published_date': 'published_date',
+            'updated_date': 'updated_date',
+            'views': 'views',
+        },
+        m2m={'tags': (BlogPost.tags.through, 'blogpost_id', 'tag__slug')},
+        exclude_default=('content',),
+        ordering=('-published_date', '-id'),
+        filters={
+            'category': ('category__slug', str),
+            'tag': ('tags__slug', str),
+            'featured': ('featured', truthy),
+        },
+        lookup='slug',
+    ),
+    'categories': Resource(
+        lambda: Category.objects.all(),
+        fields={'name': 'name', 'slug': 'slug', 'description': 'description', 'color': 'color'},
+        ordering=('name', 'id'),
+        lookup='slug',
+    ),
+    'tags': Resource(
+        lambda: Tag.objects.all(),
+        fields={'name': 'name', 'slug': 'slug'},
+        ordering=('name', 'id'),
+        lookup='slug',
+    ),
+    # Commentaires approuvés d'articles publiés ; jamais l'adresse e-mail
+    'comments': Resource(
+        lambda: Comment.objects.filter(active=True, post__status='published'),
+        fields={
+            'post': 'post__slug',
+            'parent': 'parent_id',
+            'name': 'name',
+            'content': 'content',
+            'created_date': 'created_date',
+        },
+        ordering=('-created_date', '-id'),
+        filters={'post': ('post__slug', str)},
+    ),
+}
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise Http404("Ressource inconnue")
+
+
+def json_response(request, data):
+    body = dumps(data)
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+@require_safe
+def resource_list(request, resource):
+    """Liste paginée par curseur"""
+    spec = get_resource(resource)
+    try:
+        names = spec.select(request.GET.get('fields'))
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            raise ApiError("limit doit être un entier")
+        queryset = spec.filter(spec.get_queryset(), request.GET).order_by(*spec.ordering)
+        if request.GET.get('cursor'):
+            queryset = queryset.filter(spec.after(decode_cursor(request.GET['cursor'])))
+        rows, keys = spec.rows(queryset[:limit + 1], names, with_key=True)
+    except (ApiError, ValueError, ValidationError) as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        params = request.GET.copy()
+        params['cursor'] = encode_cursor(list(keys[limit - 1]))
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    surrogates.add(request, *surrogates.row_keys(resource, [row['id'] for row in rows]))
+    return json_response(request, {'results': rows, 'next': next_url})
+
+
+@require_safe
+def resource_detail(request, resource, key):
+    spec = get_resource(resource)
+    try:
+        names = spec.select(request.GET.get('fields'))
+        if spec.lookup == 'pk' and not key.isdigit():
+            raise Http404
+        rows, _ = spec.rows(spec.get_queryset().filter(**{spec.lookup: key}), names)
+    except ApiError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    if not rows:
+        raise Http404
+    surrogates.add(request, *surrogates.row_keys(resource, [rows[0]['id']]))
+    return json_response(request, rows[0])
@@ -0,0 +1,102 @@
+"""
+Archives du blog : nombre d'articles publiés par mois (modèle ArchiveMonth).
+
+Les compteurs sont tenus à jour par les signaux de BlogPost (voir
+folio/signals.py) : le mois d'origine est lu en pre_save, le nouveau est
+appliqué en post_save, la suppression décrémente. Le widget des archives ne
+fait donc jamais de GROUP BY sur les articles ; les pages d'archives filtrent
+par intervalle sur published_date (index status + published_date).
+
+Les écritures qui contournent les signaux doivent appliquer la différence
+elles-mêmes (counts() avant et après un update(), voir l'admin) ou appeler
+rebuild() (bulk_create de l'import).
+"""
+import datetime
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ArchiveMonth, BlogPost
+
+
+def month_of(status, published_date):
+    """(année, mois) dans le fuseau du site, ou None si l'article n'est pas publié"""
+    if status != 'published' or published_date is None:
+        return None
+    local = timezone.localtime(published_date)
+    return local.year, local.month
+
+
+def adjust(key, delta):
+    if key is None or not delta:
+        return
+    year, month = key
+    with transaction.atomic():
+        rows = ArchiveMonth.objects.filter(year=year, month=month)
+        if rows.update(count=F('count') + delta):
+            if delta < 0:
+                rows.filter(count__lte=0).delete()
+            return
+        if delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                ArchiveMonth.objects.create(year=year, month=month, count=delta)
+        except IntegrityError:
+            # Créé entre-temps par une autre requête
+            rows.update(count=F('count') + delta)
+
+
+def move(old, new):
+    if old != new:
+        adjust(old, -1)
+        adjust(new, 1)
+
+
+def counts(pks):
+    """Articles publiés par mois parmi `pks`"""
+    rows = BlogPost.objects.filter(pk__in=pks).values_list('status', 'published_date')
+    return Counter(key for key in (month_of(*row) for row in rows) if key)
+
+
+def apply_counts(before, after):
+    for key in before.keys() | after.keys():
+        adjust(key, after[key] - before[key])
+
+
+def rebuild():
+    """Recalcule tous les compteurs ; renvoie le nombre de mois"""
+    dates = (
+        BlogPost.objects.filter(status='published', published_date__isnull=False)
+        .values_list('published_date', flat=True).iterator()
+    )
+    counts = Counter(month_of('published', date) for date in dates)
+    with transaction.atomic():
+        ArchiveMonth.objects.all().delete()
+        ArchiveMonth.objects.bulk_create([
+            ArchiveMonth(year=year, month=month, count=count)
+            for (year, month), count in counts.items()
+        ])
+    return len(counts)
+
+
+def month_range(year, month=None):
+    """Bornes [début, fin) de l'année ou du mois, dans le fuseau du site"""
+    start = datetime.datetime(year, month or 1, 1)
+    if month is None:
+        end = start.replace(year=year + 1)
+    elif month == 12:
+        end = start.replace(year=year + 1, month=1)
+    else:
+        end = start.replace(month=month + 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def years():
+    """[(année, total, [mois...]), ...] du plus récent au plus ancien"""
+    grouped = {}
+    for row in ArchiveMonth.objects.filter(count__gt=0):
+        grouped.setdefault(row.year, []).append(row)
+    return [(year, sum(row.count for row in months), months) for year, months in grouped.items()]
@@ -0,0 +1,210 @@
+"""
+Build des assets statiques hors ligne (voir `manage.py build_assets`).
+
+- Font Awesome et Inter auto-hébergés, réduits aux icônes et caractères
+  réellement utilisés par les templates ;
+- CSS critique par template de page, inliné dans <head>, la feuille
+  complète étant chargée en asynchrone.
+
+Les fichiers sont écrits dans static/build/ puis fingerprintés et
+pré-compressés par collectstatic (CompressedManifestStaticFilesStorage).
+Tant que le build n'a pas été lancé, les templates gardent les liens CDN.
+"""
+import json
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+BUILD_DIR = 'build'
+MANIFEST = f'{BUILD_DIR}/assets.json'
+
+FONT_AWESOME_CDN = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css'
+GOOGLE_FONTS_CSS = 'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap'
+
+
+# --- Analyse CSS minimale (règles imbriquées, at-rules, chaînes) ----------
+
+def parse_css(css):
+    """Arbre de nœuds : ('stmt', texte) ou ('rule', prélude, enfants)"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    nodes, _ = _parse_block(css, 0)
+    return nodes
+
+
+def _parse_block(css, i):
+    nodes, buf, parens = [], [], 0
+    while i < len(css):
+        c = css[i]
+        if c in '"\'':
+            end = i + 1
+            while end < len(css) and css[end] != c:
+                end += 2 if css[end] == '\\' else 1
+            buf.append(css[i:end + 1])
+            i = end + 1
+            continue
+        if c == '(':
+            parens += 1
+        elif c == ')':
+            parens -= 1
+        elif c == '{':
+            children, i = _parse_block(css, i + 1)
+            nodes.append(('rule', ''.join(buf).strip(), children))
+            buf = []
+            continue
+        elif c == '}':
+            if ''.join(buf).strip():
+                nodes.append(('stmt', ''.join(buf).strip()))
+            return nodes, i + 1
+        elif c == ';' and parens == 0:
+            nodes.append(('stmt', ''.join(buf).strip()))
+            buf = []
+            i += 1
+            continue
+        buf.append(c)
+        i += 1
+    if ''.join(buf).strip():
+        nodes.append(('stmt', ''.join(buf).strip()))
+    return nodes, i
+
+
+def serialize_css(nodes):
+    parts = []
+    for node in nodes:
+        if node[0] == 'stmt':
+            parts.append(node[1] + ';')
+        else:
+            parts.append(f'{node[1]}{{{serialize_css(node[2])}}}')
+    return ''.join(parts)
+
+
+def split_selectors(prelude):
+    selectors, buf, depth = [], [], 0
+    for c in prelude:
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        if c == ',' and depth == 0:
+            selectors.append(''.join(buf).strip())
+            buf = []
+        else:
+            buf.append(c)
+    selectors.append(''.join(buf).strip())
+    return [s for s in selectors if s]
+
+
+def selector_classes(selector):
+    return {re.sub(r'\\(.)', r'\1', cls) for cls in re.findall(r'\.((?:\\.|[\w-])+)', selector)}
+
+
+def filter_css(nodes, keep_selector, drop_at_rule=lambda prelude, children: False):
+    """Garde les sélecteurs acceptés par keep_selector, récursivement"""
+    out = []
+    for node in nodes:
+        if node[0] == 'stmt':
+            out.append(node)
+            continue
+        _, prelude, children = node
+        if prelude.startswith('@'):
+            if drop_at_rule(prelude, children):
+                continue
+            if prelude.split()[0] in ('@media', '@supports', '@layer', '@container'):
+                children = filter_css(children, keep_selector, drop_at_rule)
+                if any(child[0] == 'rule' for child in children):
+                    out.append(('rule', prelude, children))
+            else:
+                out.append(node)
+            continue
+        selectors = [s for s in split_selectors(prelude) if keep_selector(s)]
+        if selectors:
+            children = filter_css(children, keep_selector, drop_at_rule)
+            if children:
+                out.append(('rule', ', '.join(selectors), children))
+    return out
+
+
+def template_tokens(text):
+    """Tous les mots d'un template pouvant être des classes CSS"""
+    return set(re.split(r'[\s"\'`<>=,;{}()]+', text))
+
+
+# --- Lecture des fichiers produits par le build -----------------------------
+
+def _read_static(path):
+    try:
+        if staticfiles_storage.exists(path):
+            with staticfiles_storage.open(path) as f:
+                return f.read().decode('utf-8')
+    except Exception:
+        pass
+    found = finders.find(path)
+    if found:
+        with open(found, encoding='utf-8') as f:
+            return f.read()
+    return None
+
+
+@lru_cache(maxsize=None)
+def build_manifest():
+    data = _read_static(MANIFEST)
+    return json.loads(data) if data else None
+
+
+@lru_cache(maxsize=None)
+def critical_css_for(template_name):
+    manifest = build_manifest()
+    path = manifest and manifest['critical'].get(template_name)
+    return _read_static(path) if path else None
+
+
+def render_critical_css(template_name, stylesheet='src/output.css'):
+    """<style> critique + feuille complète en asynchrone, sinon <link> classique"""
+    href = static(stylesheet)
+    css = critical_css_for(template_name) if not settings.DEBUG else None
+    if css is None:
+        return format_html('<link rel="stylesheet" href="{}">', href)
+    return format_html(
+        '<style>{}</style>\n'
+        '    <link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '    <noscript><link rel="stylesheet" href="{}"></noscript>',
+        mark_safe(css), href, href,
+    )
+
+
+def render_font_stylesheets():
+    """Polices et icônes auto-hébergées si le build existe, CDN sinon"""
+    manifest = build_manifest()
+    if manifest is None:
+        return format_html(
+            '<link rel="stylesheet" href="{}">\n'
+            '    <link href="{}" rel="stylesheet">',
+            FONT_AWESOME_CDN, GOOGLE_FONTS_CSS,
+        )
+    preloads = format_html_join(
+        '\n    ',
+        '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>',
+        ((static(path),) for path in manifest['fonts']),
+    )
+    return format_html(
+        '{}\n    <link rel="stylesheet" href="{}">',
+        preloads, static(manifest['stylesheet']),
+    )
+
+
+def render_service_worker():
+    """Enregistrement du service worker, s'il a été généré par collectstatic"""
+    from .offline import worker_script
+
+    if worker_script() is None:
+        return ''
+    return format_html(
+        "<script>if ('serviceWorker' in navigator) navigator.serviceWorker.register('{}');</script>",
+        reverse('service_worker'),
+    )
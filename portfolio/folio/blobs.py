@@ -0,0 +1,312 @@
+"""
+Stockage des fichiers envoyés adressé par le contenu : un contenu, un fichier.
+
+Enregistrement (ContentAddressedStorage.save) :
+- le contenu est copié par morceaux dans .blobs/tmp/ en calculant son
+  blake2b au passage, sans jamais être entièrement en mémoire ;
+- il est rangé une seule fois sous .blobs/<2 car.>/<empreinte> ; s'il y est
+  déjà, la copie temporaire est simplement supprimée ;
+- le nom rendu au modèle garde le dossier et le nom d'origine, avec
+  l'empreinte (cv/mon-cv.3f9a0c1b2d4e.pdf) : c'est un lien physique vers le
+  blob. Le nom ne désigne jamais deux contenus, d'où un cache d'un an à la
+  diffusion (voir folio/media.py).
+
+Compteur de références : le nombre de liens du blob (st_nlink), tenu par le
+système de fichiers lui-même ; un blob n'ayant plus que son propre lien
+n'est plus référencé. Sans liens physiques (autre système de fichiers,
+EPERM), le nom est une copie du blob : plus de déduplication, rien ne casse.
+
+Noms libérés (release, appelé par les signaux après le commit) : le nom
+remplacé dans un FileField, ou celui d'une ligne supprimée, est effacé si
+aucune autre ligne ne le cite ; son blob perd ainsi un lien.
+
+Ramasse-miettes (Collector, commande media_gc), par lots avec pause :
+- --adopt : les fichiers d'avant ce stockage sont rattachés à un blob, les
+  doublons existants ne gardent qu'une copie ;
+- --orphans : les noms qu'aucun FileField ne référence sont supprimés
+  (désactivé par défaut : un article peut citer une image dans son texte) ;
+- les blobs sans autre lien et les copies temporaires abandonnées sont
+  supprimés après un délai de grâce (envoi en cours, modèle pas encore
+  enregistré).
+"""
+import errno
+import functools
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from collections import Counter
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.db.models import FileField
+
+from .content import chunked
+from .media import HASH_LENGTH, upload_directories
+
+BLOB_DIR = '.blobs'
+TMP_DIR = 'tmp'
+# Caractères de l'empreinte dans le nom du blob (128 bits)
+BLOB_NAME_LENGTH = 32
+# Erreurs de os.link pour lesquelles on retombe sur une copie
+NO_LINK = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Blobs uniques par contenu, noms avec empreinte liés à leur blob"""
+
+    def blob_path(self, digest):
+        return os.path.join(self.location, BLOB_DIR, digest[:2], digest[:BLOB_NAME_LENGTH])
+
+    def makedirs(self, directory):
+        if self.directory_permissions_mode is not None:
+            # Comme FileSystemStorage._save : les droits demandés, sans umask
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+    def spool(self, content):
+        """Copie le contenu dans un fichier temporaire ; retourne (empreinte, chemin)"""
+        directory = os.path.join(self.location, BLOB_DIR, TMP_DIR)
+        self.makedirs(directory)
+        path = os.path.join(directory, uuid.uuid4().hex)
+        digest = hashlib.blake2b()
+        # 0o666 : droits soumis à l'umask, comme un enregistrement classique
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return digest.hexdigest(), path
+
+    def store(self, digest, path):
+        """Range le fichier temporaire sous son empreinte, sauf si le blob existe déjà"""
+        blob = self.blob_path(digest)
+        self.makedirs(os.path.dirname(blob))
+        try:
+            # Création atomique : deux envois simultanés du même contenu gardent un seul blob
+            os.link(path, blob)
+        except FileExistsError:
+            # Blob peut-être sans nom depuis longtemps : le délai de grâce du
+            # ramasse-miettes repart, le temps de lui donner le nouveau nom
+            os.utime(blob)
+        except OSError as exc:
+            if exc.errno not in NO_LINK:
+                raise
+            if not os.path.exists(blob):
+                os.replace(path, blob)
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+        return blob
+
+    def link(self, blob, name):
+        target = self.path(name)
+        self.makedirs(os.path.dirname(target))
+        try:
+            os.link(blob, target)
+        except FileExistsError:
+            # Même nom et même empreinte : même contenu
+            pass
+        except OSError as exc:
+            if exc.errno not in NO_LINK:
+                raise
+            if not os.path.exists(target):
+                shutil.copyfile(blob, target)
+
+    def hashed_name(self, name, digest, max_length=None):
+        root, ext = os.path.splitext(self.generate_filename(name))
+        name = f'{root}.{digest[:HASH_LENGTH]}{ext}'
+        excess = len(name) - max_length if max_length else 0
+        if excess > 0:
+            directory, stem = os.path.split(root)
+            if len(stem) <= excess:
+                raise SuspiciousFileOperation(f'Storage can not find an available filename for "{name}".')
+            name = f'{os.path.join(directory, stem[:-excess])}.{digest[:HASH_LENGTH]}{ext}'
+        return name
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+        digest, path = self.spool(content)
+        blob = self.store(digest, path)
+        name = self.hashed_name(name, digest, max_length)
+        self.link(blob, name)
+        validate_file_name(name, allow_relative_path=True)
+        return name
+
+
+@functools.cache
+def file_fields(model):
+    """FileField du modèle rangés par ContentAddressedStorage"""
+    return tuple(
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    )
+
+
+def file_names(instance):
+    """{(champ, nom)} des fichiers d'une instance"""
+    return {
+        (field, field.value_from_object(instance).name)
+        for field in file_fields(type(instance))
+        if field.value_from_object(instance)
+    }
+
+
+def stored_names(instance):
+    """{(champ, nom)} enregistrés en base pour l'instance, avant sa modification"""
+    fields = file_fields(type(instance))
+    row = type(instance)._default_manager.filter(pk=instance.pk).values_list(
+        *(field.attname for field in fields)).first()
+    return {(field, name) for field, name in zip(fields, row or ()) if name}
+
+
+def referenced(name):
+    from django.apps import apps
+
+    return any(
+        model._default_manager.filter(**{field.name: name}).exists()
+        for model in apps.get_models()
+        for field in file_fields(model)
+    )
+
+
+def release(names):
+    """Efface les noms qu'aucune ligne ne cite plus ; un blob sans autre lien
+    est supprimé au prochain passage du ramasse-miettes"""
+    for field, name in names:
+        if not referenced(name):
+            field.storage.delete(name)
+
+
+class Collector:
+    """Ramasse-miettes des blobs ; run() peut être interrompu et relancé"""
+
+    def __init__(self, storage, chunk_size=500, pause=0.1, grace=3600, adopt=False, orphans=False,
+                 dry_run=False, log=None):
+        self.storage = storage
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.grace = grace
+        self.adopt = adopt
+        self.orphans = orphans
+        self.dry_run = dry_run
+        self.log = log or (lambda message: None)
+        self.root = os.path.join(storage.location, BLOB_DIR)
+        self.stats = Counter()
+
+    def referenced(self):
+        """Noms enregistrés dans les FileField de tous les modèles"""
+        from django.apps import apps
+
+        names = set()
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, FileField):
+                    rows = model._default_manager.exclude(**{field.name: ''})
+                    names.update(rows.values_list(field.name, flat=True).iterator(chunk_size=self.chunk_size))
+        return names
+
+    def named_files(self):
+        """Noms présents dans les dossiers d'envoi"""
+        for directory in sorted(upload_directories()):
+            top = os.path.join(self.storage.location, directory)
+            for dirpath, _, filenames in os.walk(top):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    yield os.path.relpath(path, self.storage.location).replace(os.sep, '/'), path
+
+    def blob_files(self):
+        if not os.path.isdir(self.root):
+            return
+        for entry in sorted(os.scandir(self.root), key=lambda entry: entry.name):
+            if entry.is_dir():
+                yield from (item.path for item in os.scandir(entry.path) if item.is_file())
+
+    def expired(self, stat):
+        return time.time() - stat.st_mtime > self.grace
+
+    def unlink(self, path, stat, kind):
+        self.stats[kind] += 1
+        if stat.st_nlink == 1:
+            self.stats['bytes'] += stat.st_size
+        if not self.dry_run:
+            os.unlink(path)
+
+    def adopt_file(self, name, path):
+        """Rattache un fichier d'avant ce stockage à son blob, en remplaçant un doublon"""
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(64 * 1024), b''):
+                digest.update(block)
+        blob = self.storage.blob_path(digest.hexdigest())
+        duplicate = os.path.exists(blob)
+        self.stats['duplicates' if duplicate else 'adopted'] += 1
+        if duplicate:
+            self.stats['bytes'] += os.stat(path).st_size
+        if self.dry_run:
+            return
+        self.storage.makedirs(os.path.dirname(blob))
+        try:
+            if duplicate:
+                # Remplacement atomique du doublon par un lien vers le blob
+                tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+                os.link(blob, tmp)
+                os.replace(tmp, path)
+            else:
+                os.link(path, blob)
+        except OSError as exc:
+            if exc.errno not in NO_LINK:
+                raise
+            self.log(f"{name} : liens physiques indisponibles ({exc.strerror})")
+
+    def sweep_names(self):
+        referenced = self.referenced() if self.orphans else set()
+        for chunk in chunked(self.named_files(), self.chunk_size):
+            for name, path in chunk:
+                stat = os.stat(path)
+                if self.orphans and name not in referenced and self.expired(stat):
+                    self.unlink(path, stat, 'orphans')
+                elif self.adopt and stat.st_nlink == 1:
+                    self.adopt_file(name, path)
+            self.stats['names'] += len(chunk)
+            time.sleep(self.pause)
+
+    def sweep_blobs(self):
+        for chunk in chunked(self.blob_files(), self.chunk_size):
+            for path in chunk:
+                stat = os.stat(path)
+                if os.path.basename(os.path.dirname(path)) == TMP_DIR:
+                    if self.expired(stat):
+                        self.unlink(path, stat, 'temporary')
+                elif stat.st_nlink == 1 and self.expired(stat):
+                    self.unlink(path, stat, 'blobs')
+                else:
+                    self.stats['kept'] += 1
+            time.sleep(self.pause)
+
+    def run(self):
+        start = time.perf_counter()
+        # Les noms d'abord : leurs blobs deviennent collectables dans le même passage
+        if self.adopt or self.orphans:
+            self.sweep_names()
+        self.sweep_blobs()
+        self.stats['seconds'] = time.perf_counter() - start
+        return self.stats
@@ -0,0 +1,131 @@
+"""
+Cache protégé contre les « stampedes » pour les pages et agrégats du folio.
+
+- verrou unique entre processus via cache.add() : un seul worker recalcule
+  une entrée expirée ;
+- rafraîchissement anticipé probabiliste (XFetch) avant l'expiration ;
+- stale-while-revalidate : pendant le recalcul, les autres workers servent
+  l'ancienne valeur au lieu d'attendre ;
+- compteurs partagés : hits, misses, stale, lock_waits, recomputes ;
+- served_stale : vrai si la requête en cours a reçu une valeur périmée
+  (la page ne doit pas être gardée par le CDN, voir surrogates.py).
+"""
+import contextvars
+import math
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = 'folio:swr:'
+METRICS = ('hits', 'misses', 'stale', 'lock_waits', 'recomputes')
+
+DEFAULT_TTL = getattr(settings, 'FOLIO_CACHE_TTL', 300)
+STALE_TTL = getattr(settings, 'FOLIO_CACHE_STALE_TTL', 3600)
+LOCK_TIMEOUT = getattr(settings, 'FOLIO_CACHE_LOCK_TIMEOUT', 30)
+BETA = 1.0
+
+served_stale = contextvars.ContextVar('served_stale', default=False)
+
+
+def _incr(metric):
+    key = f'{PREFIX}metrics:{metric}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def stats():
+    """Compteurs cumulés de tous les workers"""
+    keys = {f'{PREFIX}metrics:{m}': m for m in METRICS}
+    values = cache.get_many(keys.keys())
+    return {m: values.get(k, 0) for k, m in keys.items()}
+
+
+def _early_refresh(envelope):
+    """XFetch : probabilité croissante de recalculer à l'approche de l'expiration"""
+    delta = envelope['delta']
+    return time.time() - delta * BETA * math.log(random.random() or 1e-12) >= envelope['expires']
+
+
+def _recompute(key, compute, ttl):
+    start = time.time()
+    value = compute()
+    delta = time.time() - start
+    envelope = {'value': value, 'expires': time.time() + ttl, 'delta': delta}
+    cache.set(PREFIX + key, envelope, ttl + STALE_TTL)
+    _incr('recomputes')
+    return value
+
+
+def _refresh(key, compute, ttl, seen):
+    """Recalcule sous verrou, sauf si un autre worker vient de le faire"""
+    current = cache.get(PREFIX + key)
+    if (
+        current is not None
+        and time.time() < current['expires']
+        and (seen is None or current['expires'] > seen['expires'])
+    ):
+        return current['value']
+    return _recompute(key, compute, ttl)
+
+
+def _with_lock(key, fn):
+    """Exécute fn() si le verrou est obtenu ; retourne (obtenu, résultat)"""
+    lock_key = f'{PREFIX}lock:{key}'
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, LOCK_TIMEOUT):
+        return False, None
+    try:
+        return True, fn()
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def get_or_compute(key, compute, ttl=None, wait=5.0):
+    """Retourne la valeur de `key`, en appelant compute() au plus une fois par expiration"""
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    envelope = cache.get(PREFIX + key)
+
+    if envelope is not None:
+        fresh = time.time() < envelope['expires']
+        if fresh and not _early_refresh(envelope):
+            _incr('hits')
+            return envelope['value']
+        acquired, value = _with_lock(key, lambda: _refresh(key, compute, ttl, envelope))
+        if acquired:
+            return value
+        # Un autre worker recalcule : on sert la valeur actuelle
+        _incr('hits' if fresh else 'stale')
+        if not fresh:
+            served_stale.set(True)
+        return envelope['value']
+
+    # Absente : un seul worker calcule, les autres attendent le résultat
+    _incr('misses')
+    deadline = time.time() + wait
+    while True:
+        acquired, value = _with_lock(key, lambda: _refresh(key, compute, ttl, None))
+        if acquired:
+            return value
+        _incr('lock_waits')
+        time.sleep(0.05)
+        envelope = cache.get(PREFIX + key)
+        if envelope is not None:
+            return envelope['value']
+        if time.time() > deadline:
+            return compute()
+
+
+def invalidate(*keys):
+    """Marque les entrées comme périmées : elles restent servies pendant le recalcul"""
+    for key in keys:
+        envelope = cache.get(PREFIX + key)
+        if envelope is not None:
+            envelope['expires'] = 0
+            cache.set(PREFIX + key, envelope, STALE_TTL)
@@ -0,0 +1,162 @@
+"""
+Compression des réponses dynamiques (HTML, JSON) : brotli, zstd, gzip.
+
+WhiteNoise ne compresse que les fichiers statiques. L'encodage est négocié
+d'après Accept-Encoding, dans l'ordre de préférence du serveur ; brotli et
+zstd ne sont proposés que si les paquets `brotli` / `zstandard` sont
+installés. Les corps identiques (pages en cache) sont compressés une seule
+fois : les octets compressés sont gardés dans le cache, indexés par
+l'empreinte du contenu.
+
+Seules les réponses publiques sont compressées : une page qui reflète une
+entrée du visiteur à côté d'un secret (jeton CSRF, données de session)
+laisserait deviner ce secret d'après la taille compressée (BREACH).
+"""
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import has_vary_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PREFIX = 'folio:compress:'
+
+MIN_SIZE = getattr(settings, 'FOLIO_COMPRESS_MIN_SIZE', 1024)
+LEVELS = {'br': 5, 'zstd': 3, 'gzip': 6, **getattr(settings, 'FOLIO_COMPRESS_LEVELS', {})}
+CACHE_TTL = getattr(settings, 'FOLIO_COMPRESS_CACHE_TTL', 600)
+TYPES = getattr(settings, 'FOLIO_COMPRESS_TYPES', (
+    'text/html', 'text/plain', 'text/css', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+))
+
+
+def available_encodings():
+    """Encodages utilisables, du plus au moins préféré"""
+    encodings = []
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+
+ENCODINGS = available_encodings()
+
+
+def parse_accept_encoding(header):
+    """{'br': 1.0, 'gzip': 0.8, ...} ; q=0 signifie refusé"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, encodings=None):
+    """Meilleur encodage accepté par le client, ou None"""
+    accepted = parse_accept_encoding(header or '')
+    best, best_q = None, 0.0
+    for coding in encodings or ENCODINGS:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        # À q égal, l'ordre du serveur départage
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def secret_free(request, response):
+    """Réponse sans secret du visiteur : requête publique (voir
+    PublicRequestMiddleware), ni cookie posé, ni Cache-Control: private,
+    ni Vary: Cookie"""
+    if not getattr(request, 'folio_public', False) or response.cookies:
+        return False
+    control = response.get('Cache-Control', '').lower()
+    return 'private' not in control and not has_vary_header(response, 'Cookie')
+
+
+def compress(data, encoding, level=None):
+    level = LEVELS[encoding] if level is None else level
+    if encoding == 'br':
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=level)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def cached_compress(data, encoding):
+    """Comme compress(), mais réutilise le résultat pour un contenu déjà vu"""
+    if not CACHE_TTL:
+        return compress(data, encoding)
+    key = f'{PREFIX}{encoding}:{hashlib.blake2b(data, digest_size=16).hexdigest()}'
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(data, encoding)
+        cache.set(key, compressed, CACHE_TTL)
+    return compressed
+
+
+class StreamCompressor:
+    """Compression incrémentale : chaque morceau est vidé pour partir aussitôt"""
+
+    def __init__(self, encoding, level=None):
+        level = LEVELS[encoding] if level is None else level
+        self.encoding = encoding
+        if encoding == 'br':
+            self.obj = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+        elif encoding == 'zstd':
+            self.obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self.obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self.obj.process(chunk) + self.obj.flush()
+        if self.encoding == 'zstd':
+            return self.obj.compress(chunk) + self.obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self.obj.compress(chunk) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.obj.finish()
+        return self.obj.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
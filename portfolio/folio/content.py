@@ -0,0 +1,363 @@
+"""
+Import/export en masse du contenu : articles, catégories, tags, projets.
+
+Formats :
+- JSONL : un objet par ligne, {"type": "post" | "project", ...} ;
+- Markdown : un fichier .md par objet, en-tête « front matter » (clé: valeur)
+  entre deux lignes `---`, le corps étant le contenu de l'article ou la
+  description du projet.
+
+L'import travaille par lots : auteurs, catégories, tags et compétences
+sont résolus en une requête par lot (cartes en mémoire), les objets sont
+insérés par bulk_create et les lignes m2m écrites directement dans les
+tables intermédiaires. Les articles dont le slug existe déjà sont ignorés ;
+les projets, sans clé naturelle, sont toujours ajoutés. Aucun signal n'étant
+émis, les caches et les compteurs d'archives sont mis à jour à la fin.
+L'export parcourt les tables avec .iterator() et se relit tel quel.
+"""
+import datetime
+import json
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import slugify
+
+from . import archive, caching, facets, surrogates, typeahead
+from .models import BlogPost, Category, Project, Skill, Tag, make_excerpt
+
+
+class ContentError(Exception):
+    pass
+
+
+# --- Lecture ------------------------------------------------------------------
+
+def parse_value(raw):
+    """Valeur d'en-tête : JSON si possible, liste `[a, b]`, sinon texte brut"""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    if raw.startswith('[') and raw.endswith(']'):
+        return [item.strip() for item in raw[1:-1].split(',') if item.strip()]
+    return raw
+
+
+def parse_front_matter(text):
+    lines = text.splitlines()
+    if not lines or lines[0].strip() != '---':
+        return {}, text
+    meta = {}
+    for i, line in enumerate(lines[1:], 1):
+        if line.strip() == '---':
+            return meta, '\n'.join(lines[i + 1:]).strip('\n')
+        key, sep, value = line.partition(':')
+        if sep and key.strip():
+            meta[key.strip()] = parse_value(value.strip())
+    raise ContentError("En-tête front matter non terminé")
+
+
+def read_jsonl(stream, source='-'):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            raise ContentError(f"{source}:{number} : JSON invalide ({exc})")
+
+
+def read_markdown(path):
+    meta, body = parse_front_matter(path.read_text(encoding='utf-8'))
+    kind = meta.setdefault('type', 'post')
+    meta['description' if kind == 'project' else 'content'] = body
+    meta.setdefault('slug', path.stem)
+    return meta
+
+
+def read_records(source):
+    """Enregistrements d'un fichier .jsonl, d'un fichier .md, d'un dossier, ou de stdin ('-')"""
+    if source == '-':
+        yield from read_jsonl(sys.stdin)
+        return
+    path = Path(source)
+    if path.is_dir():
+        for child in sorted(path.rglob('*')):
+            if child.suffix in ('.md', '.jsonl'):
+                yield from read_records(child)
+    elif path.suffix == '.md':
+        yield read_markdown(path)
+    else:
+        with path.open(encoding='utf-8') as stream:
+            yield from read_jsonl(stream, source)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def to_datetime(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value) or parse_date(value)
+    if parsed is None:
+        raise ContentError(f"Date invalide : {value}")
+    if not hasattr(parsed, 'hour'):
+        parsed = datetime.datetime.combine(parsed, datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+# --- Import ---------------------------------------------------------------------
+
+class Importer:
+    """Insère les enregistrements par lots de chunk_size"""
+
+    def __init__(self, chunk_size=1000, default_author=None, create_missing=True, log=None):
+        self.chunk_size = chunk_size
+        self.default_author = default_author
+        self.create_missing = create_missing
+        self.log = log or (lambda message: None)
+        # Cartes nom -> pk, conservées d'un lot à l'autre
+        self.users, self.categories, self.tags, self.skills = {}, {}, {}, {}
+        self.counts = dict.fromkeys(('posts', 'projects', 'm2m', 'skipped', 'errors'), 0)
+
+    def run(self, records):
+        start = time.perf_counter()
+        for chunk in chunked(records, self.chunk_size):
+            self.import_chunk(chunk)
+        if self.counts['posts']:
+            archive.rebuild()
+            caching.invalidate('home', 'blog:sidebar')
+            # bulk_create n'émet pas de signaux : listes, catégories et tags des articles importés
+            surrogates.purge(
+                'posts', 'categories', 'tags',
+                *(f'category-{slug}' for slug in Category.objects.filter(
+                    pk__in=self.categories.values()).values_list('slug', flat=True)),
+                *(f'tag-{slug}' for slug in Tag.objects.filter(
+                    pk__in=self.tags.values()).values_list('slug', flat=True)),
+            )
+        if self.counts['projects']:
+            facets.invalidate()
+            caching.invalidate('home', 'portfolio')
+            surrogates.purge('projects', 'skills')
+        if self.counts['posts'] or self.counts['projects']:
+            typeahead.invalidate()
+        self.counts['seconds'] = time.perf_counter() - start
+        return self.counts
+
+    def error(self, record, message):
+        self.counts['errors'] += 1
+        self.log(f"{record.get('type', 'post')} {record.get('slug') or record.get('title')!r} : {message}")
+
+    def resolve(self, model, names, cache, make):
+        """Complète la carte nom -> pk en une requête ; les absents sont créés
+        (create_missing) ou signalés"""
+        missing = {name for name in names if name not in cache}
+        if not missing:
+            return
+        cache.update((name, pk) for pk, name in model.objects.filter(name__in=missing).values_list('pk', 'name'))
+        if not self.create_missing:
+            for name in sorted(missing - cache.keys()):
+                self.error({'type': model._meta.model_name, 'title': name}, "absent, non créé")
+            return
+        new = [make(name) for name in missing if name not in cache]
+        if new:
+            # Slug vide : aucune URL possible, rien n'est créé
+            model.objects.bulk_create([obj for obj in new if getattr(obj, 'slug', True)], ignore_conflicts=True)
+            created = [obj.name for obj in new]
+            cache.update((name, pk) for pk, name in model.objects.filter(name__in=created).values_list('pk', 'name'))
+            # Conflit ignoré par bulk_create : slug déjà pris par un autre nom
+            for name in sorted(set(created) - cache.keys()):
+                self.error({'type': model._meta.model_name, 'title': name}, "slug vide ou déjà utilisé, non créé")
+
+    def import_chunk(self, records):
+        posts = [r for r in records if r.get('type', 'post') == 'post']
+        projects = [r for r in records if r.get('type') == 'project']
+        for record in records:
+            if record.get('type', 'post') not in ('post', 'project'):
+                self.error(record, f"type inconnu : {record.get('type')}")
+
+        usernames = {r.get('author') or self.default_author for r in posts} - {None}
+        missing_users = usernames - self.users.keys()
+        if missing_users:
+            self.users.update(User.objects.filter(username__in=missing_users).values_list('username', 'pk'))
+        self.resolve(Category, {r['category'] for r in posts if r.get('category')}, self.categories,
+                     lambda name: Category(name=name, slug=slugify(name)))
+        self.resolve(Tag, {t for r in posts for t in r.get('tags') or ()}, self.tags,
+                     lambda name: Tag(name=name, slug=slugify(name)))
+        self.resolve(Skill, {t for r in projects for t in r.get('technologies') or ()}, self.skills,
+                     lambda name: Skill(name=name, category='tools'))
+
+        with transaction.atomic():
+            if posts:
+                self.insert_posts(posts)
+            if projects:
+                self.insert_projects(projects)
+
+    def insert_posts(self, records):
+        slugs = [r.get('slug') or slugify(r.get('title', '')) for r in records]
+        existing = set(BlogPost.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        objs, tags = [], []
+        for record, slug in zip(records, slugs):
+            if not slug or slug in existing:
+                self.counts['skipped'] += 1
+                continue
+            author = self.users.get(record.get('author') or self.default_author)
+            if author is None:
+                self.error(record, f"auteur inconnu : {record.get('author') or self.default_author}")
+                continue
+            try:
+                post = BlogPost(
+                    title=record['title'],
+                    slug=slug,
+                    author_id=author,
+                    content=record.get('content', ''),
+                    excerpt=record.get('excerpt', ''),
+                    featured_image=record.get('featured_image') or None,
+                    category_id=self.categories.get(record.get('category')),
+                    status=record.get('status', 'draft'),
+                    featured=bool(record.get('featured', False)),
+                    created_date=to_datetime(record.get('created_date')) or timezone.now(),
+                    published_date=to_datetime(record.get('published_date')),
+                    views=int(record.get('views', 0)),
+                )
+            except (KeyError, ValueError, ContentError) as exc:
+                self.error(record, f"champ invalide : {exc}")
+                continue
+            # Ce que fait BlogPost.save(), contourné par bulk_create
+            if post.status == 'published' and not post.published_date:
+                post.published_date = timezone.now()
+            if not post.excerpt.strip():
+                post.excerpt = make_excerpt(post.content)
+            existing.add(slug)
+            objs.append(post)
+            tags.append([self.tags[t] for t in record.get('tags') or () if t in self.tags])
+
+        BlogPost.objects.bulk_create(objs)
+        through = BlogPost.tags.through
+        rows = [through(blogpost_id=post.pk, tag_id=tag_id) for post, ids in zip(objs, tags) for tag_id in ids]
+        through.objects.bulk_create(rows, ignore_conflicts=True)
+        self.counts['posts'] += len(objs)
+        self.counts['m2m'] += len(rows)
+
+    def insert_projects(self, records):
+        objs, technologies = [], []
+        for record in records:
+            try:
+                description = record.get('description', '')
+                project = Project(
+                    title=record['title'],
+                    description=description,
+                    short_description=record.get('short_description') or description[:300],
+                    image=record.get('image') or None,
+                    github_url=record.get('github_url', ''),
+                    live_url=record.get('live_url', ''),
+                    featured=bool(record.get('featured', False)),
+                    order=int(record.get('order', 0)),
+                    created_date=to_datetime(record.get('created_date')) or timezone.now(),
+                )
+            except (KeyError, ValueError, ContentError) as exc:
+                self.error(record, f"champ invalide : {exc}")
+                continue
+            objs.append(project)
+            technologies.append([self.skills[t] for t in record.get('technologies') or () if t in self.skills])
+
+        Project.objects.bulk_create(objs)
+        through = Project.technologies.through
+        rows = [through(project_id=project.pk, skill_id=skill_id)
+                for project, ids in zip(objs, technologies) for skill_id in ids]
+        through.objects.bulk_create(rows, ignore_conflicts=True)
+        self.counts['projects'] += len(objs)
+        self.counts['m2m'] += len(rows)
+
+
+# --- Export ---------------------------------------------------------------------
+
+def isoformat(value):
+    return value.isoformat() if value else None
+
+
+def post_records(chunk_size=500):
+    queryset = (
+        BlogPost.objects.select_related('author', 'category')
+        .prefetch_related('tags').order_by('pk')
+    )
+    for post in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'post',
+            'title': post.title,
+            'slug': post.slug,
+            'author': post.author.username,
+            'category': post.category.name if post.category else None,
+            'tags': [tag.name for tag in post.tags.all()],
+            'status': post.status,
+            'featured': post.featured,
+            'excerpt': post.excerpt,
+            'featured_image': post.featured_image.name or None,
+            'created_date': isoformat(post.created_date),
+            'published_date': isoformat(post.published_date),
+            'views': post.views,
+            'content': post.content,
+        }
+
+
+def project_records(chunk_size=500):
+    queryset = Project.objects.prefetch_related('technologies').order_by('pk')
+    for project in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'project',
+            'title': project.title,
+            'slug': f'project-{project.pk}-{slugify(project.title)}',
+            'short_description': project.short_description,
+            'technologies': [skill.name for skill in project.technologies.all()],
+            'github_url': project.github_url,
+            'live_url': project.live_url,
+            'image': project.image.name or None,
+            'featured': project.featured,
+            'order': project.order,
+            'created_date': isoformat(project.created_date),
+            'description': project.description,
+        }
+
+
+def format_value(value):
+    """Texte brut quand il se relit à l'identique, JSON sinon"""
+    if isinstance(value, str) and value == value.strip() and '\n' not in value:
+        if parse_value(value) == value:
+            return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def render_markdown(record):
+    record = dict(record)
+    body = record.pop('description' if record['type'] == 'project' else 'content')
+    header = '\n'.join(f'{key}: {format_value(value)}' for key, value in record.items() if value is not None)
+    return f'---\n{header}\n---\n\n{body}\n'
+
+
+def write_jsonl(records, stream):
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def write_markdown(records, directory):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    for record in records:
+        (directory / f"{record['slug']}.md").write_text(render_markdown(record), encoding='utf-8')
+        count += 1
+    return count
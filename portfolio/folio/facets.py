@@ -0,0 +1,138 @@
+"""
+Index inversé Skill -> Project pour le filtrage du portfolio.
+
+Chaque projet reçoit une position (dans l'ordre par défaut de Project) et
+chaque facette (technologie ou catégorie de Skill) est un bitset stocké
+dans un entier Python : le bit i est levé si le projet i possède la
+facette. Les filtres ET/OU et les comptages se font donc sans requête SQL.
+
+L'index est construit une fois, partagé entre workers via le cache et
+invalidé par les signaux (voir folio.signals), après le commit. La version
+expire après FOLIO_FACETS_TTL secondes : une invalidation perdue (cache
+vidé, écriture hors signaux) ne dure pas plus longtemps.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Project, Skill
+
+CACHE_KEY = 'folio:facets:index'
+VERSION_KEY = 'folio:facets:version'
+TTL = getattr(settings, 'FOLIO_FACETS_TTL', 3600)
+
+_local = {'version': None, 'index': None}
+
+
+class FacetIndex:
+    def __init__(self, project_ids, skills, memberships):
+        # project_ids : ids dans l'ordre d'affichage
+        # skills : {skill_id: (nom, catégorie)}
+        # memberships : {skill_id: bitset}
+        self.project_ids = project_ids
+        self.skills = skills
+        self.bitsets = memberships
+        self.position = {pk: i for i, pk in enumerate(project_ids)}
+        self.all_bits = (1 << len(project_ids)) - 1
+        self.by_name = {}
+        self.by_category = {}
+        for skill_id, (name, category) in skills.items():
+            bits = memberships.get(skill_id, 0)
+            self.by_name[name.lower()] = self.by_name.get(name.lower(), 0) | bits
+            self.by_category[category] = self.by_category.get(category, 0) | bits
+
+    @classmethod
+    def build(cls):
+        project_ids = list(Project.objects.values_list('id', flat=True))
+        position = {pk: i for i, pk in enumerate(project_ids)}
+        skills = {
+            pk: (name, category)
+            for pk, name, category in Skill.objects.values_list('id', 'name', 'category')
+        }
+        memberships = {}
+        through = Project.technologies.through.objects.values_list('skill_id', 'project_id')
+        for skill_id, project_id in through.iterator():
+            memberships[skill_id] = memberships.get(skill_id, 0) | (1 << position[project_id])
+        return cls(project_ids, skills, memberships)
+
+    def to_dict(self):
+        return {
+            'project_ids': self.project_ids,
+            'skills': self.skills,
+            'bitsets': self.bitsets,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['project_ids'], data['skills'], data['bitsets'])
+
+    def tech_bits(self, term):
+        """Bitset d'un terme de recherche (correspondance partielle sur le nom)"""
+        term = term.lower()
+        bits = 0
+        for name, name_bits in self.by_name.items():
+            if term in name:
+                bits |= name_bits
+        return bits
+
+    def filter(self, techs=(), categories=(), mode='and'):
+        """Retourne (ids des projets, comptage par skill_id)"""
+        facets = [self.tech_bits(t) for t in techs if t]
+        facets += [self.by_category.get(c, 0) for c in categories if c]
+        if not facets:
+            result = self.all_bits
+        elif mode == 'or':
+            result = 0
+            for bits in facets:
+                result |= bits
+        else:
+            result = self.all_bits
+            for bits in facets:
+                result &= bits
+
+        ids = [pk for i, pk in enumerate(self.project_ids) if result >> i & 1]
+        counts = {
+            skill_id: (bits & result).bit_count()
+            for skill_id, bits in self.bitsets.items()
+        }
+        return ids, counts
+
+    def category_counts(self, project_ids):
+        """Projets de `project_ids` par catégorie de Skill"""
+        result = 0
+        for pk in project_ids:
+            result |= 1 << self.position[pk]
+        return {category: (bits & result).bit_count() for category, bits in self.by_category.items()}
+
+    def tags_for(self, project_id):
+        """Chaîne data-tags d'un projet, sans passer par project.technologies"""
+        i = self.position[project_id]
+        return ' '.join(
+            self.skills[skill_id][0].lower()
+            for skill_id, bits in self.bitsets.items()
+            if bits >> i & 1 and skill_id in self.skills
+        )
+
+
+def get_index():
+    """Index courant, reconstruit seulement si la version partagée a changé"""
+    version = cache.get_or_set(VERSION_KEY, time.time_ns, TTL)
+    if _local['version'] == version and _local['index'] is not None:
+        return _local['index']
+
+    data = cache.get(CACHE_KEY)
+    if data is not None and data.get('version') == version:
+        index = FacetIndex.from_dict(data)
+    else:
+        index = FacetIndex.build()
+        cache.set(CACHE_KEY, dict(index.to_dict(), version=version), TTL)
+
+    _local.update(version=version, index=index)
+    return index
+
+
+def invalidate():
+    """Force la reconstruction de l'index dans tous les workers"""
+    cache.set(VERSION_KEY, time.time_ns(), TTL)
+    _local.update(version=None, index=None)
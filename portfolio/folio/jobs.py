@@ -0,0 +1,209 @@
+"""
+File de tâches différées stockée en base (modèle Job), sans broker externe.
+
+    @jobs.register('contact.message', batch=True)
+    def save_messages(payloads): ...
+
+    jobs.enqueue('contact.message', name=..., email=...)
+
+Les workers (`manage.py runworker`) réclament les tâches avec
+select_for_update(skip_locked=True) ; sur SQLite, qui ne supporte pas ce
+verrou, chaque tâche est réclamée par un UPDATE conditionnel. Une tâche
+réclamée est louée pour FOLIO_JOBS_LEASE secondes : si son worker meurt,
+elle est réclamée à nouveau à l'expiration du bail. Les tâches du
+même type sont exécutées par lots quand le handler l'accepte ; un lot qui
+échoue est repris tâche par tâche, et les échecs sont relancés avec un
+délai exponentiel.
+
+Si FOLIO_JOBS_ENABLED est faux, enqueue() exécute le handler immédiatement.
+
+BufferedCounter cumule en mémoire des compteurs fréquents (vues,
+téléchargements) et les confie à la file en une seule tâche par intervalle.
+"""
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger('folio')
+
+_handlers = {}
+
+
+def register(kind, batch=False):
+    """Déclare le handler d'un type de tâche (batch=True : reçoit une liste de payloads)"""
+    def decorator(func):
+        _handlers[kind] = (func, batch)
+        return func
+    return decorator
+
+
+def enqueue(kind, delay=0, **payload):
+    if kind not in _handlers:
+        raise KeyError(f"Type de tâche inconnu : {kind}")
+    if not getattr(settings, 'FOLIO_JOBS_ENABLED', False):
+        func, batch = _handlers[kind]
+        if batch:
+            func([payload])
+        else:
+            func(payload)
+        return None
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim(limit, kinds=None):
+    """Réserve jusqu'à `limit` tâches prêtes pour ce worker, y compris celles
+    dont le bail a expiré (worker arrêté en cours d'exécution)"""
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'FOLIO_JOBS_LEASE', 300))
+    queryset = Job.objects.filter(
+        Q(status='pending', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+    )
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    queryset = queryset.order_by('run_at')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = list(queryset.select_for_update(skip_locked=True)[:limit])
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(status='running', locked_until=lease)
+    else:
+        # SQLite : chaque UPDATE conditionnel est sa propre transaction d'écriture
+        jobs = [
+            job for job in queryset[:limit]
+            if Job.objects.filter(pk=job.pk, status=job.status, locked_until=job.locked_until).update(
+                status='running', locked_until=lease,
+            )
+        ]
+    for job in jobs:
+        job.status = 'running'
+        job.locked_until = lease
+    return jobs
+
+
+def backoff(attempts):
+    """Délai avant la prochaine tentative, en secondes"""
+    base = getattr(settings, 'FOLIO_JOBS_RETRY_DELAY', 10)
+    return base * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+
+
+def _finish(jobs, error=None):
+    now = timezone.now()
+    for job in jobs:
+        job.attempts += 1
+        job.locked_until = None
+        if error is None:
+            job.status = 'done'
+            job.finished_date = now
+            job.last_error = ''
+        elif job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_date = now
+            job.last_error = error
+        else:
+            job.status = 'pending'
+            job.run_at = now + timedelta(seconds=backoff(job.attempts))
+            job.last_error = error
+    Job.objects.bulk_update(jobs, ['status', 'attempts', 'run_at', 'locked_until', 'finished_date', 'last_error'])
+
+
+def _run(kind, func, batch, unit):
+    """Exécute une unité dans sa transaction ; retourne l'erreur ou None"""
+    try:
+        with transaction.atomic():
+            if func is None:
+                raise KeyError(f"Type de tâche inconnu : {kind}")
+            if batch:
+                func([job.payload for job in unit])
+            else:
+                func(unit[0].payload)
+            _finish(unit)
+    except Exception:
+        logger.exception("Échec de la tâche %s (%d)", kind, len(unit))
+        return traceback.format_exc()
+    return None
+
+
+def execute(jobs):
+    """Exécute des tâches réclamées ; retourne (réussies, échouées)"""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.kind, []).append(job)
+
+    done = failed = 0
+    for kind, group in groups.items():
+        func, batch = _handlers.get(kind, (None, False))
+        units = [group] if batch else [[job] for job in group]
+        for unit in units:
+            error = _run(kind, func, batch, unit)
+            if error is None:
+                done += len(unit)
+                continue
+            if len(unit) == 1:
+                _finish(unit, error)
+                failed += 1
+                continue
+            # Lot annulé en entier : chaque tâche est relancée seule, seule la fautive échoue
+            for job in unit:
+                error = _run(kind, func, batch, [job])
+                if error is None:
+                    done += 1
+                else:
+                    _finish([job], error)
+                    failed += 1
+    return done, failed
+
+
+def run_once(limit=50, kinds=None):
+    """Réclame et exécute un lot ; retourne (réussies, échouées)"""
+    return execute(claim(limit, kinds))
+
+
+class BufferedCounter:
+    """Compteurs gardés en mémoire par worker, confiés à la file de tâches
+    `kind` (payload counts={clé: n}) au plus toutes les `interval` secondes"""
+
+    def __init__(self, kind, interval=60):
+        self.kind = kind
+        self.interval = interval
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+        atexit.register(self.flush)
+        if hasattr(os, 'register_at_fork'):
+            # Les compteurs du maître gunicorn ne sont pas ceux des workers
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, key):
+        with self.lock:
+            self.counts[key] += 1
+            due = time.monotonic() - self.flushed_at >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = dict(self.counts), Counter()
+            self.flushed_at = time.monotonic()
+        if counts:
+            enqueue(self.kind, counts=counts)
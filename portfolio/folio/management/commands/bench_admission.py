@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from folio import admission
+
+
+class Command(BaseCommand):
+    help = ("Test de charge d'un worker gthread émulé (threads + file FIFO) : recherche en surcharge, "
+            "latence de l'accueil sans et avec contrôle d'admission")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Threads du worker (GUNICORN_THREADS)")
+        parser.add_argument('--duration', type=float, default=10, help="Durée de l'envoi (s)")
+        parser.add_argument('--home-rps', type=float, default=20)
+        parser.add_argument('--search-rps', type=float, default=30)
+        parser.add_argument('--home-ms', type=float, default=5, help="Temps de service de l'accueil")
+        parser.add_argument('--search-ms', type=float, default=200, help="Temps de service d'une recherche")
+
+    def arrivals(self, options):
+        """(instant, classe) d'une charge ouverte : arrivées de Poisson"""
+        rng = random.Random(42)
+        schedule = []
+        for kind, rate in (('home', options['home_rps']), ('search', options['search_rps'])):
+            t = rng.expovariate(rate)
+            while t < options['duration']:
+                schedule.append((t, kind))
+                t += rng.expovariate(rate)
+        return sorted(schedule)
+
+    def run(self, options, enabled):
+        factory = RequestFactory()
+        service = {'home': options['home_ms'] / 1000, 'search': options['search_ms'] / 1000}
+        urls = {'home': reverse('folio:home'), 'search': reverse('folio:blog') + '?search=django'}
+        # Limites neuves pour chaque série : l'adaptation repart de zéro
+        saved = admission.LIMITERS
+        admission.LIMITERS = {
+            name: admission.Limiter(name, **{**admission.DEFAULTS, **config}, threads=options['threads'])
+            for name, config in admission.CONFIG.items()
+        }
+
+        def view(request):
+            time.sleep(service[request.kind])
+            return HttpResponse()
+
+        def handle(request, arrival):
+            response = admission.admit(request, view) if enabled else view(request)
+            return request.kind, time.perf_counter() - arrival, response.status_code
+
+        results = []
+        try:
+            with ThreadPoolExecutor(options['threads']) as pool:
+                start = time.perf_counter()
+                futures = []
+                for at, kind in self.arrivals(options):
+                    delay = start + at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    # Heure d'arrivée transmise comme par nginx : l'attente dans la file compte
+                    request = factory.get(urls[kind], HTTP_X_REQUEST_START=f't={time.time():.3f}')
+                    request.kind = kind
+                    request.folio_public = True
+                    futures.append(pool.submit(handle, request, time.perf_counter()))
+                results = [future.result() for future in futures]
+        finally:
+            limits = {name: limiter.limit for name, limiter in admission.LIMITERS.items()}
+            admission.LIMITERS = saved
+        return results, limits
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['threads']} threads, {options['duration']:.0f} s : accueil {options['home_rps']:.0f} req/s "
+            f"({options['home_ms']:.0f} ms), recherche {options['search_rps']:.0f} req/s "
+            f"({options['search_ms']:.0f} ms, capacité {options['threads'] * 1000 / options['search_ms']:.0f} req/s)"
+        )
+        self.stdout.write(f"{'admission':<12}{'route':<10}{'envoyées':>10}{'200':>8}{'503':>8}"
+                          f"{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for enabled in (False, True):
+            results, limits = self.run(options, enabled)
+            for kind in ('home', 'search'):
+                rows = [(latency, status) for k, latency, status in results if k == kind]
+                served = sorted(latency * 1000 for latency, status in rows if status == 200)
+                rejected = sum(1 for _, status in rows if status == 503)
+                p99 = statistics.quantiles(served, n=100)[98] if len(served) > 1 else float('nan')
+                self.stdout.write(
+                    f"{'oui' if enabled else 'non':<12}{kind:<10}{len(rows):>10}{len(served):>8}{rejected:>8}"
+                    f"{statistics.median(served) if served else float('nan'):>10.0f}{p99:>10.0f}"
+                    f"{max(served, default=float('nan')):>10.0f}"
+                )
+            if enabled:
+                self.stdout.write(f"limites finales : {limits}")
@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from folio import api
+from folio.models import Project, Skill
+
+
+class Command(BaseCommand):
+    help = "Débit de sérialisation de l'API : modèles vs values_list(), json vs orjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=10000)
+        parser.add_argument('-n', '--iterations', type=int, default=5)
+
+    def populate(self, count):
+        """Projets synthétiques avec deux technologies chacun (annulés à la fin)"""
+        skills = Skill.objects.bulk_create([
+            Skill(name=f'bench-skill-{i}', level=50, category='backend') for i in range(20)
+        ])
+        now = timezone.now()
+        projects = Project.objects.bulk_create([
+            Project(title=f'Projet {i}', description='d' * 500, short_description='Description courte',
+                    github_url='https://github.com/exemple/projet', created_date=now)
+            for i in range(count)
+        ], batch_size=1000)
+        through = Project.technologies.through
+        through.objects.bulk_create([
+            through(project_id=project.pk, skill_id=skills[(i + k) % 20].pk)
+            for i, project in enumerate(projects) for k in range(2)
+        ], batch_size=2000)
+
+    def with_models(self, resource, names):
+        rows = []
+        for project in Project.objects.prefetch_related('technologies'):
+            row = {name: getattr(project, name) for name in names if name in resource.fields}
+            row['image'] = api.media_url(project.image.name if project.image else None)
+            row['technologies'] = [skill.name for skill in project.technologies.all()]
+            rows.append(row)
+        return json.dumps(rows, cls=DjangoJSONEncoder).encode()
+
+    def with_values(self, resource, names, encode):
+        rows, _ = resource.rows(Project.objects.order_by(*resource.ordering), names)
+        return encode(rows)
+
+    def timed(self, func, iterations):
+        func()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            body = func()
+        return (time.perf_counter() - start) / iterations, len(body)
+
+    def handle(self, *args, **options):
+        resource = api.RESOURCES['projects']
+        names = resource.default
+        stdlib = lambda rows: json.dumps(rows, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+        strategies = [
+            ('modèles + json', lambda: self.with_models(resource, names)),
+            ('values_list + json', lambda: self.with_values(resource, names, stdlib)),
+        ]
+        if api.orjson is not None:
+            strategies.append(('values_list + orjson', lambda: self.with_values(resource, names, api.dumps)))
+        else:
+            self.stderr.write("orjson non installé : variante ignorée")
+
+        with transaction.atomic():
+            self.populate(options['records'])
+            count = Project.objects.count()
+            self.stdout.write(f"{count} projets, champs : {', '.join(names)}")
+            self.stdout.write(f"{'stratégie':<24}{'ms':>10}{'lignes/s':>12}{'octets':>12}")
+            for name, func in strategies:
+                seconds, size = self.timed(func, options['iterations'])
+                self.stdout.write(f"{name:<24}{seconds * 1000:>10.1f}{count / seconds:>12.0f}{size:>12}")
+            transaction.set_rollback(True)
@@ -0,0 +1,91 @@
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from folio.models import BlogPost, Comment
+
+MARKER = '[bench]'
+SPAM = [
+    "Gagnez au casino en ligne, bonus poker offert",
+    "Visitez http://a.example http://b.example http://c.example http://d.example",
+    "CECI EST UN MESSAGE TRES IMPORTANT A LIRE ABSOLUMENT",
+]
+
+
+class Command(BaseCommand):
+    help = "Charge sur l'envoi de commentaires : latence p50/p99 et codes de réponse"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--requests', type=int, default=2000)
+        parser.add_argument('-c', '--concurrency', type=int, default=8)
+        parser.add_argument('--spam', type=float, default=0.3, help="Part des envois refusés par le filtre")
+        parser.add_argument('--flood', type=float, default=0.2, help="Part des envois venant d'une seule IP")
+
+    def payload(self, post, kind):
+        data = {'post_slug': post.slug, 'name': 'Bench', 'email': 'bench@example.com',
+                'content': f'{MARKER} Merci pour cet article', 'parent_id': None}
+        if kind == 'spam':
+            data['content'] = f'{MARKER} {random.choice(SPAM)}'
+        elif kind == 'honeypot':
+            data['website'] = 'http://spam.example'
+        return json.dumps(data)
+
+    def worker(self, post, url, count, options, results, lock):
+        client = Client()
+        latencies, statuses = [], Counter()
+        for i in range(count):
+            roll = random.random()
+            if roll < options['flood']:
+                ip = '10.255.255.255'
+                kind = 'ok'
+            else:
+                ip = f'10.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(256)}'
+                kind = 'spam' if roll < options['flood'] + options['spam'] else 'ok'
+                if kind == 'spam' and i % 3 == 0:
+                    kind = 'honeypot'
+            body = self.payload(post, kind)
+            start = time.perf_counter()
+            response = client.post(url, body, content_type='application/json', secure=True, REMOTE_ADDR=ip)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+        with lock:
+            results['latencies'].extend(latencies)
+            results['statuses'].update(statuses)
+
+    def handle(self, *args, **options):
+        post = BlogPost.objects.filter(status='published').first()
+        if post is None:
+            raise CommandError("Aucun article publié")
+        url = reverse('folio:add_comment')
+        per_thread = max(options['requests'] // options['concurrency'], 1)
+        results = {'latencies': [], 'statuses': Counter()}
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self.worker, args=(post, url, per_thread, options, results, lock))
+            for _ in range(options['concurrency'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(results['latencies'])
+        total = len(latencies)
+        self.stdout.write(f"{total} envois en {elapsed:.2f} s ({total / elapsed:.0f}/s), "
+                          f"{options['concurrency']} clients")
+        self.stdout.write(f"latence ms : p50 {statistics.median(latencies) * 1000:.2f}  "
+                          f"p99 {latencies[int(total * 0.99) - 1] * 1000:.2f}  max {latencies[-1] * 1000:.2f}")
+        for status, count in sorted(results['statuses'].items()):
+            self.stdout.write(f"  {status} : {count}")
+
+        deleted, _ = Comment.objects.filter(content__startswith=MARKER).delete()
+        self.stdout.write(f"{deleted} commentaires de test supprimés")
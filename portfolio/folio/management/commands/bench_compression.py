@@ -0,0 +1,63 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from folio import compression
+from folio.models import BlogPost
+
+PAGES = ['folio:home', 'folio:about', 'folio:portfolio', 'folio:contact', 'folio:blog']
+CANDIDATES = {'br': (1, 5, 11), 'zstd': (3, 10), 'gzip': (1, 6, 9)}
+
+
+class Command(BaseCommand):
+    help = "Coût CPU et octets économisés par encodage et niveau, pour chaque page du folio"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=50)
+
+    def pages(self):
+        urls = [reverse(name) for name in PAGES]
+        post = BlogPost.objects.filter(status='published').first()
+        if post:
+            urls.append(reverse('folio:blog_detail', args=[post.slug]))
+        # Sans Accept-Encoding : corps HTML brut
+        client = Client()
+        for url in urls:
+            response = client.get(url, secure=True)
+            if response.status_code == 200:
+                yield url, response.content
+            else:
+                self.stderr.write(f"{url} ignorée ({response.status_code})")
+
+    def timed(self, func, iterations):
+        func()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        for url, body in self.pages():
+            self.stdout.write(f"\n{url} : {len(body)} octets")
+            self.stdout.write(f"  {'encodage':<10}{'niveau':>7}{'taille':>9}{'économie':>10}{'ms':>9}{'µs/Ko':>8}")
+            for encoding in compression.ENCODINGS:
+                for level in CANDIDATES[encoding]:
+                    size = len(compression.compress(body, encoding, level))
+                    ms = self.timed(lambda: compression.compress(body, encoding, level), iterations)
+                    self.stdout.write(
+                        f"  {encoding:<10}{level:>7}{size:>9}{1 - size / len(body):>10.1%}"
+                        f"{ms:>9.3f}{ms * 1000 / (len(body) / 1024):>8.1f}"
+                    )
+
+            # Page en cache : empreinte + lecture au lieu de recompresser
+            encoding = compression.ENCODINGS[0]
+            compression.cached_compress(body, encoding)
+            key = f'{compression.PREFIX}{encoding}:{hashlib.blake2b(body, digest_size=16).hexdigest()}'
+            ms = self.timed(lambda: compression.cached_compress(body, encoding), iterations)
+            self.stdout.write(f"  {encoding + ' (cache)':<17}{'':>9}{'':>10}{ms:>9.3f}")
+            cache.delete(key)
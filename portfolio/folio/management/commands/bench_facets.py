@@ -0,0 +1,44 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from folio.facets import FacetIndex
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps de filtrage de l'index des facettes du portfolio"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=1000)
+        parser.add_argument('--skills', type=int, default=60)
+        parser.add_argument('-n', '--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        n_projects, n_skills = options['projects'], options['skills']
+        rng = random.Random(42)
+        categories = ['frontend', 'backend', 'tools', 'design']
+
+        # Index synthétique : chaque projet utilise 2 à 6 technologies
+        project_ids = list(range(1, n_projects + 1))
+        skills = {pk: (f'skill{pk:03d}', rng.choice(categories)) for pk in range(1, n_skills + 1)}
+        memberships = {}
+        for i in range(n_projects):
+            for skill_id in rng.sample(range(1, n_skills + 1), rng.randint(2, 6)):
+                memberships[skill_id] = memberships.get(skill_id, 0) | (1 << i)
+        index = FacetIndex(project_ids, skills, memberships)
+
+        queries = [
+            ('and', [f'skill{rng.randint(1, n_skills):03d}' for _ in range(2)], []),
+            ('or', [f'skill{rng.randint(1, n_skills):03d}' for _ in range(3)], []),
+            ('and', [], ['backend']),
+            ('and', [], []),
+        ]
+        for mode, techs, cats in queries:
+            start = time.perf_counter()
+            for _ in range(options['iterations']):
+                ids, counts = index.filter(techs, cats, mode)
+            elapsed = (time.perf_counter() - start) / options['iterations'] * 1000
+            self.stdout.write(
+                f"{mode:<4} tech={techs} category={cats}: {len(ids)} projets, {elapsed:.4f} ms"
+            )
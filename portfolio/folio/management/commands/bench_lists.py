@@ -0,0 +1,85 @@
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from folio.models import BlogPost, Project, make_excerpt
+
+
+class Command(BaseCommand):
+    help = "Mémoire et volume lus par les listes sur des articles et projets de 1 Mo : lignes complètes vs for_list()"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=30)
+        parser.add_argument('--size', type=int, default=2**20, help="Taille du contenu (caractères)")
+        parser.add_argument('-n', '--iterations', type=int, default=5)
+
+    def populate(self, count, size):
+        """Articles et projets synthétiques (annulés à la fin)"""
+        author = User.objects.create(username='bench-lists')
+        now = timezone.now()
+        body = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * (size // 57 + 1))[:size]
+        BlogPost.objects.bulk_create([
+            BlogPost(title=f'Article {i}', slug=f'bench-lists-{i}', author=author, content=body,
+                     excerpt=make_excerpt(body), status='published', published_date=now, views=i)
+            for i in range(count)
+        ], batch_size=10)
+        Project.objects.bulk_create([
+            Project(title=f'Projet {i}', description=body, short_description='Description courte',
+                    featured=i < 3, created_date=now)
+            for i in range(count)
+        ], batch_size=10)
+        return body
+
+    def measure(self, queryset, iterations):
+        """(ms, pic mémoire en octets, caractères lus) pour l'évaluation du queryset"""
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            list(queryset.all())
+            samples.append(time.perf_counter() - start)
+        tracemalloc.start()
+        rows = list(queryset.all())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        loaded = sum(len(value) for row in rows for value in vars(row).values() if isinstance(value, str))
+        return statistics.median(samples) * 1000, peak, loaded
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        published = BlogPost.objects.filter(status='published')
+        lists = [
+            ('blog (page de 6)', published[:6]),
+            ('accueil : articles', published.select_related('category')[:3]),
+            ('barre latérale', published.order_by('-views')[:5]),
+            ('accueil : projets', Project.objects.filter(featured=True)[:3]),
+            ('portfolio', Project.objects.all()),
+        ]
+        with transaction.atomic():
+            body = self.populate(options['records'], options['size'])
+            self.stdout.write(f"{options['records']} articles et projets de {len(body) / 2**20:.1f} Mo")
+            self.stdout.write(f"{'liste':<22}{'complet ms':>12}{'liste ms':>10}{'complet Mo':>12}"
+                              f"{'liste Mo':>10}{'lu complet':>12}{'lu liste':>10}")
+            for name, queryset in lists:
+                full = self.measure(queryset, iterations)
+                light = self.measure(queryset.for_list(), iterations)
+                self.stdout.write(
+                    f"{name:<22}{full[0]:>12.1f}{light[0]:>10.2f}{full[1] / 2**20:>12.1f}{light[1] / 2**20:>10.2f}"
+                    f"{full[2] / 2**20:>10.1f}Mo{light[2] / 1000:>8.1f}ko"
+                )
+
+            # Extrait vide : le filtre truncatewords parcourait tout le contenu
+            start = time.perf_counter()
+            Truncator(body).words(30)
+            words = time.perf_counter() - start
+            start = time.perf_counter()
+            make_excerpt(body)
+            excerpt = time.perf_counter() - start
+            self.stdout.write(f"extrait d'un article : truncatewords {words * 1000:.1f} ms, "
+                              f"make_excerpt {excerpt * 1e6:.0f} µs")
+            transaction.set_rollback(True)
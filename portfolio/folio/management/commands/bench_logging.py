@@ -0,0 +1,74 @@
+import logging
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from portfolio.log import JSONFormatter, RateLimitFilter, async_file_handler
+
+
+class Command(BaseCommand):
+    help = "Latence d'une requête simulée pendant un flot de logs : FileHandler vs file asynchrone"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--logs-per-request', type=int, default=5)
+        parser.add_argument('--flood-threads', type=int, default=4)
+
+    def measure(self, handler, options):
+        logger = logging.getLogger(f'bench.logging.{id(handler)}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+
+        stop = threading.Event()
+
+        def flood():
+            # Bruit type sonde TLS : le même message en boucle
+            while not stop.is_set():
+                logger.warning("Bad request version (%r)", '\x16\x03\x01')
+
+        flooders = [threading.Thread(target=flood) for _ in range(options['flood_threads'])]
+        for thread in flooders:
+            thread.start()
+
+        latencies = []
+        for i in range(options['requests']):
+            start = time.perf_counter()
+            for j in range(options['logs_per_request']):
+                logger.info("GET /blog/%d/ 200 %d", i, j)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        stop.set()
+        for thread in flooders:
+            thread.join()
+        logger.removeHandler(handler)
+        handler.close()
+
+        latencies.sort()
+        return (
+            statistics.median(latencies),
+            latencies[int(len(latencies) * 0.99) - 1],
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            sync_handler = logging.FileHandler(Path(tmp) / 'sync.log')
+            sync_handler.setFormatter(JSONFormatter())
+
+            async_handler = async_file_handler(Path(tmp) / 'async.log')
+
+            limited_handler = async_file_handler(Path(tmp) / 'limited.log')
+            limited_handler.addFilter(RateLimitFilter(rate=10, per=60))
+
+            self.stdout.write(f"{'handler':<28}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+            for name, handler in [
+                ('FileHandler synchrone', sync_handler),
+                ('file asynchrone', async_handler),
+                ('asynchrone + rate limit', limited_handler),
+            ]:
+                p50, p99 = self.measure(handler, options)
+                self.stdout.write(f"{name:<28}{p50:>10.3f}{p99:>10.3f}")
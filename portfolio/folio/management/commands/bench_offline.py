@@ -0,0 +1,139 @@
+import gzip
+import json
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.cache import get_max_age
+
+from folio import offline
+
+PAGES = ['folio:home', 'folio:about', 'folio:portfolio']
+REFERENCES = re.compile(r'''<(?:link|script|img)\b[^>]*?\b(?:href|src)="(/[^"/][^"]*)"''')
+
+
+class Browser:
+    """Navigateur minimal : cache HTTP (max-age, ETag) et, en option, service worker"""
+
+    def __init__(self, rtt, rate, service_worker=False):
+        self.client = Client(HTTP_ACCEPT_ENCODING='gzip')
+        self.rtt, self.rate = rtt, rate
+        self.service_worker = service_worker
+        self.http_cache = {}
+        self.worker_cache = {}
+        self.now = 0
+        self.background = 0
+
+    def fetch(self, url, etag=None):
+        """(ms, octets transférés, réponse, corps décompressé) d'un échange réseau"""
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        start = time.perf_counter()
+        response = self.client.get(url, secure=True, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        server = time.perf_counter() - start
+        ms = (self.rtt + server + len(body) / self.rate) * 1000
+        text = gzip.decompress(body) if response.get('Content-Encoding') == 'gzip' else body
+        return ms, len(body), response, text.decode(errors='replace')
+
+    def resource(self, url):
+        """(ms, octets) d'une ressource de la page"""
+        if self.service_worker and url in self.worker_cache:
+            return 0, 0
+        cached = self.http_cache.get(url)
+        if cached and cached[0] > self.now:
+            return 0, 0
+        ms, size, response, _ = self.fetch(url, cached and cached[1])
+        if response.status_code == 200:
+            self.http_cache[url] = (self.now + (get_max_age(response) or 0), response.get('ETag'))
+        return ms, size
+
+    def cacheable(self, response):
+        control = response.get('Cache-Control', '')
+        return response.status_code == 200 and 'private' not in control and 'Cookie' not in response.get('Vary', '')
+
+    def page(self, url):
+        """(ms jusqu'aux ressources chargées, octets sur le chemin critique)"""
+        if self.service_worker and url in self.worker_cache:
+            # Stale-while-revalidate : la page est rafraîchie en arrière-plan
+            html = self.worker_cache[url]
+            _, size, response, text = self.fetch(url)
+            self.background += size
+            if self.cacheable(response):
+                self.worker_cache[url] = text
+            ms, total = 0, 0
+        else:
+            ms, total, response, html = self.fetch(url)
+            if self.service_worker and self.cacheable(response):
+                self.worker_cache[url] = html
+        slowest = 0
+        for reference in dict.fromkeys(REFERENCES.findall(html)):
+            resource_ms, size = self.resource(reference)
+            slowest = max(slowest, resource_ms)
+            total += size
+        return ms + slowest, total
+
+    def install(self, manifest):
+        """Précache à l'installation du service worker, après la première page"""
+        for url in manifest['static']:
+            _, size, _, _ = self.fetch(url)
+            self.worker_cache[url] = True
+            self.background += size
+        for url in manifest['pages']:
+            _, size, response, text = self.fetch(url)
+            if self.cacheable(response):
+                self.worker_cache[url] = text
+            self.background += size
+
+
+class Command(BaseCommand):
+    help = ("Visites répétées émulées (sans navigateur) : cache HTTP seul vs service worker "
+            "(précache, cache d'abord, stale-while-revalidate)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rtt', type=float, default=100, help="Aller-retour réseau (ms)")
+        parser.add_argument('--bandwidth', type=float, default=10, help="Débit (Mbit/s)")
+        parser.add_argument('--delay', type=int, default=86400, help="Temps entre deux visites (s)")
+
+    def visits(self, manifest, options, service_worker):
+        browser = Browser(options['rtt'] / 1000, options['bandwidth'] * 1e6 / 8, service_worker)
+        rows = [('1re visite : accueil', *browser.page(reverse(PAGES[0])))]
+        if service_worker:
+            browser.install(manifest)
+        rows.append(('installation', 0, browser.background))
+        for name in PAGES:
+            browser.now += options['delay']
+            browser.background = 0
+            ms, size = browser.page(reverse(name))
+            rows.append((f"retour : {name.split(':')[1]}", ms, size + browser.background))
+        return rows
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            STATIC_ROOT=root,
+            STORAGES=dict(settings.STORAGES, staticfiles={'BACKEND': 'folio.offline.ServiceWorkerStorage'}),
+            DEBUG=False,
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            offline.worker_script.cache_clear()
+            with offline.staticfiles_storage.open(offline.MANIFEST) as f:
+                manifest = json.load(f)
+            self.stdout.write(
+                f"précache {len(manifest['static'])} fichiers, {len(manifest['pages'])} pages ; "
+                f"RTT {options['rtt']:.0f} ms, {options['bandwidth']:.0f} Mbit/s, "
+                f"visites espacées de {options['delay']} s ; ressources d'autres origines non comptées"
+            )
+            # Caches de données chauds : les deux séries mesurent la même chose
+            for name in PAGES:
+                Client().get(reverse(name), secure=True)
+            without = self.visits(manifest, options, service_worker=False)
+            with_worker = self.visits(manifest, options, service_worker=True)
+            offline.worker_script.cache_clear()
+        self.stdout.write(f"{'':<24}{'cache HTTP':>22}{'service worker':>22}")
+        self.stdout.write(f"{'visite':<24}" + f"{'ms':>10}{'octets':>12}" * 2)
+        for (name, ms, size), (_, sw_ms, sw_size) in zip(without, with_worker):
+            self.stdout.write(f"{name:<24}{ms:>10.0f}{size:>12}{sw_ms:>10.0f}{sw_size:>12}")
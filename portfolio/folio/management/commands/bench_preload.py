@@ -0,0 +1,85 @@
+import os
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+PAGES = ['folio:home', 'folio:about', 'folio:blog', 'folio:contact']
+# Tailles transférées (compressées) des ressources des CDN
+CDN_SIZES = {'cdnjs.cloudflare.com': 20_000, 'fonts.googleapis.com': 1_500}
+LINK = re.compile(r'<([^>]+)>; rel=preload; as=(\w+)')
+
+
+class Command(BaseCommand):
+    help = ("Chargement de page simulé : ressources critiques prêtes sans préchargement, "
+            "avec l'en-tête Link et avec 103 Early Hints")
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=50, help="Rendus mesurés par page")
+        parser.add_argument('--rtt', type=float, default=100, help="Aller-retour réseau (ms)")
+        parser.add_argument('--bandwidth', type=float, default=10, help="Débit (Mbit/s)")
+        parser.add_argument('--image-kb', type=float, default=150,
+                            help="Image principale (LCP) simulée, ajoutée par la vue avec preload.add")
+
+    def size(self, url):
+        host = re.match(r'https?://([^/]+)', url)
+        if host:
+            return CDN_SIZES.get(host.group(1), 50_000)
+        path = url.split('?')[0]
+        for prefix in (settings.STATIC_URL, settings.MEDIA_URL):
+            if path.startswith(prefix):
+                found = (finders.find(path[len(prefix):]) if prefix == settings.STATIC_URL
+                         else os.path.join(settings.MEDIA_ROOT, path[len(prefix):]))
+                if found and os.path.exists(found):
+                    return os.path.getsize(found)
+        return 50_000
+
+    def handle(self, *args, **options):
+        rtt = options['rtt'] / 1000
+        rate = options['bandwidth'] * 1e6 / 8
+        client = Client()
+        self.stdout.write(
+            f"RTT {options['rtt']:.0f} ms, {options['bandwidth']:.0f} Mbit/s, sans contention ; temps en ms"
+        )
+        self.stdout.write(f"{'':<30}{'HTML':>8}{'CSS et polices prêtes':>24}{'image LCP chargée':>24}")
+        self.stdout.write(f"{'page':<14}{'rendu':>8}{'TTFB':>8}{'ko':>8}" + f"{'sans':>8}{'Link':>8}{'103':>8}" * 2)
+        for name in PAGES:
+            url = reverse(name)
+            samples = []
+            for _ in range(options['iterations']):
+                start = time.perf_counter()
+                response = client.get(url, secure=True)
+                samples.append(time.perf_counter() - start)
+            server = statistics.median(samples)
+            html = response.content.decode()
+            links = LINK.findall(response.get('Link', ''))
+            # Requête à t=0 ; 103 envoyé dès la réception, réponse après le rendu
+            hints = rtt
+            ttfb = rtt + server
+            ready = {'sans': 0, 'Link': 0, '103': 0}
+            # L'image LCP n'est connue qu'après la vue : dans Link, pas dans le 103
+            image = rtt + options['image_kb'] * 1000 / rate
+            offset = html.find('<img')
+            found = ttfb + (offset if offset >= 0 else len(html)) / rate
+            lcp = {'sans': found + image, 'Link': ttfb + image, '103': ttfb + image}
+            for href, _ in links:
+                # Origine tierce : connexion TCP + TLS 1.3 en plus
+                fetch = rtt * (3 if href.startswith('http') else 1) + self.size(href) / rate
+                offset = html.find(href.replace('&', '&amp;'))
+                if offset < 0:
+                    offset = html.find(href)
+                # Sans préchargement : découverte quand l'analyseur atteint la référence
+                found = ttfb + (offset if offset >= 0 else len(html)) / rate
+                ready['sans'] = max(ready['sans'], found + fetch)
+                ready['Link'] = max(ready['Link'], ttfb + fetch)
+                ready['103'] = max(ready['103'], hints + fetch)
+            self.stdout.write(
+                f"{name.split(':')[1]:<14}{server * 1000:>8.1f}{ttfb * 1000:>8.0f}{len(html) / 1000:>8.0f}"
+                + ''.join(f"{ready[mode] * 1000:>8.0f}" for mode in ready)
+                + ''.join(f"{lcp[mode] * 1000:>8.0f}" for mode in lcp)
+            )
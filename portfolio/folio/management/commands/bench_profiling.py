@@ -0,0 +1,70 @@
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from folio import profiling
+from folio.middleware import ProfilingMiddleware
+
+
+class Command(BaseCommand):
+    help = "Surcoût du ProfilingMiddleware : désactivé, activé sans demande, puis par mode"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=200)
+        parser.add_argument('--page', default='folio:home')
+
+    def timed(self, url, iterations, enabled, **headers):
+        with override_settings(FOLIO_PROFILING=enabled):
+            # Le middleware est chargé à la première requête du client
+            client = Client()
+            client.get(url, secure=True, **headers)
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                client.get(url, secure=True, **headers)
+                samples.append(time.perf_counter() - start)
+        return statistics.median(samples) * 1000, statistics.quantiles(samples, n=100)[98] * 1000
+
+    def middleware_overhead(self, url, iterations=100000):
+        """Coût d'un appel du middleware activé, requête non profilée, en ns"""
+        with override_settings(FOLIO_PROFILING=True):
+            middleware = ProfilingMiddleware(lambda request: None)
+        factory = RequestFactory()
+        requests = [factory.get(url) for _ in range(iterations)]
+        start = time.perf_counter()
+        for request in requests:
+            middleware(request)
+        return (time.perf_counter() - start) / iterations * 1e9
+
+    def handle(self, *args, **options):
+        url = reverse(options['page'])
+        iterations = options['iterations']
+        directory = profiling.DIRECTORY
+        with tempfile.TemporaryDirectory() as tmp:
+            # Profils du banc d'essai hors de l'anneau réel
+            profiling.DIRECTORY = Path(tmp)
+            try:
+                cases = [
+                    ('désactivé', False, {}),
+                    ('activé, non demandé', True, {}),
+                ] + [
+                    (f'profilé ({mode})', True, {'HTTP_X_FOLIO_PROFILE': profiling.make_token(mode)})
+                    for mode in profiling.MODES
+                ]
+                self.stdout.write(f"{url}, {iterations} requêtes par cas")
+                self.stdout.write(f"{'cas':<24}{'p50 ms':>10}{'p99 ms':>10}{'écart p50':>12}")
+                baseline = None
+                for name, enabled, headers in cases:
+                    # Les cas profilés écrivent un fichier par requête : moins d'itérations
+                    count = iterations if not headers else max(iterations // 10, 5)
+                    p50, p99 = self.timed(url, count, enabled, **headers)
+                    baseline = baseline or p50
+                    self.stdout.write(f"{name:<24}{p50:>10.3f}{p99:>10.3f}{(p50 - baseline) / baseline:>+12.1%}")
+                self.stdout.write(f"middleware seul, non demandé : {self.middleware_overhead(url):.0f} ns par requête")
+            finally:
+                profiling.DIRECTORY = directory
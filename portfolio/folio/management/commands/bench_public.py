@@ -0,0 +1,59 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+PAGES = ['folio:home', 'folio:blog', 'folio:contact', 'folio:search_suggest']
+# Les middlewares de Django à la place des variantes du chemin public
+STOCK = {
+    'folio.middleware.SessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'folio.middleware.CsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'folio.middleware.AuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'folio.middleware.MessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+
+class Command(BaseCommand):
+    help = "Coût par requête anonyme avec et sans le chemin public (session, CSRF, auth, messages sautés)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=500)
+
+    def client(self, middleware):
+        # La chaîne de middlewares est construite à la première requête puis gardée
+        client = Client()
+        with override_settings(MIDDLEWARE=middleware):
+            client.get(reverse('folio:home'), secure=True)
+        return client
+
+    def timed(self, client, url):
+        # Visiteur anonyme à chaque requête : aucun cookie renvoyé
+        client.cookies.clear()
+        start = time.perf_counter()
+        client.get(url, secure=True)
+        return time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        fast = list(settings.MIDDLEWARE)
+        stock = [STOCK.get(path, path) for path in fast if path != 'folio.middleware.PublicRequestMiddleware']
+        clients = self.client(stock), self.client(fast)
+        self.stdout.write(f"{'page':<22}{'Django µs':>12}{'public µs':>12}{'gain µs':>10}  cookies Django / public")
+        for name in PAGES:
+            url = reverse(name) + ('?q=dj' if name == 'folio:search_suggest' else '')
+            responses = [client.get(url, secure=True) for client in clients]
+            samples = [], []
+            # Mesures alternées : les deux chaînes subissent le même bruit
+            for _ in range(options['iterations']):
+                for client, times in zip(clients, samples):
+                    times.append(self.timed(client, url))
+            before, after = (statistics.median(times) * 1e6 for times in samples)
+            cookies = [
+                ','.join(response.cookies) + (' +Vary' if 'Cookie' in response.get('Vary', '') else '') or '-'
+                for response in responses
+            ]
+            self.stdout.write(
+                f"{name:<22}{before:>12.0f}{after:>12.0f}{before - after:>10.0f}  {cookies[0]} / {cookies[1]}"
+            )
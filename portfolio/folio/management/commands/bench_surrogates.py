@@ -0,0 +1,170 @@
+import random
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from folio import surrogates
+from folio.models import BlogPost, Category, Comment, Tag
+
+S_MAXAGE = re.compile(r's-maxage=(\d+)')
+
+
+class FakeProxy:
+    """Proxy inverse minimal : garde les réponses avec s-maxage, purge par clé"""
+
+    def __init__(self):
+        self.client = Client()
+        self.pages = {}
+        self.index = defaultdict(set)
+        self.counts = Counter()
+
+    def get(self, url):
+        if url in self.pages:
+            self.counts['hits'] += 1
+            return self.pages[url]
+        self.counts['misses'] += 1
+        response = self.client.get(url, secure=True)
+        body = response.content.decode()
+        if response.status_code == 200 and S_MAXAGE.search(response.get('Cache-Control', '')):
+            self.pages[url] = body
+            for key in response.get(surrogates.HEADER, '').split(surrogates.SEPARATOR):
+                self.index[key].add(url)
+        return body
+
+    def purge(self, keys):
+        """Nombre de pages retirées"""
+        urls = set().union(*(self.index.pop(key, set()) for key in keys))
+        for url in urls:
+            self.pages.pop(url, None)
+        return len(urls)
+
+
+class Command(BaseCommand):
+    help = ("Pages publiques derrière un proxy émulé, pendant des modifications : taux de succès, "
+            "pages servies périmées et pages purgées par modification, selon la stratégie de purge")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=60)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--edit-every', type=int, default=50, help="Requêtes entre deux modifications")
+        parser.add_argument('--zipf', type=float, default=1.1, help="Exposant de la popularité des pages")
+
+    def populate(self, count):
+        """Articles synthétiques (annulés à la fin), titres uniques pour repérer les pages périmées"""
+        author = User.objects.create(username='bench-surrogates')
+        categories = [Category.objects.create(name=f'Bench {i}', slug=f'bench-{i}') for i in range(4)]
+        tags = [Tag.objects.create(name=f'Bench {i}', slug=f'bench-{i}') for i in range(8)]
+        now = timezone.now()
+        posts = []
+        for i in range(count):
+            post = BlogPost.objects.create(
+                title=f'Bench-{i:03d} r0', slug=f'bench-surrogates-{i}', author=author, content='Contenu',
+                status='published', published_date=now - timedelta(days=7 * i), category=categories[i % 4],
+            )
+            post.tags.set(random.Random(i).sample(tags, 2))
+            posts.append(post)
+        return posts
+
+    def urls(self, posts):
+        """Pages publiques, les plus demandées d'abord"""
+        now = timezone.localtime()
+        urls = [reverse('folio:home'), reverse('folio:blog'), reverse('folio:portfolio'), reverse('folio:about')]
+        urls += [post.get_absolute_url() for post in posts]
+        urls += [f"{reverse('folio:blog')}?page={page}" for page in range(2, 6)]
+        urls += [reverse('folio:blog_archive_year', args=[now.year]),
+                 reverse('folio:blog_archive_month', args=[now.year, now.month])]
+        urls += [reverse('folio:api_list', args=['posts'])]
+        urls += [reverse('folio:api_detail', args=['posts', post.slug]) for post in posts]
+        return urls
+
+    def edit(self, rng, posts, revision):
+        """Modification de l'admin : titre d'un article, commentaire approuvé ou nouvel article"""
+        roll = rng.random()
+        # Purges exécutées comme à la fin de la transaction de l'admin
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            if roll < 0.8:
+                post = posts[min(int(rng.paretovariate(1)) - 1, len(posts) - 1)]
+                old = post.title
+                post.title = f'{old.split()[0]} r{revision}'
+                post.save()
+                return old
+            if roll < 0.9:
+                Comment.objects.create(post=rng.choice(posts), name='A', email='a@x.fr', content='Merci')
+                return None
+            BlogPost.objects.create(
+                title=f'Nouveau-{revision} r0', slug=f'bench-surrogates-new-{revision}', author=posts[0].author,
+                content='Contenu', status='published', published_date=timezone.now(), category=posts[0].category,
+            )
+            return None
+
+    def run(self, strategy, posts, urls, options):
+        rng = random.Random(7)
+        weights = [1 / (rank + 1) ** options['zipf'] for rank in range(len(urls))]
+        proxy = FakeProxy()
+        purger = surrogates.get_purger()
+        purger.requests.clear()
+        stale = fanout = edits = requests = sent = 0
+        for i in range(options['requests']):
+            proxy.get(rng.choices(urls, weights)[0])
+            if (i + 1) % options['edit_every']:
+                continue
+            edits += 1
+            old_title = self.edit(rng, posts, edits)
+            batches = [[surrogates.ALL]] if strategy == 'tout' else purger.requests[:]
+            purger.requests.clear()
+            if strategy != 'aucune':
+                keys = [key for batch in batches for key in batch]
+                fanout += proxy.purge(keys)
+                requests += len(batches)
+                sent += len(keys)
+            if old_title:
+                stale += sum(old_title in body for body in proxy.pages.values())
+        lookups = proxy.counts['hits'] + proxy.counts['misses']
+        return {
+            'hits': proxy.counts['hits'] / lookups,
+            'renders': proxy.counts['misses'],
+            'stale': stale,
+            'fanout': fanout / max(edits, 1),
+            'requests': requests / max(edits, 1),
+            'keys': sent / max(edits, 1),
+        }
+
+    def handle(self, *args, **options):
+        purger = {'BACKEND': 'folio.surrogates.MemoryPurger'}
+        rows = []
+        with override_settings(FOLIO_SURROGATE_PURGER=purger, FOLIO_JOBS_ENABLED=False):
+            surrogates.get_purger.cache_clear()
+            try:
+                with transaction.atomic():
+                    with TestCase.captureOnCommitCallbacks(execute=True):
+                        posts = self.populate(options['posts'])
+                    urls = self.urls(posts)
+                    for strategy in ('aucune', 'tout', 'clés'):
+                        # Même base au départ de chaque stratégie
+                        savepoint = transaction.savepoint()
+                        rows.append((strategy, self.run(strategy, posts, urls, options)))
+                        transaction.savepoint_rollback(savepoint)
+                        for post in posts:
+                            post.refresh_from_db()
+                    transaction.set_rollback(True)
+            finally:
+                surrogates.get_purger.cache_clear()
+        self.stdout.write(
+            f"{len(urls)} pages, {options['requests']} requêtes (Zipf {options['zipf']}), "
+            f"une modification toutes les {options['edit_every']} requêtes"
+        )
+        self.stdout.write("par modification : requêtes de purge, clés envoyées, pages retirées du proxy")
+        self.stdout.write(f"{'purge':<10}{'succès':>10}{'rendus':>10}{'périmées':>10}"
+                          f"{'requêtes':>10}{'clés':>8}{'pages':>8}")
+        for strategy, row in rows:
+            self.stdout.write(
+                f"{strategy:<10}{row['hits']:>10.1%}{row['renders']:>10}{row['stale']:>10}"
+                f"{row['requests']:>10.1f}{row['keys']:>8.1f}{row['fanout']:>8.1f}"
+            )
@@ -0,0 +1,91 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from django.template import engines
+from django.test import RequestFactory
+
+from folio.models import (
+    Profile, Project, Skill, Experience, Education, BlogPost, Comment
+)
+
+
+class Command(BaseCommand):
+    help = "Compare le temps de rendu des moteurs Django et Jinja2 sur les pages publiques"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--iterations', type=int, default=200)
+
+    def build_contexts(self):
+        """Contextes identiques pour les deux moteurs (requêtes déjà évaluées)"""
+        profile = Profile.objects.select_related('user').first()
+        skills = list(Skill.objects.all().order_by('category', '-level'))
+        contexts = {
+            'home.html': {
+                'profile': profile,
+                'featured_projects': list(
+                    Project.objects.filter(featured=True).prefetch_related('technologies')[:3]
+                ),
+                'skills': skills,
+                'latest_posts': list(
+                    BlogPost.objects.filter(status='published').select_related('category')[:3]
+                ),
+            },
+            'about.html': {
+                'profile': profile,
+                'experiences': list(Experience.objects.all()),
+                'education': list(Education.objects.all()),
+                'skills': skills,
+            },
+            'contact.html': {},
+        }
+
+        post = (
+            BlogPost.objects.filter(status='published')
+            .select_related('author', 'category')
+            .prefetch_related('tags')
+            .first()
+        )
+        if post:
+            comments = post.comments.filter(active=True, parent=None).prefetch_related(
+                Prefetch('replies', queryset=Comment.objects.all())
+            )
+            len(comments)
+            contexts['blog_details.html'] = {
+                'post': post,
+                'comments': comments,
+                'related_posts': list(
+                    BlogPost.objects.filter(status='published', category=post.category)
+                    .exclude(id=post.id).select_related('category')[:3]
+                ),
+            }
+        return contexts
+
+    def time_render(self, template, context, request, iterations):
+        template.render(context, request)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            template.render(context, request)
+        return (time.perf_counter() - start) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        self.stdout.write(f"{'template':<20}{'django (ms)':>14}{'jinja2 (ms)':>14}{'gain':>8}")
+        for name, context in self.build_contexts().items():
+            timings = []
+            for alias in ('django', 'jinja2'):
+                try:
+                    template = engines[alias].get_template(name)
+                    timings.append(self.time_render(template, context, request, iterations))
+                except Exception as exc:
+                    self.stderr.write(f"{name} [{alias}] ignoré : {exc}")
+                    break
+            if len(timings) == 2:
+                django_ms, jinja_ms = timings
+                self.stdout.write(
+                    f"{name:<20}{django_ms:>14.3f}{jinja_ms:>14.3f}{django_ms / jinja_ms:>7.1f}x"
+                )
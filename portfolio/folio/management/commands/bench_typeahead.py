@@ -0,0 +1,98 @@
+import pickle
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from folio import typeahead
+from folio.typeahead import PrefixIndex
+
+WORDS = (
+    "déploiement django élégant café crème ouvrage œuvre éphémère réseau sécurité données "
+    "modèle requête théâtre forêt hôpital goût naïf noël garçon leçon façade château fenêtre "
+    "développement intégration performance mémoire cache index recherche préfixe serveur client "
+    "python postgres redis gunicorn nginx docker noyau système fichier image vidéo musique été "
+    "hiver printemps automne île côte plage montagne vallée rivière océan étoile planète"
+).split()
+
+
+class Command(BaseCommand):
+    help = "Construction, mémoire et latence de l'index de suggestions sur des titres synthétiques"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=100000)
+        parser.add_argument('-n', '--iterations', type=int, default=2000)
+
+    def synthetic(self, count):
+        rng = random.Random(42)
+        # Mots rares en plus du vocabulaire commun, comme des noms propres
+        rare = [f'{rng.choice(WORDS)}{n}' for n in range(count // 2)]
+        index = PrefixIndex()
+        for pk in range(1, count + 1):
+            words = rng.sample(WORDS, rng.randint(3, 7)) + [rng.choice(rare)]
+            rng.shuffle(words)
+            index.append(len(typeahead.SOURCES) - 1, pk, f'article-{pk}', ' '.join(words).capitalize())
+        index.sort_words()
+        return index
+
+    def handle(self, *args, **options):
+        count, iterations = options['titles'], options['iterations']
+        start = time.perf_counter()
+        index = self.synthetic(count)
+        built = time.perf_counter() - start
+        snapshot = pickle.dumps(index.to_dict(), pickle.HIGHEST_PROTOCOL)
+        start = time.perf_counter()
+        PrefixIndex.from_dict(pickle.loads(snapshot))
+        loaded = time.perf_counter() - start
+        # Mémoire de l'index tel qu'un worker le charge depuis le cache
+        tracemalloc.start()
+        index = PrefixIndex.from_dict(pickle.loads(snapshot))
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{count} titres, {len(index.words)} mots : construit en {built:.2f} s, "
+            f"{memory / 2**20:.1f} Mo en mémoire, instantané {len(snapshot) / 2**20:.1f} Mo "
+            f"chargé en {loaded * 1000:.0f} ms"
+        )
+
+        # Les résultats ne contiennent pas l'URL : seule la recherche est mesurée
+        index.result = lambda i: i
+        queries = [
+            ('1 lettre', 'd'),
+            ('préfixe court', 'dé'),
+            ('mot accentué', 'Éphém'),
+            ('ligature', 'oeuv'),
+            ('mot rare', 'chateau123'),
+            ('deux mots', 'cafe cre'),
+            ('trois mots', 'perf memoire cach'),
+            ('aucun résultat', 'zzz'),
+        ]
+        self.stdout.write(f"{'requête':<18}{'q':<20}{'résultats':>10}{'1re µs':>10}{'p50 µs':>10}{'p99 µs':>10}")
+        for name, query in queries:
+            index.memo.clear()
+            start = time.perf_counter()
+            index.search(query)
+            first = (time.perf_counter() - start) * 1e6
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                results = index.search(query)
+                samples.append(time.perf_counter() - start)
+            p50 = statistics.median(samples) * 1e6
+            p99 = statistics.quantiles(samples, n=100)[98] * 1e6
+            self.stdout.write(f"{name:<18}{query:<20}{len(results):>10}{first:>10.0f}{p50:>10.1f}{p99:>10.1f}")
+
+        # Mises à jour incrémentales, comme rejouées depuis le journal
+        kind = len(typeahead.SOURCES) - 1
+        start = time.perf_counter()
+        for pk in range(1, 1001):
+            index.apply(('set', kind, pk, f'article-{pk}', f'Titre modifié numéro {pk}'))
+        updated = (time.perf_counter() - start) / 1000
+        start = time.perf_counter()
+        for pk in range(1001, 2001):
+            index.apply(('del', kind, pk))
+        deleted = (time.perf_counter() - start) / 1000
+        self.stdout.write(f"modification {updated * 1e6:.0f} µs, suppression {deleted * 1e6:.0f} µs par entrée, "
+                          f"mémo {index.memo_size} entrées")
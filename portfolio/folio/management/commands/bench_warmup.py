@@ -0,0 +1,144 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from folio.models import BlogPost
+
+PAGES = ['folio:home', 'folio:about', 'folio:portfolio', 'folio:blog', 'folio:contact']
+# (préchargement, préchauffage, gc.freeze)
+MODES = {
+    'froid': ('0', '0', '0'),
+    'préchauffé': ('0', '1', '0'),
+    'préchargé': ('1', '1', '0'),
+    'préchargé+freeze': ('1', '1', '1'),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def worker_pids(master):
+    pids = []
+    for entry in Path('/proc').iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+        except OSError:
+            continue
+        # Le nom du processus, entre parenthèses, peut contenir des espaces
+        if int(stat.rsplit(')', 1)[1].split()[1]) == master:
+            pids.append(int(entry.name))
+    return pids
+
+
+def memory(pid):
+    """RSS, PSS et USS en Ko, d'après /proc/<pid>/smaps_rollup"""
+    values = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+        key, _, rest = line.partition(':')
+        if rest.strip().endswith('kB'):
+            values[key] = int(rest.split()[0])
+    uss = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return values.get('Rss', 0), values.get('Pss', 0), uss
+
+
+class Command(BaseCommand):
+    help = "Latence de la première requête et mémoire par worker gunicorn, selon le préchargement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--mode', action='append', choices=list(MODES))
+        parser.add_argument('--requests', type=int, default=20, help="Requêtes par page avant la mesure mémoire")
+        parser.add_argument('--settle', type=float, default=2.0,
+                            help="Attente après le démarrage des workers, le temps qu'ils chargent l'application")
+
+    def urls(self):
+        urls = [reverse(name) for name in PAGES]
+        post = BlogPost.objects.filter(status='published').first()
+        if post:
+            urls.append(reverse('folio:blog_detail', args=[post.slug]))
+        return urls
+
+    def get(self, port, url):
+        request = urllib.request.Request(
+            f'http://127.0.0.1:{port}{url}',
+            # Schéma https reconnu par gunicorn (forwarded_allow_ips), sans redirection SSL
+            headers={'X-Forwarded-Proto': 'https', 'Host': 'localhost'},
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        return status, time.perf_counter() - start
+
+    def wait_ready(self, process, port, workers, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"gunicorn s'est arrêté (code {process.returncode})")
+            with socket.socket() as sock:
+                if sock.connect_ex(('127.0.0.1', port)) == 0 and len(worker_pids(process.pid)) >= workers:
+                    return
+            time.sleep(0.1)
+        raise CommandError("gunicorn ne répond pas")
+
+    def measure(self, mode, urls, options):
+        preload, warm, freeze = MODES[mode]
+        port = free_port()
+        env = dict(os.environ, GUNICORN_PRELOAD=preload, FOLIO_WARMUP=warm, FOLIO_GC_FREEZE=freeze,
+                   GUNICORN_WORKERS=str(options['workers']), GUNICORN_BIND=f'127.0.0.1:{port}')
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'portfolio.wsgi'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            started = time.perf_counter()
+            self.wait_ready(process, port, options['workers'])
+            ready = time.perf_counter() - started
+            # Les workers chargent l'application après le fork : la première
+            # requête ne doit mesurer que ce qui reste paresseux
+            time.sleep(options['settle'])
+            first = [self.get(port, url) for url in urls]
+            for _ in range(options['requests']):
+                for url in urls:
+                    self.get(port, url)
+            pids = worker_pids(process.pid)
+            usage = [memory(pid) for pid in pids]
+        finally:
+            process.terminate()
+            _, stderr = process.communicate(timeout=30)
+
+        self.stdout.write(f"\n{mode} (workers lancés en {ready:.2f} s)")
+        for url, (status, seconds) in zip(urls, first):
+            self.stdout.write(f"  {url:<40}{status:>5}{seconds * 1000:>10.1f} ms")
+        for pid, (rss, pss, uss) in zip(pids, usage):
+            self.stdout.write(f"  worker {pid:<8} RSS {rss / 1024:>7.1f} Mo  PSS {pss / 1024:>7.1f} Mo"
+                              f"  USS {uss / 1024:>7.1f} Mo")
+        if usage:
+            self.stdout.write(f"  USS moyen {sum(u for _, _, u in usage) / len(usage) / 1024:.1f} Mo")
+        for line in stderr.splitlines():
+            if 'préchauffage' in line or 'gc.freeze' in line:
+                self.stdout.write(f"  {line.split('] ', 3)[-1]}")
+
+    def handle(self, *args, **options):
+        if not Path('/proc/self/smaps_rollup').exists():
+            raise CommandError("/proc/<pid>/smaps_rollup requis (Linux)")
+        urls = self.urls()
+        for mode in options['mode'] or MODES:
+            self.measure(mode, urls, options)
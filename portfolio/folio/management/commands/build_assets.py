@@ -0,0 +1,235 @@
+import gzip
+import io
+import json
+import re
+import urllib.request
+from pathlib import Path
+
+import rcssmin
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from folio import assets
+
+FONT_AWESOME_BASE = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+# Latin-1, ligatures et ponctuation typographique : suffisant pour le contenu français
+FRENCH_UNICODES = (
+    list(range(0x20, 0x7F)) + list(range(0xA0, 0x100))
+    + [0x152, 0x153, 0x178, 0x2013, 0x2014, 0x2018, 0x2019, 0x201C, 0x201D,
+       0x2022, 0x2026, 0x202F, 0x20AC]
+)
+# Police Font Awesome requise par chaque classe de style
+FONT_AWESOME_STYLES = {
+    'fa-solid-900': {'fa', 'fas', 'fa-solid'},
+    'fa-regular-400': {'far', 'fa-regular'},
+    'fa-brands-400': {'fab', 'fa-brands'},
+}
+ICON_CLASS = re.compile(r'(?<![\w-])(fa[srb]?|fa-[a-z0-9-]+)(?![\w-])')
+BROWSER_UA = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+
+def gz_size(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return len(gzip.compress(data, 9))
+
+
+class Command(BaseCommand):
+    help = (
+        "Construit les assets statiques hors ligne : icônes et polices réduites, "
+        "CSS critique par page (static/build/), puis collectstatic avec --collect"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fontawesome-dir', help="Copie locale de Font Awesome 6 (css/ et webfonts/)")
+        parser.add_argument('--inter-file', help="Fichier woff2/ttf local de la police Inter (variable)")
+        parser.add_argument('--no-db', action='store_true', help="Ne pas lire les icônes des Skill en base")
+        parser.add_argument('--collect', action='store_true', help="Lancer collectstatic après le build")
+
+    # Sources ----------------------------------------------------------------
+
+    def fetch(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': BROWSER_UA})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.read()
+        except OSError as exc:
+            raise CommandError(
+                f"Téléchargement impossible ({url}) : {exc}. "
+                "Utilisez --fontawesome-dir / --inter-file pour un build hors ligne."
+            )
+
+    def fontawesome_file(self, relative):
+        if self.options['fontawesome_dir']:
+            return (Path(self.options['fontawesome_dir']) / relative).read_bytes()
+        return self.fetch(f'{FONT_AWESOME_BASE}/{relative}')
+
+    def template_files(self):
+        for directory in (settings.BASE_DIR / 'templates', settings.BASE_DIR / 'jinja2'):
+            if directory.is_dir():
+                yield from sorted(directory.rglob('*.html'))
+
+    def used_icons(self):
+        icons = set()
+        for path in self.template_files():
+            icons |= set(ICON_CLASS.findall(path.read_text(encoding='utf-8')))
+        if not self.options['no_db']:
+            # Les icônes des compétences sont saisies dans l'admin
+            try:
+                from folio.models import Skill
+                for icon in Skill.objects.exclude(icon='').values_list('icon', flat=True):
+                    icons |= set(ICON_CLASS.findall(icon))
+            except Exception as exc:
+                self.stderr.write(f"Icônes des Skill ignorées : {exc}")
+        return icons
+
+    # Sous-ensembles -----------------------------------------------------------
+
+    def subset_font(self, data, unicodes):
+        """Retourne la police woff2 réduite, ou None si aucun glyphe n'est conservé"""
+        try:
+            from fontTools import subset
+            from fontTools.ttLib import TTFont
+        except ImportError:
+            raise CommandError("fonttools et brotli sont requis : pip install fonttools brotli")
+
+        font = TTFont(io.BytesIO(data))
+        available = set(font.getBestCmap())
+        if not available & set(unicodes):
+            return None
+        options = subset.Options()
+        options.flavor = 'woff2'
+        options.layout_features = ['*']
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=unicodes)
+        subsetter.subset(font)
+        out = io.BytesIO()
+        font.save(out)
+        return out.getvalue()
+
+    def build_icons(self, out_dir, report):
+        icons = self.used_icons()
+        source = self.fontawesome_file('css/all.min.css').decode('utf-8')
+        report['before_blocking'] += gz_size(source)
+
+        def keep(selector):
+            return {c for c in assets.selector_classes(selector) if ICON_CLASS.fullmatch(c)} <= icons
+
+        nodes = assets.filter_css(assets.parse_css(source), keep)
+        kept = assets.serialize_css([n for n in nodes if not n[1].startswith('@font-face')])
+        codepoints = {
+            int(cp, 16)
+            for cp in re.findall(r'(?:content|--fa)\s*:\s*"\\([0-9a-fA-F]{4,5})"', kept)
+        }
+
+        font_faces, fonts = [], []
+        for node in nodes:
+            if node[0] != 'rule' or not node[1].startswith('@font-face'):
+                continue
+            body = assets.serialize_css(node[2])
+            match = re.search(r'url\((?:\.\./)?webfonts/([\w-]+)\.woff2\)', body)
+            if not match:
+                continue
+            name = match.group(1)
+            if name in FONT_AWESOME_STYLES and not FONT_AWESOME_STYLES[name] & icons:
+                continue
+            original = self.fontawesome_file(f'webfonts/{name}.woff2')
+            report['before_total'] += len(original)
+            subset = self.subset_font(original, sorted(codepoints))
+            if subset is None:
+                continue
+            (out_dir / 'fonts' / f'{name}.woff2').write_bytes(subset)
+            report['after_total'] += len(subset)
+            fonts.append(f'{assets.BUILD_DIR}/fonts/{name}.woff2')
+            body = re.sub(r'src\s*:[^;]+;', f'src:url(fonts/{name}.woff2) format("woff2");', body + ';')
+            font_faces.append(f'@font-face{{{body}}}')
+
+        self.stdout.write(f"Font Awesome : {len(icons)} classes, {len(codepoints)} glyphes")
+        return ''.join(font_faces) + kept, fonts
+
+    def build_inter(self, out_dir, report):
+        if self.options['inter_file']:
+            original = Path(self.options['inter_file']).read_bytes()
+        else:
+            css = self.fetch(assets.GOOGLE_FONTS_CSS).decode('utf-8')
+            report['before_blocking'] += gz_size(css)
+            # Bloc « latin » : celui dont la plage commence à U+0000
+            blocks = re.findall(r'@font-face\s*{([^}]*)}', css)
+            latin = [b for b in blocks if re.search(r'unicode-range:\s*U\+0000', b)]
+            if not latin:
+                raise CommandError("Sous-ensemble latin introuvable dans la feuille Google Fonts")
+            original = self.fetch(re.search(r'url\(([^)]+)\)', latin[0]).group(1))
+        report['before_total'] += len(original)
+
+        subset = self.subset_font(original, FRENCH_UNICODES)
+        (out_dir / 'fonts' / 'inter.woff2').write_bytes(subset)
+        report['after_total'] += len(subset)
+        face = (
+            "@font-face{font-family:'Inter';font-style:normal;font-weight:300 800;"
+            "font-display:swap;src:url(fonts/inter.woff2) format('woff2')}"
+        )
+        return face, [f'{assets.BUILD_DIR}/fonts/inter.woff2']
+
+    def build_critical(self, out_dir, fonts_css_size, report):
+        source_dir = Path(settings.STATICFILES_DIRS[0])
+        stylesheet = (source_dir / 'src' / 'output.css').read_text(encoding='utf-8')
+        nodes = assets.parse_css(stylesheet)
+        base = (settings.BASE_DIR / 'templates' / 'base.html').read_text(encoding='utf-8')
+
+        def drop_remote_fonts(prelude, children):
+            return prelude.startswith('@font-face') and 'fonts.gstatic.com' in assets.serialize_css(children)
+
+        critical, pages = {}, []
+        for path in sorted((settings.BASE_DIR / 'templates').glob('*.html')):
+            text = path.read_text(encoding='utf-8')
+            if path.name != 'base.html' and "extends 'base.html'" not in text:
+                continue
+            tokens = assets.template_tokens(text) | assets.template_tokens(base)
+            page_nodes = assets.filter_css(
+                nodes, lambda s: assets.selector_classes(s) <= tokens, drop_remote_fonts
+            )
+            css = rcssmin.cssmin(assets.serialize_css(page_nodes))
+            (out_dir / 'critical' / f'{path.stem}.css').write_text(css, encoding='utf-8')
+            critical[path.name] = f'{assets.BUILD_DIR}/critical/{path.stem}.css'
+            pages.append({
+                'template': path.name,
+                'before_blocking': report['before_blocking'] + gz_size(stylesheet),
+                'after_blocking': gz_size(css) + fonts_css_size,
+                'before_total': report['before_blocking'] + report['before_total'] + gz_size(stylesheet),
+                'after_total': gz_size(css) + fonts_css_size + report['after_total'] + gz_size(stylesheet),
+            })
+        return critical, pages
+
+    def handle(self, *args, **options):
+        self.options = options
+        out_dir = Path(settings.STATICFILES_DIRS[0]) / assets.BUILD_DIR
+        for sub in ('fonts', 'critical'):
+            (out_dir / sub).mkdir(parents=True, exist_ok=True)
+
+        report = {'before_blocking': 0, 'before_total': 0, 'after_total': 0}
+        icons_css, icon_fonts = self.build_icons(out_dir, report)
+        inter_css, inter_fonts = self.build_inter(out_dir, report)
+        fonts_css = rcssmin.cssmin(inter_css + icons_css)
+        (out_dir / 'fonts.css').write_text(fonts_css, encoding='utf-8')
+
+        critical, pages = self.build_critical(out_dir, gz_size(fonts_css), report)
+        manifest = {
+            'stylesheet': f'{assets.BUILD_DIR}/fonts.css',
+            'fonts': inter_fonts + icon_fonts,
+            'critical': critical,
+            'report': pages,
+        }
+        (out_dir / 'assets.json').write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+
+        self.stdout.write(
+            f"\n{'page':<24}{'bloquant avant':>16}{'après':>10}{'total avant':>14}{'après':>10}   (octets gzip)"
+        )
+        for page in pages:
+            self.stdout.write(
+                f"{page['template']:<24}{page['before_blocking']:>16}{page['after_blocking']:>10}"
+                f"{page['before_total']:>14}{page['after_total']:>10}"
+            )
+
+        if options['collect']:
+            call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
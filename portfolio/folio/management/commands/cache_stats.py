@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from folio import caching
+
+
+class Command(BaseCommand):
+    help = "Affiche les compteurs du cache des pages du folio"
+
+    def handle(self, *args, **options):
+        stats = caching.stats()
+        for metric, value in stats.items():
+            self.stdout.write(f"{metric:<12}{value:>10}")
+        lookups = stats['hits'] + stats['misses'] + stats['stale']
+        if lookups:
+            self.stdout.write(f"{'hit ratio':<12}{(stats['hits'] + stats['stale']) / lookups:>10.1%}")
@@ -0,0 +1,33 @@
+import sys
+from itertools import chain
+
+from django.core.management.base import BaseCommand, CommandError
+
+from folio.content import post_records, project_records, write_jsonl, write_markdown
+
+
+class Command(BaseCommand):
+    help = "Exporte articles et projets en JSONL ou en fichiers Markdown, en mémoire constante"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['jsonl', 'markdown'], default='jsonl')
+        parser.add_argument('-o', '--output', default='-',
+                            help="Fichier JSONL (- pour stdout) ou dossier Markdown")
+        parser.add_argument('--type', action='append', dest='types', choices=['posts', 'projects'])
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        types = options['types'] or ['posts', 'projects']
+        sources = {'posts': post_records, 'projects': project_records}
+        records = chain.from_iterable(sources[name](options['chunk_size']) for name in types)
+
+        if options['format'] == 'markdown':
+            if options['output'] == '-':
+                raise CommandError("Le format markdown demande un dossier (--output)")
+            count = write_markdown(records, options['output'])
+        elif options['output'] == '-':
+            count = write_jsonl(records, sys.stdout)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                count = write_jsonl(records, stream)
+        self.stderr.write(f"{count} enregistrements exportés")
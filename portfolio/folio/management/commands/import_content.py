@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from folio.content import ContentError, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = "Importe articles et projets en masse depuis du JSONL ou des fichiers Markdown (front matter)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', help="Fichiers .jsonl/.md, dossiers, ou - pour stdin")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--author', help="Auteur des articles qui n'en précisent pas (username)")
+        parser.add_argument('--no-create', action='store_true',
+                            help="Ne pas créer les catégories, tags et compétences absents")
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            chunk_size=options['chunk_size'],
+            default_author=options['author'],
+            create_missing=not options['no_create'],
+            log=self.stderr.write,
+        )
+        records = (record for source in options['sources'] for record in read_records(source))
+        try:
+            counts = importer.run(records)
+        except (OSError, ContentError) as exc:
+            raise CommandError(exc)
+
+        rows = counts['posts'] + counts['projects'] + counts['m2m']
+        seconds = counts['seconds'] or 1e-9
+        self.stdout.write(
+            f"{counts['posts']} articles, {counts['projects']} projets, {counts['m2m']} liens m2m "
+            f"({counts['skipped']} déjà présents, {counts['errors']} erreurs) "
+            f"en {seconds:.2f}s : {rows / seconds:.0f} lignes/s"
+        )
@@ -0,0 +1,41 @@
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from folio.blobs import Collector, ContentAddressedStorage
+
+
+class Command(BaseCommand):
+    help = "Supprime les blobs des fichiers envoyés qui ne sont plus référencés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adopt', action='store_true',
+                            help="Rattacher aux blobs les fichiers d'avant le stockage par contenu (dédoublonnage)")
+        parser.add_argument('--orphans', action='store_true',
+                            help="Supprimer aussi les fichiers qu'aucun FileField ne référence")
+        parser.add_argument('--dry-run', action='store_true', help="Compter sans rien supprimer")
+        parser.add_argument('--grace', type=int, default=3600,
+                            help="Âge minimal (secondes) d'un fichier supprimable : envois en cours")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.1, help="Pause entre deux lots (secondes)")
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError("Le stockage par défaut n'est pas folio.blobs.ContentAddressedStorage")
+        stats = Collector(
+            storage,
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            grace=options['grace'],
+            adopt=options['adopt'],
+            orphans=options['orphans'],
+            dry_run=options['dry_run'],
+            log=self.stderr.write,
+        ).run()
+        prefix = "(simulation) " if options['dry_run'] else ""
+        self.stdout.write(
+            f"{prefix}{stats['blobs']} blobs et {stats['temporary']} fichiers temporaires supprimés, "
+            f"{stats['kept']} blobs conservés ; {stats['orphans']} noms orphelins, "
+            f"{stats['adopted']} fichiers rattachés, {stats['duplicates']} doublons remplacés ; "
+            f"{stats['bytes']} octets libérés en {stats['seconds']:.1f}s"
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from folio import surrogates
+
+
+class Command(BaseCommand):
+    help = "Purge les pages gardées par le CDN : toutes (après un déploiement) ou celles des clés données"
+
+    def add_arguments(self, parser):
+        parser.add_argument('keys', nargs='*', help="Clés de substitution (post-12, posts...) ; toutes par défaut")
+
+    def handle(self, *args, **options):
+        keys = options['keys'] or [surrogates.ALL]
+        # Tout de suite, sans passer par la file de tâches
+        surrogates.send(keys)
+        self.stdout.write(f"Purgé : {' '.join(keys)}")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from folio.retention import Runner, get_policies
+
+
+class Command(BaseCommand):
+    help = "Archive puis supprime les commentaires rejetés, les messages lus et les tâches terminées expirés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policy', action='append', dest='policies', help="Limiter à cette politique")
+        parser.add_argument('--dry-run', action='store_true', help="Afficher ce qui serait archivé")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.1, help="Pause entre deux lots (secondes)")
+        parser.add_argument('--max-rows', type=int, help="Arrêter après ce nombre de lignes (reprise au prochain passage)")
+
+    def handle(self, *args, **options):
+        policies = get_policies()
+        names = options['policies'] or list(policies)
+        unknown = set(names) - policies.keys()
+        if unknown:
+            raise CommandError(f"Politique inconnue : {', '.join(sorted(unknown))}")
+
+        for name in names:
+            policy = policies[name]
+            runner = Runner(
+                policy,
+                chunk_size=options['chunk_size'],
+                pause=options['pause'],
+                max_rows=options['max_rows'],
+                log=self.stderr.write,
+            )
+            if options['dry_run']:
+                stats = runner.report()
+                self.stdout.write(
+                    f"{name} ({policy.days} j, archive {policy.archive}) : {stats['rows']} lignes "
+                    f"du {stats['oldest'] or '-'} au {stats['newest'] or '-'}, ~{stats['bytes']} octets archivés"
+                )
+                continue
+            done = runner.run()
+            self.stdout.write(
+                f"{name} : {done['rows']} lignes archivées en {done['batches']} lots "
+                f"({done['bytes']} octets) en {done['seconds']:.1f}s"
+            )
@@ -0,0 +1,94 @@
+import logging
+import multiprocessing
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connections
+
+from folio import jobs
+
+logger = logging.getLogger('folio')
+
+
+def work(stop, done, failed, batch_size, kinds, poll_interval, burst):
+    """Boucle d'un worker : réclame un lot, l'exécute, attend si la file est vide"""
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                ok, ko = jobs.run_once(batch_size, kinds)
+            except DatabaseError:
+                logger.exception("Erreur de base de données dans le worker")
+                stop.wait(poll_interval)
+                continue
+            with done.get_lock():
+                done.value += ok
+            with failed.get_lock():
+                failed.value += ko
+            if not ok and not ko:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches différées du folio (file en base, sans broker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--concurrency', type=int, default=2)
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--kind', action='append', dest='kinds', help="Limiter à ce type de tâche")
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--stats-interval', type=float, default=10.0)
+        parser.add_argument('--burst', action='store_true', help="Quitter quand la file est vide")
+
+    def handle(self, *args, **options):
+        if options['pool'] == 'process':
+            ctx = multiprocessing.get_context('fork')
+            spawn = ctx.Process
+            # Les connexions ne doivent pas être partagées avec les processus fils
+            connections.close_all()
+        else:
+            ctx = multiprocessing.get_context()
+            spawn = threading.Thread
+
+        stop = ctx.Event()
+        done, failed = ctx.Value('l', 0), ctx.Value('l', 0)
+        workers = [
+            spawn(target=work, daemon=True, args=(
+                stop, done, failed, options['batch_size'], options['kinds'],
+                options['poll_interval'], options['burst'],
+            ))
+            for _ in range(options['concurrency'])
+        ]
+        start = last_time = time.monotonic()
+        last_done = 0
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"{len(workers)} worker(s) ({options['pool']}) démarré(s)")
+
+        try:
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(options['stats_interval'] / len(workers))
+                now = time.monotonic()
+                if now - last_time >= options['stats_interval']:
+                    rate = (done.value - last_done) / (now - last_time)
+                    self.stdout.write(
+                        f"réussies={done.value} échouées={failed.value} débit={rate:.1f} tâches/s"
+                    )
+                    last_time, last_done = now, done.value
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f"Terminé : {done.value} réussies, {failed.value} échouées en {elapsed:.1f}s "
+            f"({done.value / elapsed if elapsed else 0:.1f} tâches/s)"
+        )
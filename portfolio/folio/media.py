@@ -0,0 +1,190 @@
+"""
+Fichiers envoyés par les utilisateurs (MEDIA_ROOT) : stockage et diffusion.
+
+Stockage : folio.blobs.ContentAddressedStorage range chaque contenu une seule
+fois et insère son empreinte dans le nom (cv/mon-cv.3f9a0c1b2d4e.pdf). Un nom
+ne désigne donc jamais deux contenus différents, et ces fichiers sont servis
+avec un cache d'un an (immutable).
+
+Diffusion (vue serve) :
+- seuls les dossiers d'envoi des modèles sont servis (cv/, blog/, ...) ;
+- ETag fort, If-None-Match / If-Modified-Since (304), Range sur une plage
+  (206, 416), If-Range ;
+- FOLIO_MEDIA_ACCEL = 'x-accel' (nginx) ou 'x-sendfile' (Apache, lighttpd) :
+  la réponse ne porte que les en-têtes, le proxy envoie le fichier et gère
+  lui-même les plages ;
+
+      location /protected-media/ {
+          internal;
+          alias /chemin/vers/media/;
+      }
+
+- sinon FileResponse : gunicorn envoie le fichier par os.sendfile (copie
+  zéro), plage comprise, bornée par Content-Length ;
+- téléchargements comptés en mémoire et enregistrés par lots (tâche
+  'media.downloads'), jamais une écriture en base par requête.
+"""
+import functools
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from . import jobs
+
+HASH_LENGTH = 12
+HASHED_NAME = re.compile(rf'\.([0-9a-f]{{{HASH_LENGTH}}})\.[^./]+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+BLOCK_SIZE = 64 * 1024
+
+ACCEL = getattr(settings, 'FOLIO_MEDIA_ACCEL', None)
+ACCEL_PREFIX = getattr(settings, 'FOLIO_MEDIA_ACCEL_PREFIX', '/protected-media/')
+MAX_AGE = getattr(settings, 'FOLIO_MEDIA_MAX_AGE', 3600)
+# Dossiers servis ; par défaut ceux des champs de fichier des modèles du folio
+DIRECTORIES = getattr(settings, 'FOLIO_MEDIA_DIRECTORIES', None)
+
+
+@functools.lru_cache(maxsize=None)
+def upload_directories():
+    """Premiers segments de upload_to des FileField/ImageField du folio"""
+    if DIRECTORIES is not None:
+        return frozenset(DIRECTORIES)
+    from django.apps import apps
+    from django.db.models import FileField
+
+    directories = set()
+    for model in apps.get_app_config('folio').get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField) and isinstance(field.upload_to, str):
+                directories.add(field.upload_to.strip('/').split('/')[0])
+    return frozenset(directories)
+
+
+class FileRange:
+    """Fichier limité à une plage : read() s'arrête à la fin de la plage, et
+    fileno() laisse le serveur WSGI utiliser os.sendfile depuis la position courante"""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+downloads = jobs.BufferedCounter(
+    'media.downloads', getattr(settings, 'FOLIO_MEDIA_FLUSH_INTERVAL', 60))
+
+
+def parse_range(header, size):
+    """(début, fin incluse) de l'unique plage demandée ; None pour tout le
+    fichier (en-tête absent ou non géré) ; ValueError si insatisfiable"""
+    match = RANGE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500 : les 500 derniers octets
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def file_etag(name, stat):
+    match = HASHED_NAME.search(name)
+    if match:
+        return quote_etag(match.group(1))
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+@require_safe
+def serve(request, name):
+    name = posixpath.normpath(name).lstrip('/')
+    if name.split('/')[0] not in upload_directories():
+        raise Http404
+    try:
+        path = Path(safe_join(settings.MEDIA_ROOT, name))
+        stat = path.stat()
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404
+    if not path.is_file():
+        raise Http404
+
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = file_response(request, path, name, stat.st_size, etag)
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    if HASHED_NAME.search(name):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return response
+
+
+def file_response(request, path, name, size, etag):
+    content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+    if ACCEL in ('x-accel', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if ACCEL == 'x-accel':
+            response['X-Accel-Redirect'] = quote(ACCEL_PREFIX.rstrip('/') + '/' + name)
+        else:
+            response['X-Sendfile'] = str(path)
+        if request.method == 'GET' and not request.headers.get('Range'):
+            downloads.add(name)
+        return response
+
+    byte_range = None
+    if request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        if start == 0:
+            downloads.add(name)
+        response = FileResponse(FileRange(open(path, 'rb'), start, length), content_type=content_type)
+        response.block_size = BLOCK_SIZE
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
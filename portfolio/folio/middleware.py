@@ -0,0 +1,217 @@
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.sessions import middleware as sessions_middleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware import csrf
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from . import admission, caching, compression, nplusone, preload, profiling, surrogates
+
+# Chemins jamais servis par le chemin public (formulaires, admin)
+PRIVATE_PATHS = tuple(getattr(settings, 'FOLIO_PRIVATE_PATHS', ('/admin/', '/csrf/')))
+ANONYMOUS = AnonymousUser()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresse les réponses HTML/JSON en brotli, zstd ou gzip.
+
+    À placer juste après WhiteNoiseMiddleware, qui sert déjà ses propres
+    fichiers pré-compressés. Les réponses propres à un visiteur (admin,
+    session, jeton CSRF) ne sont pas compressées (BREACH), les autres une
+    seule fois par contenu.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        if not compression.secret_free(request, response):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in compression.TYPES:
+            return response
+        if not response.streaming and len(response.content) < compression.MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compression.compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compression.cached_compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # Le corps n'est plus identique octet pour octet
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile les requêtes qui le demandent (voir folio/profiling.py).
+
+    Sans FOLIO_PROFILING, retiré de la chaîne au démarrage. À placer après
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'FOLIO_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = profiling.requested(request)
+        if mode is None:
+            return self.get_response(request)
+        return profiling.profile(request, self.get_response, mode)
+
+
+class PreloadMiddleware:
+    """En-tête Link: rel=preload des pages HTML (voir folio/preload.py).
+
+    Sans FOLIO_PRELOAD, retiré de la chaîne au démarrage.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'FOLIO_PRELOAD', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.status_code == 200
+            and request.method in ('GET', 'HEAD')
+            and response.get('Content-Type', '').startswith('text/html')
+        ):
+            preload.patch_link_header(request, response)
+        return response
+
+
+class SurrogateKeyMiddleware:
+    """Clés de substitution et s-maxage des réponses publiques (voir folio/surrogates.py).
+
+    À placer avant PublicRequestMiddleware, qui marque les requêtes publiques.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = caching.served_stale.set(False)
+        try:
+            response = self.get_response(request)
+            surrogates.patch_response(request, response)
+        finally:
+            caching.served_stale.reset(token)
+        return response
+
+
+class PublicRequestMiddleware:
+    """Chemin rapide des visiteurs anonymes sur les pages publiques.
+
+    Une requête GET/HEAD hors PRIVATE_PATHS, sans cookie de session ni de
+    messages, est marquée publique : les middlewares de session, CSRF,
+    authentification et messages ci-dessous la laissent passer sans rien
+    faire. Pas de session chargée, pas de Set-Cookie ni de Vary: Cookie, la
+    réponse peut être mise en cache par un proxy. request.user est un
+    AnonymousUser. Les autres réponses GET/HEAD, calculées avec les cookies
+    du visiteur, sont marquées Cache-Control: private (ni proxy ni service
+    worker ne les gardent). À placer avant SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookies = (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name)
+
+    def __call__(self, request):
+        if (
+            request.method in ('GET', 'HEAD')
+            and not any(name in request.COOKIES for name in self.cookies)
+            and not request.path_info.startswith(PRIVATE_PATHS)
+        ):
+            request.folio_public = True
+            request.user = ANONYMOUS
+            return self.get_response(request)
+        response = self.get_response(request)
+        if request.method in ('GET', 'HEAD') and not response.has_header('Cache-Control'):
+            patch_cache_control(response, private=True)
+        return response
+
+
+class AdmissionMiddleware:
+    """Contrôle d'admission par classe de route (voir folio/admission.py).
+
+    Sans FOLIO_ADMISSION, retiré de la chaîne au démarrage. À placer après
+    PublicRequestMiddleware (priorité des pages servies par le cache) et
+    avant SessionMiddleware : une requête rejetée ne charge pas de session.
+    """
+
+    def __init__(self, get_response):
+        if not admission.LIMITERS or not getattr(settings, 'FOLIO_ADMISSION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return admission.admit(request, self.get_response)
+
+
+class NPlusOneMiddleware:
+    """Requêtes SQL répétées d'une vue et de ses templates (voir folio/nplusone.py).
+
+    Sans FOLIO_NPLUSONE, retiré de la chaîne au démarrage. À placer avant
+    SessionMiddleware pour compter aussi les requêtes de session et
+    d'authentification.
+    """
+
+    def __init__(self, get_response):
+        if nplusone.current_mode() == 'off':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not nplusone.sampled():
+            return self.get_response(request)
+        with nplusone.detect(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+
+class SkipPublicMixin:
+    def __call__(self, request):
+        if getattr(request, 'folio_public', False):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(SkipPublicMixin, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class AuthenticationMiddleware(SkipPublicMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(SkipPublicMixin, messages_middleware.MessageMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SkipPublicMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if getattr(request, 'folio_public', False):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:35
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def count_months(apps, schema_editor):
+    BlogPost = apps.get_model('folio', 'BlogPost')
+    ArchiveMonth = apps.get_model('folio', 'ArchiveMonth')
+    dates = BlogPost.objects.filter(status='published', published_date__isnull=False).values_list(
+        'published_date', flat=True
+    )
+    counts = Counter((local.year, local.month) for local in map(timezone.localtime, dates.iterator()))
+    ArchiveMonth.objects.bulk_create([
+        ArchiveMonth(year=year, month=month, count=count) for (year, month), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('folio', '0003_archivedbatch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': "Mois d'archive",
+                'verbose_name_plural': "Mois d'archive",
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'published_date'], name='folio_post_archive_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivemonth',
+            constraint=models.UniqueConstraint(fields=('year', 'month'), name='folio_archive_month_unique'),
+        ),
+        migrations.RunPython(count_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('folio', '0004_archivemonth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaDownload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_download', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Téléchargement',
+                'verbose_name_plural': 'Téléchargements',
+                'ordering': ['-count'],
+            },
+        ),
+    ]
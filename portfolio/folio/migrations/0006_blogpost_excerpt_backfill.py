@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:12
+
+from django.db import migrations
+from django.db.models.functions import Substr
+
+# Copie de folio.models au moment de la migration : le code du modèle peut
+# changer ou disparaître, la migration doit toujours donner le même résultat
+EXCERPT_LENGTH = 300
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """Début du contenu, espaces normalisés, coupé au dernier mot entier"""
+    head = content[:length * 2]
+    text = ' '.join(head.split())
+    if len(text) <= length and len(content) == len(head):
+        return text
+    return text[:length].rsplit(' ', 1)[0] + '…'
+
+
+def fill_excerpts(apps, schema_editor):
+    BlogPost = apps.get_model('folio', 'BlogPost')
+    # Seul le début du contenu est lu, même sur des articles de plusieurs Mo ;
+    # un caractère de plus pour savoir s'il faut des points de suspension
+    rows = BlogPost.objects.filter(excerpt='').annotate(
+        head=Substr('content', 1, EXCERPT_LENGTH * 2 + 1)
+    ).values_list('pk', 'head')
+    batch = []
+    for pk, head in rows.iterator(chunk_size=500):
+        batch.append(BlogPost(pk=pk, excerpt=make_excerpt(head)))
+        if len(batch) == 500:
+            BlogPost.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    BlogPost.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('folio', '0005_mediadownload'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('folio', '0006_blogpost_excerpt_backfill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='rejected',
+            field=models.BooleanField(default=False),
+        ),
+    ]
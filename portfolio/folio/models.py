@@ -1,3 +1,4 @@
+import datetime
 
 from django.db import models
 from django.utils import timezone
@@ -19,6 +20,11 @@ class Skill(models.Model):
     def __str__(self):
         return self.name
 
+class ProjectQuerySet(models.QuerySet):
+    def for_list(self):
+        """Listes : sans la description complète, short_description suffit"""
+        return self.defer('description')
+
 class Project(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -31,6 +37,8 @@ class Project(models.Model):
     created_date = models.DateTimeField(default=timezone.now)
     order = models.IntegerField(default=0)
     
+    objects = ProjectQuerySet.as_manager()
+    
     class Meta:
         ordering = ['order', '-created_date']
     
@@ -88,6 +96,23 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+# Longueur des extraits générés à l'enregistrement (caractères)
+EXCERPT_LENGTH = 300
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """Début du contenu, espaces normalisés, coupé au dernier mot entier"""
+    # Seul le début est lu : un article peut faire plusieurs Mo
+    head = content[:length * 2]
+    text = ' '.join(head.split())
+    if len(text) <= length and len(content) == len(head):
+        return text
+    return text[:length].rsplit(' ', 1)[0] + '…'
+
+class BlogPostQuerySet(models.QuerySet):
+    def for_list(self):
+        """Listes : sans le contenu, seul l'extrait est affiché"""
+        return self.defer('content')
+
 class BlogPost(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Brouillon'),
@@ -109,16 +134,25 @@ class BlogPost(models.Model):
     published_date = models.DateTimeField(null=True, blank=True)
     views = models.PositiveIntegerField(default=0)
     
+    objects = BlogPostQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-published_date', '-created_date']
+        indexes = [
+            # Archives par date : parcours d'intervalle sur published_date
+            models.Index(fields=['status', 'published_date'], name='folio_post_archive_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if self.status == 'published' and not self.published_date:
             self.published_date = timezone.now()
+        if not self.excerpt.strip():
+            # Les listes n'affichent que l'extrait : elles ne lisent jamais le contenu
+            self.excerpt = make_excerpt(self.content)
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
-        return reverse('blog_detail', kwargs={'slug': self.slug})
+        return reverse('folio:blog_detail', kwargs={'slug': self.slug})
     
     def __str__(self):
         return self.title
@@ -130,6 +164,8 @@ class Comment(models.Model):
     content = models.TextField()
     created_date = models.DateTimeField(default=timezone.now)
     active = models.BooleanField(default=True)
+    # Inactif et non rejeté : en attente de modération
+    rejected = models.BooleanField(default=False)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     
     class Meta:
@@ -174,3 +210,88 @@ class ContactMessage(models.Model):
     
     def __str__(self):
         return f"Message de {self.name} - {self.subject}"
+
+# File de tâches différées (voir folio/jobs.py)
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminée'),
+        ('failed', 'Échouée'),
+    ]
+    
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    # Bail du worker qui l'exécute : passé ce délai, la tâche peut être réclamée à nouveau
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_date = models.DateTimeField(default=timezone.now)
+    finished_date = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='folio_job_claim_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+# Archives de la rétention (voir folio/retention.py)
+class ArchivedBatch(models.Model):
+    policy = models.CharField(max_length=50)
+    model = models.CharField(max_length=100)
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    count = models.PositiveIntegerField()
+    data = models.BinaryField()  # JSON lines compressées en gzip
+    created_date = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_date']
+        verbose_name = "Lot archivé"
+        verbose_name_plural = "Lots archivés"
+    
+    def __str__(self):
+        return f"{self.policy} : {self.count} lignes ({self.first_id}-{self.last_id})"
+
+
+# Nombre d'articles publiés par mois, tenu à jour par folio/archive.py
+class ArchiveMonth(models.Model):
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month'], name='folio_archive_month_unique'),
+        ]
+        verbose_name = "Mois d'archive"
+        verbose_name_plural = "Mois d'archive"
+    
+    @property
+    def date(self):
+        return datetime.date(self.year, self.month, 1)
+    
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} : {self.count}"
+
+
+# Téléchargements des fichiers envoyés, comptés par lots (voir folio/media.py)
+class MediaDownload(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    last_download = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-count']
+        verbose_name = "Téléchargement"
+        verbose_name_plural = "Téléchargements"
+    
+    def __str__(self):
+        return f"{self.name} : {self.count}"
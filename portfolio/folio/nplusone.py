@@ -0,0 +1,162 @@
+"""
+Détection des requêtes N+1 pendant une requête HTTP.
+
+- chaque requête SQL est ramenée à sa forme : littéraux et paramètres
+  remplacés par ?, listes IN (?, ?, ...) réduites, espaces normalisés ;
+- une même forme exécutée FOLIO_NPLUSONE_THRESHOLD fois ou plus pendant
+  une requête HTTP est signalée, avec l'endroit qui l'a lancée : ligne du
+  template (Django ou Jinja2) en cours de rendu, sinon première frame du
+  projet ;
+- FOLIO_NPLUSONE : off, log (journal folio), warn (NPlusOneWarning) ou
+  raise (NPlusOneError) ; raise sous `manage.py test` ;
+- FOLIO_NPLUSONE_SAMPLE : part des requêtes HTTP surveillées, pour la
+  production (chaque requête SQL surveillée remonte la pile) ;
+- FOLIO_NPLUSONE_ALLOW : expressions régulières cherchées dans la forme ou
+  l'endroit des répétitions tolérées.
+
+Hors requête HTTP (tests, commandes) : with nplusone.detect(): ...
+"""
+import logging
+import os
+import random
+import re
+import sys
+import warnings
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.template import base as template_base
+
+from .profiling import label
+
+logger = logging.getLogger('folio')
+
+MODES = ('off', 'log', 'warn', 'raise')
+MAX_SQL = 300
+
+STRINGS = re.compile(r"'(?:[^']|'')*'")
+NUMBERS = re.compile(r'(?<![\w"$.])-?\d+(?:\.\d+)?\b')
+PLACEHOLDER_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+SPACES = re.compile(r'\s+')
+# Transactions et points de sauvegarde : répétés par nature
+IGNORED = re.compile(r'\s*(?:SAVEPOINT|RELEASE|ROLLBACK|BEGIN|COMMIT)\b', re.IGNORECASE)
+
+TEMPLATE_SOURCE = template_base.__file__
+SITE_PACKAGES = f'{os.sep}site-packages{os.sep}'
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def current_mode():
+    value = getattr(settings, 'FOLIO_NPLUSONE', 'off')
+    return value if value in MODES else 'off'
+
+
+def sampled():
+    return random.random() < getattr(settings, 'FOLIO_NPLUSONE_SAMPLE', 1.0)
+
+
+@lru_cache(maxsize=1024)
+def shape(sql):
+    """Forme de la requête, indépendante de ses valeurs"""
+    sql = NUMBERS.sub('?', STRINGS.sub('?', sql.replace('%s', '?')))
+    return SPACES.sub(' ', PLACEHOLDER_LISTS.sub('(...)', sql)).strip()
+
+
+def in_project(filename):
+    return filename.startswith(str(settings.BASE_DIR)) and SITE_PACKAGES not in filename and filename != __file__
+
+
+def location():
+    """Ligne du template en cours de rendu et/ou frame du projet qui a lancé la requête SQL"""
+    frame = sys._getframe(2)
+    caller = None
+    while frame is not None:
+        code = frame.f_code
+        where = None
+        if code.co_name == 'render_annotated' and code.co_filename == TEMPLATE_SOURCE:
+            node = frame.f_locals.get('self')
+            if getattr(node, 'origin', None) is not None and getattr(node, 'token', None) is not None:
+                where = f'{node.origin.template_name}:{node.token.lineno}'
+        elif '__jinja_template__' in frame.f_globals:
+            template = frame.f_globals['__jinja_template__']
+            where = f'{template.name}:{template.get_corresponding_lineno(frame.f_lineno)}'
+        elif caller is None and in_project(code.co_filename):
+            caller = label(code.co_filename, frame.f_lineno, code.co_name)
+        if where:
+            # Méthode du projet appelée par le template : les deux comptent
+            return f'{where} via {caller}' if caller else where
+        frame = frame.f_back
+    return caller or '?'
+
+
+class Detector:
+    """execute_wrapper : formes exécutées et endroits qui les ont lancées"""
+
+    def __init__(self):
+        self.threshold = getattr(settings, 'FOLIO_NPLUSONE_THRESHOLD', 3)
+        self.allow = [re.compile(pattern) for pattern in getattr(settings, 'FOLIO_NPLUSONE_ALLOW', ())]
+        self.shapes = Counter()
+        self.locations = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not IGNORED.match(sql):
+            key = shape(sql)
+            self.shapes[key] += 1
+            self.locations.setdefault(key, Counter())[location()] += 1
+        return execute(sql, params, many, context)
+
+    def allowed(self, sql, places):
+        return any(pattern.search(text) for pattern in self.allow for text in (sql, *places))
+
+    def findings(self):
+        """[(forme, exécutions, endroits)] des formes répétées, hors liste d'autorisation"""
+        found = []
+        for sql, count in self.shapes.most_common():
+            if count < self.threshold:
+                break
+            places = self.locations[sql]
+            if not self.allowed(sql, places):
+                found.append((sql, count, places))
+        return found
+
+
+def format_findings(findings, name=''):
+    lines = [f"Requêtes N+1{f' ({name})' if name else ''} :"]
+    for sql, count, places in findings:
+        where = ', '.join(f'{place} ×{n}' for place, n in places.most_common(3))
+        lines.append(f"  {count} × {sql[:MAX_SQL]}\n    depuis {where}")
+    return '\n'.join(lines)
+
+
+def report(findings, name='', mode=None):
+    if not findings:
+        return
+    mode = mode or current_mode()
+    message = format_findings(findings, name)
+    if mode == 'raise':
+        raise NPlusOneError(message)
+    if mode == 'warn':
+        warnings.warn(message, NPlusOneWarning, stacklevel=3)
+    elif mode == 'log':
+        logger.warning(message)
+
+
+@contextmanager
+def detect(name='', mode=None):
+    """Surveille les requêtes SQL du bloc ; signalées à la sortie selon le mode"""
+    detector = Detector()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
+    report(detector.findings(), name, mode)
@@ -0,0 +1,147 @@
+"""
+Service worker du site, généré par collectstatic (ServiceWorkerStorage).
+
+- manifeste de précache (precache.json) : fichiers statiques du manifeste
+  de WhiteNoise (noms avec empreinte), hors admin et CSS critique déjà
+  inliné, et pages publiques sans paramètre de folio/urls.py ;
+- version : empreinte de ces noms (donc de leur contenu), des templates et
+  du script ; elle change avec eux et le nouveau service worker supprime
+  alors les caches de l'ancien ;
+- stratégies (templates/sw.js) : cache d'abord pour les fichiers avec
+  empreinte, qui ne changent jamais ; stale-while-revalidate pour les
+  pages HTML, servies depuis le cache puis rafraîchies en arrière-plan ;
+  réseau d'abord pour les pages à formulaire (FORM_PAGES) et pour le
+  visiteur qui porte un cookie de session ou de messages, dont la page
+  affiche un message flash après un POST ; le reste passe par le réseau ;
+- servi à la racine (/sw.js) pour contrôler tout le site, revalidé à
+  chaque navigation (Cache-Control: no-cache).
+
+Les réponses propres à un visiteur (Cache-Control: private ou no-store,
+Vary: Cookie) ne sont jamais gardées par le service worker.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.http import Http404, HttpResponse
+from django.template import engines
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import assets
+from .middleware import PRIVATE_PATHS
+from .warmup import TEMPLATE_SUFFIXES
+
+WORKER = 'sw.js'
+MANIFEST = 'precache.json'
+PRECACHE_EXTENSIONS = ('.css', '.js', '.woff2')
+# Fichiers statiques jamais précachés (préfixes)
+EXCLUDE = tuple(getattr(settings, 'FOLIO_PRECACHE_EXCLUDE', ('admin/',)))
+# Source de Tailwind : ses @import désignent des paquets npm, que le
+# manifeste ne peut pas résoudre ; copiée mais ni hashée ni précachée
+BUILD_INPUTS = ('src/input.css',)
+# Pages gardées par le stale-while-revalidate au plus, les plus anciennes sortent
+MAX_PAGES = 50
+# Pages à formulaire, servies par le réseau d'abord : message flash après le POST
+FORM_PAGES = tuple(getattr(settings, 'FOLIO_SW_FORM_PAGES', ('folio:contact',)))
+
+
+def static_names(storage):
+    """Noms avec empreinte des fichiers à précacher"""
+    manifest = assets.build_manifest()
+    critical = set(manifest['critical'].values()) if manifest else set()
+    return sorted(
+        hashed for name, hashed in storage.hashed_files.items()
+        if name.endswith(PRECACHE_EXTENSIONS) and not name.startswith(EXCLUDE) and name not in critical
+    )
+
+
+def page_urls():
+    """Pages de folio/urls.py sans paramètre, déclarées avec @preload.page"""
+    from . import urls
+
+    return [
+        reverse(f'{urls.app_name}:{pattern.name}') for pattern in urls.urlpatterns
+        if getattr(pattern.callback, 'preload_templates', None) and not pattern.pattern.converters
+    ]
+
+
+def template_sources():
+    for backend in engines.all():
+        for directory in backend.dirs:
+            for path in sorted(Path(directory).rglob('*')):
+                if path.suffix in TEMPLATE_SUFFIXES + ('.js',):
+                    yield path.read_bytes()
+
+
+def build_manifest(storage):
+    names = static_names(storage)
+    digest = hashlib.blake2b(digest_size=8)
+    for name in names:
+        digest.update(name.encode())
+    for source in template_sources():
+        digest.update(source)
+    return {
+        'version': digest.hexdigest(),
+        'static': [storage.base_url + name for name in names],
+        'pages': page_urls(),
+    }
+
+
+def write_worker(storage):
+    """Écrit precache.json et sw.js dans le stockage ; renvoie le manifeste"""
+    manifest = build_manifest(storage)
+    script = render_to_string(WORKER, {
+        'manifest': json.dumps(manifest, indent=2),
+        'private_paths': json.dumps(PRIVATE_PATHS),
+        'form_pages': json.dumps([reverse(name) for name in FORM_PAGES]),
+        'visitor_cookies': json.dumps([settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name]),
+        'max_pages': MAX_PAGES,
+    }, using='django')
+    for name, content in ((MANIFEST, json.dumps(manifest)), (WORKER, script)):
+        # Sans suppression, save() choisirait un autre nom
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content.encode()))
+    return manifest
+
+
+class ServiceWorkerStorage(CompressedManifestStaticFilesStorage):
+    """Stockage de WhiteNoise qui génère aussi le service worker"""
+
+    def post_process(self, paths, *args, **kwargs):
+        paths = {name: value for name, value in paths.items() if name not in BUILD_INPUTS}
+        yield from super().post_process(paths, *args, **kwargs)
+        if not kwargs.get('dry_run'):
+            write_worker(self)
+            yield WORKER, WORKER, True
+
+
+@lru_cache(maxsize=None)
+def worker_script():
+    """Script généré par collectstatic ; None sans lui ou en DEBUG"""
+    if settings.DEBUG or not getattr(settings, 'FOLIO_SERVICE_WORKER', True):
+        return None
+    try:
+        with staticfiles_storage.open(WORKER) as f:
+            return f.read()
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+@require_safe
+def service_worker(request):
+    script = worker_script()
+    if script is None:
+        raise Http404("Service worker non généré")
+    response = HttpResponse(script, content_type='text/javascript; charset=utf-8')
+    # Le navigateur compare le script à chaque navigation : une nouvelle version s'installe aussitôt
+    response['Cache-Control'] = 'no-cache'
+    return response
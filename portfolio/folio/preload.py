@@ -0,0 +1,204 @@
+"""
+Préchargement des ressources critiques : en-tête Link: rel=preload et
+103 Early Hints.
+
+- chaque vue déclare son template de page (@preload.page('home.html')) ;
+- les références statiques de ce template, de ceux qu'il étend ou inclut
+  ({% static %}, static(), critical_css, font_stylesheets) sont relevées
+  dans leur source, une fois par template (préchauffage au démarrage) ;
+  sans build des polices, l'origine des fichiers de Google Fonts est en
+  preconnect ;
+- la vue ajoute son image principale (LCP) avec preload.add() : image à la
+  une d'un article, image d'un projet ;
+- PreloadMiddleware met le tout dans l'en-tête Link des pages HTML, qu'un
+  CDN peut aussi transformer en 103 Early Hints ;
+- EarlyHints (portfolio/asgi.py) envoie un 103 avant même d'appeler la vue
+  quand le serveur ASGI gère l'extension http.response.early_hint
+  (Hypercorn) : le navigateur charge CSS et polices pendant le rendu.
+"""
+import posixpath
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, engines
+from django.templatetags.static import static
+from django.urls import Resolver404, get_resolver, resolve
+
+from . import assets
+
+# Ressources préchargées par page au plus : au-delà, elles se disputent la bande passante
+MAX_LINKS = getattr(settings, 'FOLIO_PRELOAD_MAX', 8)
+EARLY_HINT = 'http.response.early_hint'
+FONTS_ORIGIN = 'https://fonts.gstatic.com'
+
+PARENTS = re.compile(r'''{%-?\s*(?:extends|include)\s+["']([^"']+)["']''')
+STATIC = re.compile(r'''(?:{%-?\s*static\s+|\bstatic\(\s*)["']([^"']+)["']''')
+CRITICAL_CSS = re.compile(r'''\bcritical_css\b(?:\(\s*|\s+)?(?:["']([^"']+)["'])?''')
+FONT_STYLESHEETS = re.compile(r'\bfont_stylesheets\b')
+
+DESTINATIONS = {
+    '.css': 'style',
+    '.js': 'script',
+    '.woff2': 'font',
+    '.woff': 'font',
+    '.avif': 'image',
+    '.webp': 'image',
+    '.png': 'image',
+    '.jpg': 'image',
+    '.jpeg': 'image',
+    '.gif': 'image',
+    '.svg': 'image',
+}
+
+
+def link(url, destination, font_type=None, fetchpriority=None):
+    value = f'<{url}>; rel=preload; as={destination}'
+    if font_type:
+        # Les polices sont toujours chargées en mode CORS
+        value += f'; type="{font_type}"; crossorigin'
+    if fetchpriority:
+        value += f'; fetchpriority={fetchpriority}'
+    return value
+
+
+def static_link(path):
+    """Link d'un fichier statique ; None s'il n'est pas préchargeable"""
+    extension = posixpath.splitext(path)[1].lower()
+    destination = DESTINATIONS.get(extension)
+    if destination is None:
+        return None
+    try:
+        url = static(path)
+    except ValueError:
+        # Absent du manifeste de collectstatic
+        return None
+    return link(url, destination, f'font/{extension[1:]}' if destination == 'font' else None)
+
+
+def font_links():
+    """Mêmes ressources que render_font_stylesheets : build local ou CDN"""
+    manifest = assets.build_manifest()
+    if manifest is None:
+        # Les fichiers des polices Google, cités par leur CSS, viennent d'une autre origine
+        return [
+            link(assets.FONT_AWESOME_CDN, 'style'),
+            link(assets.GOOGLE_FONTS_CSS, 'style'),
+            f'<{FONTS_ORIGIN}>; rel=preconnect; crossorigin',
+        ]
+    return [static_link(manifest['stylesheet'])] + [static_link(path) for path in manifest['fonts']]
+
+
+def load_source(name, backend=None):
+    """(moteur, source) du template, dans l'ordre de recherche de Django"""
+    for candidate in [backend] if backend else engines.all():
+        try:
+            template = candidate.get_template(name).template
+        except TemplateDoesNotExist:
+            continue
+        source = getattr(template, 'source', None)
+        if source is None:
+            # Jinja2 ne garde pas le source
+            with open(template.filename, encoding='utf-8') as f:
+                source = f.read()
+        return candidate, source
+    raise TemplateDoesNotExist(name)
+
+
+def scan(name, backend=None, seen=None):
+    """Links des références statiques du template, parents et inclusions d'abord"""
+    seen = set() if seen is None else seen
+    if name in seen:
+        return []
+    seen.add(name)
+    try:
+        backend, source = load_source(name, backend)
+    except TemplateDoesNotExist:
+        return []
+    links = []
+    for parent in PARENTS.findall(source):
+        links.extend(scan(parent, backend, seen))
+    for match in CRITICAL_CSS.finditer(source):
+        links.append(static_link(match.group(1) or 'src/output.css'))
+    if FONT_STYLESHEETS.search(source):
+        links.extend(font_links())
+    links.extend(static_link(path) for path in STATIC.findall(source))
+    return links
+
+
+@lru_cache(maxsize=None)
+def template_links(name):
+    return tuple(dict.fromkeys(link for link in scan(name) if link))
+
+
+@lru_cache(maxsize=None)
+def view_links(view):
+    links = []
+    for name in getattr(view, 'preload_templates', ()):
+        links.extend(template_links(name))
+    return tuple(dict.fromkeys(links))[:MAX_LINKS]
+
+
+def page(*template_names):
+    """Décorateur : templates de page rendus par la vue"""
+    def decorator(view):
+        view.preload_templates = template_names
+        return view
+    return decorator
+
+
+def add(request, url, destination='image'):
+    """Précharge une ressource propre à la page, en priorité haute (image LCP)"""
+    request.folio_preload = getattr(request, 'folio_preload', ()) + (link(url, destination, fetchpriority='high'),)
+
+
+def response_links(request):
+    match = request.resolver_match
+    links = view_links(match.func) if match else ()
+    return getattr(request, 'folio_preload', ()) + links
+
+
+def patch_link_header(request, response):
+    links = response_links(request)
+    if not links:
+        return
+    existing = response.get('Link')
+    response.headers['Link'] = ', '.join(((existing,) if existing else ()) + links)
+
+
+def path_links(path):
+    """Links connus avant d'appeler la vue : ceux de ses templates"""
+    try:
+        return view_links(resolve(path).func)
+    except Resolver404:
+        return ()
+
+
+class EarlyHints:
+    """Application ASGI : 103 Early Hints avant la réponse, si le serveur les gère"""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') and EARLY_HINT in scope.get('extensions', {}):
+            path, root = scope['path'], scope.get('root_path', '')
+            if root and path.startswith(root):
+                path = path[len(root):]
+            links = path_links(path)
+            if links:
+                await send({'type': EARLY_HINT, 'links': [value.encode('latin-1') for value in links]})
+        await self.application(scope, receive, send)
+
+
+def warm():
+    """Analyse les templates de toutes les vues déclarées ; renvoie le nombre de links"""
+    count = 0
+    pending = list(get_resolver().url_patterns)
+    while pending:
+        pattern = pending.pop()
+        if hasattr(pattern, 'url_patterns'):
+            pending.extend(pattern.url_patterns)
+        else:
+            count += len(view_links(pattern.callback))
+    return count
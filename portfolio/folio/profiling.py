@@ -0,0 +1,313 @@
+"""
+Profilage à la demande d'une requête en production.
+
+Désactivé par défaut : sans FOLIO_PROFILING, ProfilingMiddleware se retire
+de la chaîne au démarrage et ne coûte rien. Activé, une requête n'est
+profilée que si elle le demande :
+- ?_profile=cprofile (ou sample) avec une session staff ;
+- en-tête X-Folio-Profile portant un jeton signé (valable une heure),
+  affiché sur la page d'admin des profils : curl -H 'X-Folio-Profile: ...'.
+
+Deux modes :
+- cprofile : cProfile autour de la vue et du rendu, fichier .prof (pstats) ;
+- sample : échantillonnage de la pile toutes les millisecondes par un
+  thread, piles repliées (format flamegraph) ; surcoût plus faible.
+
+Chaque profil enregistre aussi les requêtes SQL et leur durée. Les profils
+sont gardés dans FOLIO_PROFILE_DIR, en anneau : au-delà de
+FOLIO_PROFILE_KEEP, les plus anciens sont supprimés.
+"""
+import cProfile
+import functools
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+MODES = ('cprofile', 'sample')
+PARAM = '_profile'
+HEADER = 'HTTP_X_FOLIO_PROFILE'
+TOKEN_MAX_AGE = 3600
+SAMPLE_INTERVAL = 0.001
+MAX_FUNCTIONS = 300
+PROFILE_ID = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+DIRECTORY = Path(getattr(settings, 'FOLIO_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+KEEP = getattr(settings, 'FOLIO_PROFILE_KEEP', 50)
+
+
+def signer():
+    return signing.TimestampSigner(salt='folio.profiling')
+
+
+def make_token(mode='cprofile'):
+    return signer().sign(mode)
+
+
+def requested(request):
+    """Mode demandé par la requête, ou None"""
+    token = request.META.get(HEADER)
+    if token:
+        try:
+            mode = signer().unsign(token, max_age=TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        return mode if mode in MODES else None
+    # Test sur la chaîne brute : request.GET n'est construit que si besoin
+    if PARAM not in request.META.get('QUERY_STRING', ''):
+        return None
+    mode = request.GET.get(PARAM)
+    if mode is None:
+        return None
+    # La session n'est lue que si le paramètre est présent
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        return None
+    return mode if mode in MODES else MODES[0]
+
+
+@functools.lru_cache(maxsize=4096)
+def label(filename, lineno, name):
+    """fichier:ligne(fonction), chemin relatif au projet ou aux site-packages"""
+    for root in (str(settings.BASE_DIR), *sys.path[1:]):
+        if root and filename.startswith(root + os.sep):
+            filename = filename[len(root) + 1:]
+            break
+    return f'{filename}:{lineno}({name})'
+
+
+class Sampler:
+    """Relève la pile d'un thread à intervalle régulier"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def functions(self):
+        functions = {}
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            for name in set(frames):
+                entry = functions.setdefault(name, {'calls': 0, 'self': 0.0, 'total': 0.0})
+                entry['total'] += count * self.interval
+            functions[frames[-1]]['self'] += count * self.interval
+        return functions
+
+
+def cprofile_functions(profiler):
+    functions = {}
+    for (filename, lineno, name), (_, calls, tottime, cumtime, _) in pstats.Stats(profiler).stats.items():
+        functions[label(filename, lineno, name)] = {'calls': calls, 'self': tottime, 'total': cumtime}
+    return functions
+
+
+def profile(request, get_response, mode):
+    queries = []
+
+    def record_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append({'sql': sql, 'time': time.perf_counter() - start, 'many': many})
+
+    profile_id = f'{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(record_query))
+        if mode == 'sample':
+            sampler = stack.enter_context(Sampler(threading.get_ident()))
+            response = get_response(request)
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+    duration = time.perf_counter() - start
+
+    if mode == 'sample':
+        functions, stacks = sampler.functions(), dict(sampler.stacks)
+    else:
+        functions, stacks = cprofile_functions(profiler), None
+    top = sorted(functions.items(), key=lambda item: item[1]['total'], reverse=True)[:MAX_FUNCTIONS]
+    data = {
+        'id': profile_id,
+        'mode': mode,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration': duration,
+        'created': timezone.now().isoformat(),
+        'queries': queries,
+        'sql_time': sum(query['time'] for query in queries),
+        'functions': dict(top),
+        'stacks': stacks,
+    }
+    save(data, profiler if mode == 'cprofile' else None)
+    response['X-Folio-Profile-Id'] = profile_id
+    return response
+
+
+# --- Anneau sur disque ----------------------------------------------------------
+
+def save(data, profiler=None):
+    DIRECTORY.mkdir(parents=True, exist_ok=True)
+    if profiler is not None:
+        profiler.dump_stats(DIRECTORY / f"{data['id']}.prof")
+    tmp = DIRECTORY / f"{data['id']}.tmp"
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, DIRECTORY / f"{data['id']}.json")
+    prune()
+
+
+def prune():
+    for path in sorted(DIRECTORY.glob('*.json'))[:-KEEP or None]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def load(profile_id):
+    if not PROFILE_ID.match(profile_id):
+        raise Http404
+    try:
+        return json.loads((DIRECTORY / f'{profile_id}.json').read_text())
+    except FileNotFoundError:
+        raise Http404
+
+
+def summaries():
+    """Profils enregistrés, du plus récent au plus ancien, sans le détail"""
+    profiles = []
+    for path in sorted(DIRECTORY.glob('*.json'), reverse=True):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        data['query_count'] = len(data.pop('queries'))
+        in_ms(data)
+        data.pop('functions')
+        data.pop('stacks')
+        profiles.append(data)
+    return profiles
+
+
+def collapsed(data):
+    """Piles repliées « a;b;c N », lisibles par flamegraph.pl ou speedscope"""
+    return ''.join(f'{stack} {count}\n' for stack, count in (data['stacks'] or {}).items())
+
+
+def diff(a, b, limit=50):
+    """Fonctions dont le temps cumulé (ms) a le plus changé entre deux profils"""
+    rows = []
+    for name in a['functions'].keys() | b['functions'].keys():
+        before = a['functions'].get(name, {}).get('total', 0.0)
+        after = b['functions'].get(name, {}).get('total', 0.0)
+        rows.append({'name': name, 'before': before * 1000, 'after': after * 1000, 'delta': (after - before) * 1000})
+    rows.sort(key=lambda row: abs(row['delta']), reverse=True)
+    return rows[:limit]
+
+
+# --- Pages d'admin (staff) ------------------------------------------------------
+
+def profile_list(request):
+    context = {
+        'title': 'Profils de requêtes',
+        'profiles': summaries(),
+        'enabled': getattr(settings, 'FOLIO_PROFILING', False),
+        'tokens': {mode: make_token(mode) for mode in MODES},
+        'keep': KEEP,
+    }
+    return render(request, 'admin/folio/profiles.html', context)
+
+
+def in_ms(data):
+    data['duration_ms'], data['sql_ms'] = data['duration'] * 1000, data['sql_time'] * 1000
+    return data
+
+
+def profile_detail(request, profile_id):
+    data = in_ms(load(profile_id))
+    functions = sorted(data['functions'].items(), key=lambda item: item[1]['total'], reverse=True)
+    context = {
+        'title': f"Profil {data['id']}",
+        'profile': data,
+        'functions': [
+            (name, stats['calls'], stats['self'] * 1000, stats['total'] * 1000)
+            for name, stats in functions[:100]
+        ],
+        'queries': [
+            dict(query, ms=query['time'] * 1000)
+            for query in sorted(data['queries'], key=lambda query: query['time'], reverse=True)
+        ],
+    }
+    return render(request, 'admin/folio/profile_detail.html', context)
+
+
+def profile_download(request, profile_id, kind):
+    data = load(profile_id)
+    if kind == 'prof':
+        path = DIRECTORY / f'{profile_id}.prof'
+        if not path.exists():
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+    if kind == 'collapsed':
+        if data['stacks'] is None:
+            raise Http404
+        response = HttpResponse(collapsed(data), content_type='text/plain; charset=utf-8')
+    elif kind == 'json':
+        response = FileResponse(open(DIRECTORY / f'{profile_id}.json', 'rb'), content_type='application/json')
+    else:
+        raise Http404
+    response['Content-Disposition'] = f'attachment; filename="{profile_id}.{kind}"'
+    return response
+
+
+def profile_diff(request):
+    a, b = in_ms(load(request.GET.get('a', ''))), in_ms(load(request.GET.get('b', '')))
+    context = {
+        'title': 'Comparaison de profils',
+        'a': a,
+        'b': b,
+        'rows': diff(a, b),
+        'sql': {'before': len(a['queries']), 'after': len(b['queries'])},
+    }
+    return render(request, 'admin/folio/profile_diff.html', context)
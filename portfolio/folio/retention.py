@@ -0,0 +1,177 @@
+"""
+Rétention : archive puis supprime les lignes expirées, politique par politique.
+
+    FOLIO_RETENTION = {
+        'comments': {'days': 30, 'archive': 'table'},
+        'messages': {'days': 365, 'archive': 'jsonl'},
+        'jobs': {'days': 14, 'archive': None},
+    }
+
+Les lignes sont traitées par lots, dans l'ordre des clés primaires : lecture
+par values(), archivage, puis DELETE ... WHERE id IN (...) dans une courte
+transaction, avec une pause entre les lots pour ne jamais bloquer le site.
+
+- archive 'table' : un ArchivedBatch (JSON lines gzip) inséré dans la même
+  transaction que la suppression ; une interruption ne perd ni ne duplique rien.
+- archive 'jsonl' : un fichier .jsonl.gz par exécution dans FOLIO_ARCHIVE_DIR,
+  un membre gzip par lot. Un point de reprise (pending.json) est écrit avant
+  chaque lot ; la reprise garde ou retire le dernier lot selon que sa
+  suppression a été validée ou non.
+- archive None : suppression seule (tâches terminées).
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .models import ArchivedBatch, Comment, ContactMessage, Job
+
+
+class Policy:
+    def __init__(self, name, model, condition, date_field='created_date', days=90, archive='table'):
+        self.name = name
+        self.model = model
+        self.condition = condition
+        self.date_field = date_field
+        self.days = days
+        self.archive = archive
+
+    def queryset(self, now=None):
+        cutoff = (now or timezone.now()) - timedelta(days=self.days)
+        return self.model._default_manager.filter(self.condition, **{f'{self.date_field}__lt': cutoff})
+
+
+def get_policies():
+    policies = {
+        # Commentaires rejetés par la modération sans réponse à conserver ;
+        # ceux en attente restent jusqu'à leur modération
+        'comments': Policy('comments', Comment, Q(rejected=True, replies__isnull=True), days=30),
+        'messages': Policy('messages', ContactMessage, Q(read=True), days=365, archive='jsonl'),
+        'jobs': Policy('jobs', Job, Q(status__in=('done', 'failed')), date_field='finished_date', days=14, archive=None),
+    }
+    for name, overrides in getattr(settings, 'FOLIO_RETENTION', {}).items():
+        for key, value in overrides.items():
+            setattr(policies[name], key, value)
+    return policies
+
+
+def archive_dir():
+    return Path(getattr(settings, 'FOLIO_ARCHIVE_DIR', settings.BASE_DIR / 'archives'))
+
+
+def encode(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    return gzip.compress(''.join(encoder.encode(row) + '\n' for row in rows).encode('utf-8'))
+
+
+class Runner:
+    """Exécute une politique ; run() peut être relancé après une interruption"""
+
+    def __init__(self, policy, chunk_size=1000, pause=0.1, max_rows=None, log=None):
+        self.policy = policy
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.max_rows = max_rows
+        self.log = log or (lambda message: None)
+        self.directory = archive_dir() / policy.name
+        self.state_path = self.directory / 'pending.json'
+        self.target = None
+
+    def report(self):
+        """Simulation : ce qui serait archivé, sans rien modifier"""
+        queryset = self.policy.queryset()
+        field = self.policy.date_field
+        stats = queryset.aggregate(oldest=Min(field), newest=Max(field))
+        stats['rows'] = queryset.count()
+        sample = list(queryset.order_by('pk').values()[:self.chunk_size])
+        # Taille estimée d'après un lot
+        stats['bytes'] = len(encode(sample)) * stats['rows'] // len(sample) if sample else 0
+        return stats
+
+    def run(self):
+        self.resume()
+        start = time.perf_counter()
+        done = {'rows': 0, 'batches': 0, 'bytes': 0}
+        queryset = self.policy.queryset().order_by('pk')
+        last_pk = 0
+        while self.max_rows is None or done['rows'] < self.max_rows:
+            limit = self.chunk_size
+            if self.max_rows is not None:
+                limit = min(limit, self.max_rows - done['rows'])
+            rows = list(queryset.filter(pk__gt=last_pk).values()[:limit])
+            if not rows:
+                break
+            ids = [row[self.policy.model._meta.pk.attname] for row in rows]
+            payload = encode(rows) if self.policy.archive else b''
+            if self.policy.archive == 'table':
+                self.archive_table(ids, payload)
+            elif self.policy.archive:
+                self.archive_file(ids, payload)
+            else:
+                with transaction.atomic():
+                    self.delete(ids)
+            last_pk = ids[-1]
+            done['rows'] += len(ids)
+            done['batches'] += 1
+            done['bytes'] += len(payload)
+            if self.pause:
+                time.sleep(self.pause)
+        done['seconds'] = time.perf_counter() - start
+        return done
+
+    def delete(self, ids):
+        return self.policy.model._default_manager.filter(pk__in=ids).delete()
+
+    def archive_table(self, ids, payload):
+        with transaction.atomic():
+            ArchivedBatch.objects.create(
+                policy=self.policy.name,
+                model=self.policy.model._meta.label,
+                first_id=ids[0],
+                last_id=ids[-1],
+                count=len(ids),
+                data=payload,
+            )
+            self.delete(ids)
+
+    def write_state(self, state):
+        tmp = self.state_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.state_path)
+
+    def archive_file(self, ids, payload):
+        if self.target is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.target = self.directory / f'{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz'
+        offset = self.target.stat().st_size if self.target.exists() else 0
+        self.write_state({'file': str(self.target), 'offset': offset, 'ids': ids})
+        with open(self.target, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        with transaction.atomic():
+            self.delete(ids)
+        self.state_path.unlink()
+
+    def resume(self):
+        """Termine un lot interrompu : la suppression est tout ou rien"""
+        if not self.state_path.exists():
+            return
+        state = json.loads(self.state_path.read_text())
+        path = Path(state['file'])
+        if self.policy.model._default_manager.filter(pk__in=state['ids']).exists():
+            # Suppression non validée : le lot sera archivé à nouveau
+            if path.exists():
+                os.truncate(path, state['offset'])
+            self.log(f"{self.policy.name} : lot interrompu retiré de {path.name}")
+        else:
+            self.log(f"{self.policy.name} : lot interrompu déjà supprimé, archive conservée")
+        self.state_path.unlink()
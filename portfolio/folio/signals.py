@@ -0,0 +1,172 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import archive, blobs, caching, facets, surrogates, typeahead
+from .models import Project, Skill, Profile, BlogPost, Category, Tag, Comment, Experience, Education
+
+
+def after_commit(func, *args):
+    """Exécuté après la transaction en cours : un worker qui recalculerait
+    avant le commit relirait les anciennes données et les garderait"""
+    transaction.on_commit(partial(func, *args), robust=True)
+
+
+# Index des facettes du portfolio
+@receiver(m2m_changed, sender=Project.technologies.through)
+def technologies_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        after_commit(facets.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Skill)
+def portfolio_changed(sender, **kwargs):
+    after_commit(facets.invalidate)
+
+
+# Pages mises en cache : marquées périmées, recalculées par un seul worker
+# Slug et catégorie d'origine : l'ancienne page et les articles similaires de l'ancienne catégorie
+@receiver(pre_save, sender=BlogPost)
+def blog_post_cache_before(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = BlogPost.objects.filter(pk=instance.pk).values_list('slug', 'category_id').first()
+    instance._cache_previous = previous
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+def blog_post_changed(sender, instance, **kwargs):
+    old_slug, old_category = vars(instance).pop('_cache_previous', None) or (instance.slug, instance.category_id)
+    # Articles de la même catégorie : il figure dans leurs articles similaires
+    categories = {category for category in (instance.category_id, old_category) if category}
+    related = BlogPost.objects.filter(category_id__in=categories, status='published').exclude(
+        pk=instance.pk).values_list('slug', flat=True) if categories else []
+    after_commit(caching.invalidate, 'home', 'blog:sidebar', f'blog_detail:{instance.slug}',
+                 *{f'blog_detail:{slug}' for slug in (old_slug, *related)})
+
+
+# Compteurs des archives : mois d'origine lu avant l'écriture
+@receiver(pre_save, sender=BlogPost)
+def blog_post_archive_before(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = BlogPost.objects.filter(pk=instance.pk).values_list('status', 'published_date').first()
+    instance._archive_month = archive.month_of(*previous) if previous else None
+
+
+@receiver(post_save, sender=BlogPost)
+def blog_post_archive_after(sender, instance, **kwargs):
+    archive.move(getattr(instance, '_archive_month', None),
+                 archive.month_of(instance.status, instance.published_date))
+
+
+@receiver(post_delete, sender=BlogPost)
+def blog_post_archive_deleted(sender, instance, **kwargs):
+    archive.adjust(archive.month_of(instance.status, instance.published_date), -1)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+def blog_taxonomy_changed(sender, **kwargs):
+    after_commit(caching.invalidate, 'blog:sidebar')
+
+
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Skill)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver(m2m_changed, sender=Project.technologies.through)
+def home_changed(sender, **kwargs):
+    after_commit(caching.invalidate, 'home', 'portfolio')
+
+
+# Suggestions de recherche : modification rejouée par chaque worker
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Skill)
+def typeahead_saved(sender, instance, **kwargs):
+    typeahead.saved(instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Skill)
+def typeahead_deleted(sender, instance, **kwargs):
+    typeahead.deleted(instance)
+
+
+# Pages gardées par le CDN : clés purgées après la transaction (voir surrogates.py)
+@receiver([post_save, post_delete], sender=BlogPost)
+def blog_post_purge(sender, instance, signal, **kwargs):
+    keys = [surrogates.key(instance)]
+    if instance.category_id:
+        keys.append(surrogates.key(instance.category))
+    # Publication, retrait ou changement de date : les listes changent
+    month = archive.month_of(instance.status, instance.published_date)
+    if month != (None if signal is post_delete else getattr(instance, '_archive_month', None)):
+        keys.append('posts')
+    surrogates.purge(*keys)
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+@receiver(m2m_changed, sender=Project.technologies.through)
+def relations_purge(sender, instance, action, model, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        surrogates.purge(surrogates.key(instance), *map(surrogates.key, model.objects.filter(pk__in=pk_set)))
+    elif action == 'pre_clear':
+        surrogates.purge(surrogates.key(instance), surrogates.COLLECTIONS[model._meta.model_name])
+
+
+# Slug d'origine : les pages gardées portent l'ancienne clé
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Tag)
+def taxonomy_purge_before(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._surrogate_key = surrogates.key(previous) if previous else None
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Tag)
+def taxonomy_purge(sender, instance, **kwargs):
+    surrogates.purge(getattr(instance, '_surrogate_key', None), surrogates.key(instance),
+                     surrogates.collection(instance))
+
+
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Skill)
+@receiver([post_save, post_delete], sender=Profile)
+@receiver([post_save, post_delete], sender=Experience)
+@receiver([post_save, post_delete], sender=Education)
+def portfolio_purge(sender, instance, **kwargs):
+    surrogates.purge(surrogates.key(instance), surrogates.collection(instance))
+
+
+# Commentaire approuvé ou retiré : page de l'article
+@receiver([post_save, post_delete], sender=Comment)
+def comment_purge(sender, instance, **kwargs):
+    surrogates.purge(f'post-{instance.post_id}', surrogates.collection(instance))
+
+
+# Fichiers envoyés : nom remplacé ou ligne supprimée, nom effacé après le commit
+@receiver(pre_save)
+def files_before(sender, instance, raw=False, **kwargs):
+    if blobs.file_fields(sender) and instance.pk and not raw:
+        instance._file_names = blobs.stored_names(instance)
+
+
+@receiver(post_save)
+def files_replaced(sender, instance, **kwargs):
+    replaced = getattr(instance, '_file_names', set()) - blobs.file_names(instance)
+    if replaced:
+        after_commit(blobs.release, replaced)
+
+
+@receiver(post_delete)
+def files_deleted(sender, instance, **kwargs):
+    names = blobs.file_names(instance) if blobs.file_fields(sender) else set()
+    if names:
+        after_commit(blobs.release, names)
@@ -0,0 +1,77 @@
+"""
+Filtrage des commentaires avant toute requête SQL.
+
+Trois contrôles, du moins au plus coûteux :
+- limite de débit par IP, fenêtre fixe comptée dans le cache ;
+- liste de mots interdits (frozenset, recherche O(1) par mot) ;
+- heuristiques : trop de liens, texte presque entièrement en majuscules.
+
+Le champ piège (honeypot) est vérifié par la vue elle-même.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_RATE = (5, 60)  # commentaires par IP et par fenêtre de 60 s
+MAX_LINKS = 2
+MAX_UPPER_RATIO = 0.7
+
+# Mots sans autre usage sur le site ; ceux qui dépendent du sujet des
+# articles (seo, crypto, replica...) vont dans FOLIO_COMMENT_BLOCKLIST
+BLOCKLIST = frozenset({'viagra', 'cialis', 'casino', 'porn', 'escort'})
+
+WORD = re.compile(r'\w+')
+LINK = re.compile(r'https?://|www\.', re.IGNORECASE)
+
+
+def client_ip(request):
+    """IP du client ; derrière un proxy, dernière valeur de FOLIO_CLIENT_IP_HEADER"""
+    header = getattr(settings, 'FOLIO_CLIENT_IP_HEADER', None)
+    if header and request.META.get(header):
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def get_rate():
+    return getattr(settings, 'FOLIO_COMMENT_RATE', DEFAULT_RATE)
+
+
+def rate_limited(ip):
+    """Compte la soumission ; vrai si l'IP a dépassé sa limite dans la fenêtre"""
+    limit, window = get_rate()
+    key = f'folio:comment-rate:{ip}:{int(time.time()) // window}'
+    # add() n'écrase pas un compteur existant ; incr() est atomique (Redis)
+    if cache.add(key, 1, window):
+        return False
+    try:
+        return cache.incr(key) > limit
+    except ValueError:
+        # Clé expirée entre add() et incr()
+        cache.add(key, 1, window)
+        return False
+
+
+def retry_after():
+    """Secondes avant la prochaine fenêtre"""
+    _, window = get_rate()
+    return window - int(time.time()) % window
+
+
+def get_blocklist():
+    extra = getattr(settings, 'FOLIO_COMMENT_BLOCKLIST', ())
+    return BLOCKLIST | {word.lower() for word in extra} if extra else BLOCKLIST
+
+
+def classify(name, content):
+    """Raison du rejet, ou None si le commentaire semble légitime"""
+    text = f'{name} {content}'
+    if not get_blocklist().isdisjoint(word.lower() for word in WORD.findall(text)):
+        return "Contenu refusé"
+    if len(LINK.findall(content)) > MAX_LINKS:
+        return "Trop de liens"
+    letters = [c for c in content if c.isalpha()]
+    if len(letters) >= 20 and sum(c.isupper() for c in letters) / len(letters) > MAX_UPPER_RATIO:
+        return "Merci de ne pas écrire en majuscules"
+    return None
@@ -0,0 +1,196 @@
+"""
+Pages gardées par le CDN ou le proxy inverse, purgées par clés de substitution.
+
+- chaque vue déclare ce qu'elle rend : surrogates.add(request, post,
+  'posts') ; clés d'objet (post-12, project-3, category-django, tag-orm)
+  et de collection (posts, projects, skills...) : une collection est purgée
+  quand un objet y entre, en sort, ou quand ses objets n'ont pas de clé
+  propre (compétences, parcours, profil) ;
+- SurrogateKeyMiddleware met ces clés dans l'en-tête Surrogate-Key (Fastly,
+  Varnish xkey ; Cache-Tag pour Cloudflare) des réponses publiques (voir
+  PublicRequestMiddleware), avec un s-maxage long : le proxy les garde
+  jusqu'à leur purge, le navigateur pas plus longtemps qu'avant ;
+- les signaux (folio/signals.py) appellent purge() : clés regroupées et
+  dédoublonnées jusqu'à la fin de la transaction, puis une tâche cdn.purge,
+  que le worker regroupe à son tour avec les autres en attente ;
+- le purger est configurable (FOLIO_SURROGATE_PURGER) : NullPurger par
+  défaut, HttpPurger (requête PURGE ou POST, clés en en-tête),
+  MemoryPurger (tests, banc d'essai).
+
+Chaque page porte aussi la clé ALL : après un déploiement, les pages
+gardées citent des fichiers statiques qui n'existent plus, `manage.py
+purge_cdn` les purge toutes.
+"""
+import logging
+import urllib.request
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import has_vary_header, patch_cache_control
+from django.utils.module_loading import import_string
+
+from . import caching, jobs
+
+logger = logging.getLogger('folio')
+
+ALL = 'folio'
+HEADER = getattr(settings, 'FOLIO_SURROGATE_HEADER', 'Surrogate-Key')
+# Cloudflare sépare les étiquettes par des virgules, Fastly et Varnish par des espaces
+SEPARATOR = ',' if HEADER.lower() == 'cache-tag' else ' '
+# Durée de garde par le proxy (s) : la purge, pas l'expiration, rafraîchit les pages
+MAX_AGE = getattr(settings, 'FOLIO_SURROGATE_MAX_AGE', 86400)
+# Au-delà, la réponse n'est pas gardée par le proxy : en-tête trop long
+MAX_KEYS = getattr(settings, 'FOLIO_SURROGATE_MAX_KEYS', 64)
+# Clés par requête de purge (256 au plus chez Fastly)
+BATCH = getattr(settings, 'FOLIO_SURROGATE_BATCH', 256)
+UNCACHEABLE = ('private', 'no-store', 'no-cache')
+
+# Modèle -> collection
+COLLECTIONS = {
+    'blogpost': 'posts',
+    'project': 'projects',
+    'category': 'categories',
+    'tag': 'tags',
+    'comment': 'comments',
+    'skill': 'skills',
+    'experience': 'experiences',
+    'education': 'education',
+    'profile': 'profile',
+}
+# Collections dont chaque objet a sa clé, <préfixe>-<id>
+OBJECTS = {'posts': 'post', 'projects': 'project'}
+# Collections citées dans les lignes d'une autre : slugs des tags, noms des technologies
+EMBEDDED = {'posts': ('categories', 'tags'), 'projects': ('skills',), 'comments': ('posts',)}
+# Modèles dont la clé suit le slug, comme leurs URL
+SLUGGED = ('category', 'tag')
+
+
+def key(obj):
+    """Clé d'un objet rendu ; une chaîne est déjà une clé"""
+    if isinstance(obj, str):
+        return obj
+    name = obj._meta.model_name
+    if name in SLUGGED:
+        return f'{name}-{obj.slug}'
+    collection = COLLECTIONS[name]
+    prefix = OBJECTS.get(collection)
+    return f'{prefix}-{obj.pk}' if prefix else collection
+
+
+def collection(obj):
+    return COLLECTIONS[obj._meta.model_name]
+
+
+def row_keys(collection, ids):
+    """Clés de lignes lues sans instancier de modèle (API)"""
+    prefix = OBJECTS.get(collection)
+    keys = [f'{prefix}-{pk}' for pk in ids] if prefix else []
+    return [collection, *EMBEDDED.get(collection, ()), *keys]
+
+
+def add(request, *objects):
+    """Déclare les objets ou clés rendus par la page ; None est ignoré"""
+    request.folio_surrogate_keys = getattr(request, 'folio_surrogate_keys', ()) + tuple(
+        key(obj) for obj in objects if obj is not None
+    )
+
+
+def cacheable(request, response):
+    """Réponse publique, identique pour tous les visiteurs, sans donnée périmée"""
+    if not getattr(request, 'folio_public', False) or response.status_code != 200 or caching.served_stale.get():
+        return False
+    control = response.get('Cache-Control', '').lower()
+    return not any(directive in control for directive in UNCACHEABLE) and not has_vary_header(response, 'Cookie')
+
+
+def patch_response(request, response):
+    if not cacheable(request, response):
+        return
+    keys = tuple(dict.fromkeys((ALL,) + getattr(request, 'folio_surrogate_keys', ())))
+    if len(keys) > MAX_KEYS:
+        return
+    response.headers[HEADER] = SEPARATOR.join(keys)
+    patch_cache_control(response, public=True, s_maxage=MAX_AGE)
+
+
+class NullPurger:
+    """Sans proxy : rien à purger"""
+
+    def purge(self, keys):
+        pass
+
+
+class MemoryPurger:
+    """Garde les lots de clés purgés : tests et banc d'essai"""
+
+    def __init__(self):
+        self.requests = []
+
+    def purge(self, keys):
+        self.requests.append(list(keys))
+
+
+class HttpPurger:
+    """Une requête HTTP par lot de clés.
+
+    Varnish (xkey) : method='PURGE', header='xkey-purge' ; Fastly :
+    url=.../service/<id>/purge, method='POST', header='Surrogate-Key',
+    headers={'Fastly-Key': ...}. Une erreur HTTP lève une exception : la
+    tâche est relancée plus tard.
+    """
+
+    def __init__(self, url, method='PURGE', header='Surrogate-Key', headers=None, timeout=5):
+        self.url, self.method, self.header = url, method, header
+        self.headers = headers or {}
+        self.timeout = timeout
+
+    def purge(self, keys):
+        request = urllib.request.Request(
+            self.url, method=self.method, headers={**self.headers, self.header: ' '.join(keys)}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+@lru_cache(maxsize=None)
+def get_purger():
+    config = getattr(settings, 'FOLIO_SURROGATE_PURGER', None) or {'BACKEND': 'folio.surrogates.NullPurger'}
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def send(keys):
+    """Purge les clés par lots de BATCH ; ALL les remplace toutes"""
+    keys = sorted(set(keys))
+    if ALL in keys:
+        keys = [ALL]
+    purger = get_purger()
+    for start in range(0, len(keys), BATCH):
+        purger.purge(keys[start:start + BATCH])
+    if keys:
+        logger.info("CDN : %d clés purgées", len(keys))
+
+
+class Batch(set):
+    """Clés à purger à la fin d'une transaction"""
+    sent = False
+
+    def __call__(self):
+        self.sent = True
+        jobs.enqueue('cdn.purge', keys=sorted(self))
+
+
+def purge(*keys):
+    """Purge les clés après la transaction en cours, une fois chacune"""
+    keys = set(filter(None, keys))
+    if not keys:
+        return
+    connection = transaction.get_connection()
+    batch = getattr(connection, 'folio_surrogate_batch', None)
+    # Lot toujours attendu par la transaction ? Annulé, il a disparu de la liste
+    if batch is not None and not batch.sent and any(entry[1] is batch for entry in connection.run_on_commit):
+        batch.update(keys)
+        return
+    batch = connection.folio_surrogate_batch = Batch(keys)
+    # Hors transaction, exécuté tout de suite ; une erreur du proxy n'annule pas l'écriture
+    transaction.on_commit(batch, robust=True)
@@ -0,0 +1,84 @@
+"""
+Handlers des tâches différées du folio (voir folio/jobs.py).
+"""
+from collections import Counter
+
+from django.db.models import F
+from django.utils import timezone
+
+from . import jobs, retention, surrogates
+from .models import BlogPost, Comment, ContactMessage, MediaDownload
+
+
+@jobs.register('blog.view', batch=True)
+def count_views(payloads):
+    """Applique les vues cumulées par les workers : un UPDATE par article"""
+    counts = Counter()
+    for payload in payloads:
+        # Clés JSON : identifiants devenus chaînes
+        counts.update({int(pk): n for pk, n in payload['counts'].items()})
+    for post_id, count in counts.items():
+        BlogPost.objects.filter(pk=post_id).update(views=F('views') + count)
+
+
+@jobs.register('media.downloads', batch=True)
+def count_downloads(payloads):
+    """Compteurs accumulés en mémoire par les workers : un UPDATE par fichier"""
+    counts = Counter()
+    for payload in payloads:
+        counts.update(payload['counts'])
+    now = timezone.now()
+    for name, count in counts.items():
+        download, _ = MediaDownload.objects.get_or_create(name=name)
+        MediaDownload.objects.filter(pk=download.pk).update(count=F('count') + count, last_download=now)
+
+
+@jobs.register('cdn.purge', batch=True)
+def purge_cdn(payloads):
+    """Purges en attente regroupées : chaque clé une fois, par lots"""
+    surrogates.send(key for payload in payloads for key in payload['keys'])
+
+
+@jobs.register('contact.message', batch=True)
+def save_contact_messages(payloads):
+    ContactMessage.objects.bulk_create([
+        ContactMessage(
+            name=payload['name'],
+            email=payload['email'],
+            subject=payload['subject'],
+            message=payload['message'],
+        )
+        for payload in payloads
+    ])
+
+
+@jobs.register('retention.run')
+def run_retention(payload):
+    policies = retention.get_policies()
+    for name in payload.get('policies') or policies:
+        retention.Runner(policies[name]).run()
+
+
+@jobs.register('comment.submit', batch=True)
+def save_comments(payloads):
+    """Insère les commentaires en attente de modération, en un bulk_create par lot"""
+    post_ids = set(BlogPost.objects.filter(
+        pk__in={payload['post_id'] for payload in payloads}
+    ).values_list('pk', flat=True))
+    # Réponses : le parent doit être un commentaire de premier niveau du même article
+    parents = dict(Comment.objects.filter(
+        pk__in={payload['parent_id'] for payload in payloads if payload.get('parent_id')},
+        parent__isnull=True,
+    ).values_list('pk', 'post_id'))
+    Comment.objects.bulk_create([
+        Comment(
+            post_id=payload['post_id'],
+            parent_id=payload['parent_id'] if parents.get(payload.get('parent_id')) == payload['post_id'] else None,
+            name=payload['name'],
+            email=payload['email'],
+            content=payload['content'],
+            active=False,
+        )
+        for payload in payloads
+        if payload['post_id'] in post_ids
+    ])
@@ -0,0 +1,21 @@
+from django import template
+
+from folio import assets
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def critical_css(context, stylesheet='src/output.css'):
+    """CSS critique du template de page en cours (voir build_assets)"""
+    return assets.render_critical_css(context.template.name, stylesheet)
+
+
+@register.simple_tag
+def font_stylesheets():
+    return assets.render_font_stylesheets()
+
+
+@register.simple_tag
+def service_worker():
+    return assets.render_service_worker()
@@ -1,3 +1,1025 @@
-from django.test import TestCase
+import cProfile
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    admission, api, archive, blobs, caching, compression, content, exports, facets, jobs, media, nplusone,
+    offline, preload, profiling, retention, surrogates, typeahead, views,
+)
+from .admin import BlogPostAdmin, CommentAdmin
+from .models import ArchiveMonth, BlogPost, Category, Comment, ContactMessage, Job, Project, Skill, Tag
+from portfolio.log import AsyncHandler, JSONFormatter, SharedRotatingFileHandler
+
+
+class StampedeCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def hammer(self, key, compute, threads=20):
+        results = []
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            barrier.wait()
+            results.append(caching.get_or_compute(key, compute, ttl=60))
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        return results
+
+    def test_single_recompute_on_miss(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'page'
+
+        results = self.hammer('miss', compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['page'] * 20)
+
+    def test_single_recompute_per_expiry_serves_stale(self):
+        caching.get_or_compute('stale', lambda: 'v1', ttl=60)
+        caching.invalidate('stale')
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'v2'
+
+        results = self.hammer('stale', compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(set(results), {'v1', 'v2'})
+        self.assertEqual(caching.get_or_compute('stale', compute, ttl=60), 'v2')
+        self.assertGreater(caching.stats()['stale'], 0)
+
+
+
+class LogRotationTests(SimpleTestCase):
+    def test_default_handlers_are_async(self):
+        for name in ('django', 'folio'):
+            handlers = logging.getLogger(name).handlers
+            self.assertTrue(handlers)
+            self.assertTrue(all(isinstance(handler, AsyncHandler) for handler in handlers))
+
+    def test_shared_file_rotated_and_compressed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'folio.log')
+            # Deux processus qui écrivent dans le même fichier
+            handlers = [SharedRotatingFileHandler(path, max_bytes=400, backup_count=3) for _ in range(2)]
+            for handler in handlers:
+                handler.check_interval = 0
+                handler.setFormatter(JSONFormatter())
+            for n in range(40):
+                handlers[n % 2].handle(logging.makeLogRecord({'msg': f'ligne {n}', 'levelname': 'INFO'}))
+            for handler in handlers:
+                handler.close()
+
+            self.assertEqual(sorted(os.listdir(tmp)), [
+                'folio.log', 'folio.log.1', 'folio.log.2.gz', 'folio.log.3.gz', 'folio.log.lock',
+            ])
+            lines = []
+            for name in ('folio.log.3.gz', 'folio.log.2.gz'):
+                with gzip.open(os.path.join(tmp, name), 'rt') as f:
+                    lines += f.read().splitlines()
+            for name in ('folio.log.1', 'folio.log'):
+                with open(os.path.join(tmp, name)) as f:
+                    lines += f.read().splitlines()
+            # Segments gardés : les dernières lignes, sans perte ni doublon
+            messages = [json.loads(line)['message'] for line in lines]
+            first = int(messages[0].split()[1])
+            self.assertEqual(messages, [f'ligne {n}' for n in range(first, 40)])
+
+
+@override_settings(FOLIO_JOBS_ENABLED=True, FOLIO_JOBS_RETRY_DELAY=60)
+class JobQueueTests(TestCase):
+    def test_batches_same_kind(self):
+        author = User.objects.create(username='auteur')
+        post = BlogPost.objects.create(title='A', slug='a', author=author, content='x')
+        for _ in range(5):
+            jobs.enqueue('blog.view', counts={str(post.pk): 2})
+
+        self.assertEqual(jobs.run_once(), (5, 0))
+        post.refresh_from_db()
+        self.assertEqual(post.views, 10)
+        self.assertEqual(Job.objects.filter(status='done').count(), 5)
+        self.assertEqual(jobs.run_once(), (0, 0))
+
+    def test_views_are_flushed_in_one_job(self):
+        author = User.objects.create(username='auteur')
+        post = BlogPost.objects.create(title='A', slug='a', author=author, content='x', status='published')
+        counter = jobs.BufferedCounter('blog.view', interval=3600)
+        with mock.patch.object(views, 'post_views', counter):
+            for _ in range(7):
+                self.assertEqual(self.client.get(post.get_absolute_url(), secure=True).status_code, 200)
+        self.assertFalse(Job.objects.exists())
+
+        counter.flush()
+        self.assertEqual(Job.objects.get().payload, {'counts': {str(post.pk): 7}})
+        self.assertEqual(jobs.run_once(), (1, 0))
+        post.refresh_from_db()
+        self.assertEqual(post.views, 7)
+
+    def test_failure_is_retried_with_backoff(self):
+        jobs.enqueue('contact.message', name='A', email='a@x.fr', subject='S')
+
+        self.assertEqual(jobs.run_once(), (0, 1))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertIn('KeyError', job.last_error)
+        # La prochaine tentative est repoussée
+        self.assertEqual(jobs.run_once(), (0, 0))
+        self.assertFalse(ContactMessage.objects.exists())
+
+    def test_failed_batch_retried_job_by_job(self):
+        jobs.enqueue('contact.message', name='A', email='a@x.fr', subject='S', message='M')
+        jobs.enqueue('contact.message', name='B', email='b@x.fr', subject='S')
+        jobs.enqueue('contact.message', name='C', email='c@x.fr', subject='S', message='M')
+
+        self.assertEqual(jobs.run_once(), (2, 1))
+        self.assertEqual(sorted(ContactMessage.objects.values_list('name', flat=True)), ['A', 'C'])
+        self.assertEqual(Job.objects.get(status='pending').payload['name'], 'B')
+
+    def test_expired_lease_is_reclaimed(self):
+        jobs.enqueue('contact.message', name='A', email='a@x.fr', subject='S', message='M')
+        self.assertEqual(len(jobs.claim(10)), 1)
+        # Worker arrêté en cours d'exécution : la tâche reste louée jusqu'à l'expiration du bail
+        self.assertEqual(jobs.claim(10), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.run_once(), (1, 0))
+        self.assertEqual(Job.objects.get().status, 'done')
+
+        Job.objects.update(finished_date=timezone.now() - timedelta(days=30))
+        retention.Runner(retention.get_policies()['jobs'], pause=0).run()
+        self.assertFalse(Job.objects.exists())
+
+    def test_eager_when_disabled(self):
+        with self.settings(FOLIO_JOBS_ENABLED=False):
+            jobs.enqueue('contact.message', name='A', email='a@x.fr', subject='S', message='M')
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class PublicPathTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='auteur', is_staff=True)
+        self.post = BlogPost.objects.create(
+            title='A', slug='a', author=self.author, content='x', status='published'
+        )
+
+    def test_public_pages_set_no_cookie(self):
+        for url in ['folio:home', 'folio:about', 'folio:portfolio', 'folio:blog', 'folio:contact']:
+            with self.subTest(url=url):
+                response = self.client.get(reverse(url), secure=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.cookies)
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+        response = self.client.get(self.post.get_absolute_url(), secure=True)
+        self.assertFalse(response.cookies)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+    def test_contact_csrf_token_and_flash_message(self):
+        client = Client(enforce_csrf_checks=True)
+        contact = reverse('folio:contact')
+        response = client.get(reverse('folio:csrf_token'), secure=True)
+        self.assertIn('csrftoken', response.cookies)
+        data = {'name': 'A', 'email': 'a@x.fr', 'subject': 'S', 'message': 'M',
+                'csrfmiddlewaretoken': response.json()['token']}
+
+        response = client.post(contact, data, secure=True, HTTP_REFERER=f'https://testserver{contact}')
+        self.assertRedirects(response, contact, fetch_redirect_response=False)
+        self.assertNotIn('sessionid', response.cookies)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+        # Message lu depuis le cookie signé, puis effacé
+        response = client.get(contact, secure=True)
+        self.assertContains(response, 'Votre message a été envoyé')
+        self.assertEqual(response.cookies['messages'].value, '')
+
+    def test_session_cookie_keeps_full_path(self):
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('folio:home'), secure=True)
+        self.assertTrue(response.wsgi_request.user.is_staff)
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='auteur', is_staff=True)
+
+    def test_negotiate(self):
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.negotiate('gzip;q=0, identity'), None)
+        self.assertEqual(compression.negotiate('*;q=0.5, gzip;q=0', ['br', 'gzip']), 'br')
+        self.assertEqual(compression.negotiate('gzip;q=0.5, br', ['br', 'gzip']), 'br')
+        self.assertEqual(compression.negotiate(None), None)
+
+    def test_public_pages_only(self):
+        home = reverse('folio:home')
+        response = self.client.get(home, secure=True, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        # Jeton CSRF et pages d'un visiteur connecté : secrets dans le corps (BREACH)
+        response = self.client.get(reverse('folio:csrf_token'), secure=True, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.client.force_login(self.author)
+        response = self.client.get(home, secure=True, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='auteur')
+        tag = Tag.objects.create(name='Django', slug='django')
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            # Dates partagées deux à deux : le curseur départage par id
+            for n in range(5):
+                post = BlogPost.objects.create(title=f'P{n}', slug=f'p{n}', author=author, content='x',
+                                               status='published', published_date=now - timedelta(days=n // 2))
+                post.tags.add(tag)
+
+    def get(self, url, **params):
+        return self.client.get(url, params, secure=True)
+
+    def test_sparse_fieldsets(self):
+        url = reverse('folio:api_list', args=['posts'])
+        results = self.get(url, fields='title,tags').json()['results']
+        self.assertEqual([set(row) for row in results], [{'id', 'title', 'tags'}] * 5)
+        self.assertEqual(results[0]['tags'], ['django'])
+        # Champs par défaut : sans le contenu complet
+        default = self.get(url).json()['results'][0]
+        self.assertIn('excerpt', default)
+        self.assertNotIn('content', default)
+        response = self.get(url, fields='title,email')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Champ inconnu : email'}))
+        detail = self.get(reverse('folio:api_detail', args=['posts', 'p0']), fields='slug').json()
+        self.assertEqual(detail, {'id': BlogPost.objects.get(slug='p0').pk, 'slug': 'p0'})
+
+    def test_cursor_paging(self):
+        url = reverse('folio:api_list', args=['posts'])
+        expected = list(BlogPost.objects.order_by('-published_date', '-id').values_list('slug', flat=True))
+        slugs, pages, params = [], [], {'limit': 2, 'fields': 'slug'}
+        while True:
+            body = self.get(url, **params).json()
+            slugs += [row['slug'] for row in body['results']]
+            if not body['next']:
+                break
+            self.assertTrue(body['next'].startswith('https://testserver/'))
+            params = {key: values[0] for key, values in parse_qs(urlsplit(body['next']).query).items()}
+            pages.append(params)
+        self.assertEqual((slugs, len(pages)), (expected, 2))
+        # Un article publié entre deux pages ne décale pas la suite
+        BlogPost.objects.create(title='N', slug='n', author=User.objects.get(), content='x', status='published')
+        body = self.get(url, **pages[0]).json()
+        self.assertEqual([row['slug'] for row in body['results']], expected[2:4])
+        self.assertEqual(self.get(url, cursor='!!').status_code, 400)
+        self.assertEqual(self.get(url, cursor=api.encode_cursor(['x'])).status_code, 400)
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class ArchiveTests(TestCase):
+    def months(self):
+        return {(row.year, row.month): row.count for row in ArchiveMonth.objects.all()}
+
+    def save(self, post, **changes):
+        for name, value in changes.items():
+            setattr(post, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+    def test_publish_unpublish_and_date_move(self):
+        author = User.objects.create(username='auteur')
+        march = timezone.make_aware(datetime(2024, 3, 15))
+        may = timezone.make_aware(datetime(2024, 5, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='A', slug='a', author=author, content='x', published_date=march)
+            BlogPost.objects.create(title='B', slug='b', author=author, content='x', status='published',
+                                    published_date=march)
+        self.assertEqual(self.months(), {(2024, 3): 1})
+
+        self.save(post, status='published')
+        self.assertEqual(self.months(), {(2024, 3): 2})
+        self.save(post, published_date=may)
+        self.assertEqual(self.months(), {(2024, 3): 1, (2024, 5): 1})
+        self.save(post, status='draft')
+        # Mois vide : ligne supprimée
+        self.assertEqual(self.months(), {(2024, 3): 1})
+
+        # Actions de l'admin (update() sans signaux) : différence appliquée
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPostAdmin(BlogPost, admin.site).make_published(None, BlogPost.objects.all())
+        self.assertEqual(self.months(), {(2024, 3): 1, (2024, 5): 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.get(slug='b').delete()
+        self.assertEqual(self.months(), {(2024, 5): 1})
+        self.assertEqual(archive.rebuild(), 1)
+        self.assertEqual(self.months(), {(2024, 5): 1})
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class MediaServeTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        media_root = self.settings(MEDIA_ROOT=tmp.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(tmp.name, 'cv'))
+        with open(os.path.join(tmp.name, 'cv', 'cv.pdf'), 'wb') as f:
+            f.write(bytes(range(100)))
+        for patcher in (mock.patch.object(media, 'ACCEL', None),
+                        mock.patch.object(media, 'downloads', jobs.BufferedCounter('media.downloads', 3600))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.url = reverse('media', kwargs={'name': 'cv/cv.pdf'})
+
+    def get(self, **headers):
+        response = self.client.get(self.url, secure=True, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_parse_range(self):
+        for header, expected in [
+            (None, None), ('', None), ('bytes=-', None), ('items=0-1', None), ('bytes=0-1,4-5', None),
+            ('bytes=0-9', (0, 9)), ('bytes=90-', (90, 99)), ('bytes=-10', (90, 99)),
+            ('bytes=-500', (0, 99)), ('bytes=95-500', (95, 99)),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(media.parse_range(header, 100), expected)
+        for header, size in (('bytes=100-', 100), ('bytes=5-4', 100), ('bytes=0-0', 0)):
+            with self.subTest(header=header, size=size), self.assertRaises(ValueError):
+                media.parse_range(header, size)
+
+    def test_partial_and_unsatisfiable(self):
+        response, body = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, bytes(range(10, 20)))
+        self.assertEqual((response['Content-Range'], response['Content-Length']), ('bytes 10-19/100', '10'))
+        # Ouverture du fichier en entier seulement : une reprise n'est pas un téléchargement
+        self.assertEqual(media.downloads.counts, {})
+
+        response, _ = self.get(Range='bytes=200-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */100'))
+
+        response, body = self.get()
+        self.assertEqual((response.status_code, body, response['Accept-Ranges']), (200, bytes(range(100)), 'bytes'))
+        self.assertEqual(media.downloads.counts, {'cv/cv.pdf': 1})
+
+    def test_etag_and_if_range(self):
+        response, _ = self.get()
+        etag = response['ETag']
+        self.assertIn('max-age=3600', response['Cache-Control'])
+        response, body = self.get(If_None_Match=etag)
+        self.assertEqual((response.status_code, body), (304, b''))
+        response, _ = self.get(If_Modified_Since=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        # If-Range périmé : le fichier entier plutôt qu'une plage d'une autre version
+        response, body = self.get(Range='bytes=0-9', If_Range='"autre"')
+        self.assertEqual((response.status_code, len(body)), (200, 100))
+        response, body = self.get(Range='bytes=0-9', If_Range=etag)
+        self.assertEqual((response.status_code, len(body)), (206, 10))
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False, FOLIO_PROFILING=True)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        for patcher in (mock.patch.object(profiling, 'DIRECTORY', self.directory),
+                        mock.patch.object(profiling, 'KEEP', 3)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def request(self, user=None, **extra):
+        request = RequestFactory().get('/', {'_profile': 'sample'} if user is not None else {}, **extra)
+        if user is not None:
+            request.user = user
+        return request
+
+    def test_activation(self):
+        staff = User(username='staff', is_staff=True)
+        self.assertEqual(profiling.requested(self.request(staff)), 'sample')
+        self.assertIsNone(profiling.requested(self.request(User(username='visiteur'))))
+        self.assertIsNone(profiling.requested(RequestFactory().get('/')))
+
+        token = profiling.make_token('sample')
+        self.assertEqual(profiling.requested(self.request(HTTP_X_FOLIO_PROFILE=token)), 'sample')
+        self.assertIsNone(profiling.requested(self.request(HTTP_X_FOLIO_PROFILE=token + 'x')))
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + profiling.TOKEN_MAX_AGE + 1):
+            self.assertIsNone(profiling.requested(self.request(HTTP_X_FOLIO_PROFILE=token)))
+
+        # Chaîne complète : le profil est enregistré et désigné par la réponse
+        response = Client().get(reverse('folio:about'), secure=True,
+                                HTTP_X_FOLIO_PROFILE=profiling.make_token('cprofile'))
+        data = profiling.load(response['X-Folio-Profile-Id'])
+        self.assertEqual((data['mode'], data['status']), ('cprofile', 200))
+        self.assertTrue((self.directory / f"{data['id']}.prof").exists())
+        self.assertNotIn('X-Folio-Profile-Id', Client().get(reverse('folio:about'), secure=True))
+
+    def test_ring_buffer_pruning(self):
+        ids = [f'20240101-00000{n}-{n:08x}' for n in range(5)]
+        for profile_id in ids:
+            profiling.save({'id': profile_id}, cProfile.Profile())
+        self.assertEqual(sorted(path.name for path in self.directory.iterdir()),
+                         [f'{profile_id}.{ext}' for profile_id in ids[2:] for ext in ('json', 'prof')])
+        with self.assertRaises(Http404):
+            profiling.load(ids[0])
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False, FOLIO_PRELOAD=True)
+class PreloadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def links(self, response):
+        return [value.strip() for value in response.get('Link', '').split(',') if value.strip()]
+
+    def test_link_values(self):
+        self.assertEqual(preload.link('/static/a.css', 'style'), '</static/a.css>; rel=preload; as=style')
+        self.assertEqual(preload.link('/static/a.woff2', 'font', 'font/woff2'),
+                         '</static/a.woff2>; rel=preload; as=font; type="font/woff2"; crossorigin')
+        self.assertIsNone(preload.static_link('favicon.ico'))
+        self.assertEqual(preload.static_link('src/output.css'), f"<{static('src/output.css')}>; rel=preload; as=style")
+
+    def test_page_links(self):
+        links = self.links(Client().get(reverse('folio:about'), secure=True))
+        self.assertIn(f"<{static('src/output.css')}>; rel=preload; as=style", links)
+        # Polices : fichiers du build, ou origine de Google Fonts en preconnect
+        self.assertTrue(any('as=font' in value or 'rel=preconnect' in value for value in links))
+        self.assertEqual(len(links), len(set(links)))
+        self.assertLessEqual(len(links), preload.MAX_LINKS)
+        # Pas d'en-tête hors des pages HTML
+        response = Client().get(reverse('folio:api_list', args=['tags']), secure=True)
+        self.assertNotIn('Link', response)
+
+    def test_lcp_image_first(self):
+        author = User.objects.create(username='auteur')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='A', slug='a', author=author, content='x', status='published',
+                                           featured_image='blog/une.jpg')
+        links = self.links(Client().get(post.get_absolute_url(), secure=True))
+        self.assertEqual(links[0], f'<{post.featured_image.url}>; rel=preload; as=image; fetchpriority=high')
+        self.assertEqual(len([value for value in links if 'fetchpriority' in value]), 1)
+
+
+class PrecacheManifestTests(SimpleTestCase):
+    def storage(self, **hashed_files):
+        return mock.Mock(base_url='/static/', hashed_files=hashed_files)
+
+    def manifest(self, storage, templates=(b'<html>',)):
+        critical = {'critical': {'home.html': 'build/critical/home.css'}}
+        with mock.patch.object(offline.assets, 'build_manifest', return_value=critical), \
+                mock.patch.object(offline, 'template_sources', return_value=list(templates)):
+            return offline.build_manifest(storage)
+
+    def test_version_follows_content(self):
+        files = {'src/output.css': 'src/output.1111.css', 'js/app.js': 'js/app.2222.js'}
+        first = self.manifest(self.storage(**files))
+        self.assertEqual(first, self.manifest(self.storage(**files)))
+        self.assertEqual(first['static'], ['/static/js/app.2222.js', '/static/src/output.1111.css'])
+        self.assertIn(reverse('folio:home'), first['pages'])
+
+        # Nouveau contenu, nouvelle empreinte dans le nom : nouvelle version
+        changed = self.manifest(self.storage(**dict(files, **{'src/output.css': 'src/output.3333.css'})))
+        self.assertNotEqual(changed['version'], first['version'])
+        # Template modifié : nouvelle version, mêmes fichiers
+        edited = self.manifest(self.storage(**files), templates=(b'<html lang="fr">',))
+        self.assertNotEqual(edited['version'], first['version'])
+        self.assertEqual(edited['static'], first['static'])
+
+    def test_excluded_files_do_not_change_version(self):
+        files = {'src/output.css': 'src/output.1111.css'}
+        first = self.manifest(self.storage(**files))
+        # Admin, CSS critique déjà inliné et images : hors précache
+        extra = {
+            'admin/css/base.css': 'admin/css/base.4444.css',
+            'build/critical/home.css': 'build/critical/home.6666.css',
+            'img/logo.png': 'img/logo.5555.png',
+        }
+        self.assertEqual(self.manifest(self.storage(**files, **extra)), first)
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class ImportTests(TestCase):
+    def test_unresolved_names_reported(self):
+        User.objects.create(username='auteur')
+        Category.objects.create(name='Django', slug='django')
+        errors = []
+        importer = content.Importer(default_author='auteur', log=errors.append)
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = importer.run([{'title': 'A', 'category': 'DJANGO', 'tags': ['!!!', 'ORM']}])
+
+        self.assertEqual((counts['posts'], counts['errors']), (1, 2))
+        self.assertEqual(errors, ["category 'DJANGO' : slug vide ou déjà utilisé, non créé",
+                                  "tag '!!!' : slug vide ou déjà utilisé, non créé"])
+        post = BlogPost.objects.get()
+        self.assertIsNone(post.category)
+        self.assertEqual(list(post.tags.values_list('slug', flat=True)), ['orm'])
+
+    def test_missing_names_reported_without_creation(self):
+        User.objects.create(username='auteur')
+        Tag.objects.create(name='ORM', slug='orm')
+        errors = []
+        importer = content.Importer(default_author='auteur', create_missing=False, log=errors.append)
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = importer.run([{'title': 'A', 'category': 'Django', 'tags': ['ORM', 'SQL']}])
+
+        self.assertEqual((counts['posts'], counts['errors']), (1, 2))
+        self.assertEqual(errors, ["category 'Django' : absent, non créé", "tag 'SQL' : absent, non créé"])
+        self.assertFalse(Category.objects.exists())
+        self.assertEqual(list(BlogPost.objects.get().tags.values_list('slug', flat=True)), ['orm'])
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class ExportTests(TestCase):
+    def test_csv_formulas_neutralized(self):
+        rows = [('=HYPERLINK("http://x")', '+1', '-a', '@SUM(A1)', '\tx', '\rx', 'ok', -3)]
+        body = b''.join(exports.csv_chunks(rows, ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h'])).decode('utf-8')
+        cells = list(csv.reader(io.StringIO(body)))[1]
+        self.assertEqual(cells, ['\'=HYPERLINK("http://x")', "'+1", "'-a", "'@SUM(A1)", "'\tx", "'\rx", 'ok', '-3'])
+
+    def test_large_queryset_is_streamed(self):
+        ContactMessage.objects.bulk_create(
+            ContactMessage(name=f'N{n}', email='a@x.fr', subject='S', message='m' * 200) for n in range(5000)
+        )
+        admin_user = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        url = reverse('admin:folio_contactmessage_export')
+        response = self.client.get(url, {'format': 'csv'}, secure=True)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        chunks = list(response.streaming_content)
+        # Paquets de 500 lignes : rien n'est accumulé avant l'envoi
+        self.assertGreaterEqual(len(chunks), 10)
+        self.assertLess(max(len(chunk) for chunk in chunks), 200 * 1024)
+        rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 5001)
+
+        response = self.client.get(url, {'format': 'jsonl', 'gzip': '1'}, secure=True)
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 5000)
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class InvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidated_after_commit(self):
+        facets.get_index()
+        caching.get_or_compute('home', lambda: 'v1', ttl=60)
+        version = cache.get(facets.VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(name='Go', category='backend')
+            # Avant le commit, un autre worker relirait les anciennes données
+            self.assertEqual(cache.get(facets.VERSION_KEY), version)
+            self.assertEqual(caching.get_or_compute('home', lambda: 'v2', ttl=60), 'v1')
+        self.assertNotEqual(cache.get(facets.VERSION_KEY), version)
+        self.assertEqual(caching.get_or_compute('home', lambda: 'v2', ttl=60), 'v2')
+
+    def test_post_moved_invalidates_old_slug_and_category(self):
+        author = User.objects.create(username='auteur')
+        web, data = Category.objects.create(name='Web', slug='web'), Category.objects.create(name='Data', slug='data')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='A', slug='a', author=author, content='x', status='published',
+                                           category=web)
+            for slug, category in (('b', web), ('c', data), ('d', None)):
+                BlogPost.objects.create(title=slug, slug=slug, author=author, content='x', status='published',
+                                        category=category)
+        keys = [f'blog_detail:{slug}' for slug in 'abcd']
+        for key in keys:
+            caching.get_or_compute(key, lambda: 'v1', ttl=60)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.slug, post.category = 'a2', data
+            post.save()
+        # Ancienne page, anciens et nouveaux articles similaires ; pas l'article sans catégorie
+        expired = [key for key in keys if cache.get(caching.PREFIX + key)['expires'] == 0]
+        self.assertEqual(expired, keys[:3])
+
+    def test_typeahead_replays_on_a_copy(self):
+        published = typeahead.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Asyncio', slug='asyncio')
+        index = typeahead.get_index()
+        # Les threads qui lisent encore l'index publié ne voient pas la modification
+        self.assertIsNot(index, published)
+        self.assertEqual(published.search('asyn'), [])
+        self.assertEqual([result['label'] for result in index.search('asyn')], ['Asyncio'])
+        self.assertIs(typeahead.get_index(), index)
+
+    def test_typeahead_results_open(self):
+        author = User.objects.create(username='auteur')
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name='Python web', slug='python-web')
+            BlogPost.objects.create(title='Python rapide', slug='python-rapide', author=author, content='x',
+                                    status='published', category=category)
+            Tag.objects.create(name='Python', slug='python')
+            Skill.objects.create(name='Python avancé', category='backend')
+            Project.objects.create(title='Python API', short_description='x')
+        results = typeahead.get_index().search('pyth')
+        self.assertEqual({result['type'] for result in results}, {'category', 'tag', 'skill', 'post'})
+        self.assertIn({'type': 'category', 'label': 'Python web', 'url': '/blog/?category=python-web'}, results)
+        for result in results:
+            with self.subTest(url=result['url']):
+                self.assertEqual(self.client.get(result['url'], secure=True).status_code, 200)
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class FacetTests(TestCase):
+    # Projets 10, 20, 30 ; Django et Flask (backend), React (frontend), Figma (design)
+    index = facets.FacetIndex(
+        [10, 20, 30],
+        {1: ('Django', 'backend'), 2: ('React', 'frontend'), 3: ('Figma', 'design'), 4: ('Flask', 'backend')},
+        {1: 0b011, 2: 0b110, 3: 0b100},
+    )
+
+    def ids(self, techs=(), categories=(), mode='and'):
+        return self.index.filter(techs, categories, mode)[0]
+
+    def test_and_or(self):
+        self.assertEqual(self.ids(), [10, 20, 30])
+        self.assertEqual(self.ids(['django', 'react']), [20])
+        self.assertEqual(self.ids(['django', 'react'], mode='or'), [10, 20, 30])
+        self.assertEqual(self.ids(['django', 'figma'], mode='or'), [10, 20, 30])
+        self.assertEqual(self.ids(['django', 'figma']), [])
+
+    def test_category_and_technology(self):
+        self.assertEqual(self.ids(categories=['backend']), [10, 20])
+        self.assertEqual(self.ids(['react'], ['backend']), [20])
+        self.assertEqual(self.ids(['figma'], ['backend'], mode='or'), [10, 20, 30])
+        self.assertEqual(self.index.category_counts([20]), {'backend': 1, 'frontend': 1, 'design': 0})
+
+    def test_unknown_value_and_empty_result(self):
+        self.assertEqual(self.ids(['cobol']), [])
+        self.assertEqual(self.ids(['cobol', 'django'], mode='or'), [10, 20])
+        self.assertEqual(self.ids(categories=['inconnue']), [])
+        ids, counts = self.index.filter(['django', 'figma'])
+        self.assertEqual((ids, counts), ([], {1: 0, 2: 0, 3: 0}))
+        self.assertEqual(self.index.category_counts(ids), {'backend': 0, 'frontend': 0, 'design': 0})
+        # Compteurs des facettes restreints au résultat
+        self.assertEqual(self.index.filter(['django'])[1], {1: 2, 2: 1, 3: 0})
+
+    def test_page_controls_and_cached_rows(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            django = Skill.objects.create(name='Django', category='backend')
+            react = Skill.objects.create(name='React', category='frontend')
+            for title, skills in (('API', [django]), ('SPA', [react]), ('Full', [django, react])):
+                Project.objects.create(title=title, short_description=title).technologies.set(skills)
+        url = reverse('folio:portfolio')
+        response = self.client.get(url, {'tech': ['django', 'react'], 'mode': 'or'}, secure=True)
+        self.assertEqual([project.title for project in response.context['projects']], ['Full', 'SPA', 'API'])
+        self.assertContains(response, 'name="tech" value="django" class="sr-only" checked')
+        self.assertContains(response, 'name="mode" value="or" checked')
+        self.assertContains(response, 'name="category" value="backend"')
+        # Projets et compétences servis par le cache : aucune requête SQL
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'tech': 'django', 'category': 'frontend'}, secure=True)
+        self.assertEqual([project.title for project in response.context['projects']], ['Full'])
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False, FOLIO_COMMENT_BLOCKLIST=['forex'])
+class CommentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='auteur')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = BlogPost.objects.create(
+                title='A', slug='a', author=author, content='x', status='published'
+            )
+
+    def submit(self, content):
+        data = {'post_slug': 'a', 'name': 'A', 'email': 'a@x.fr', 'content': content}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('folio:add_comment'), data, content_type='application/json', secure=True)
+
+    def test_invalid_content_length(self):
+        request = RequestFactory().post(reverse('folio:add_comment'), '{}', content_type='application/json',
+                                        CONTENT_LENGTH='abc')
+        self.assertEqual(views.add_comment(request).status_code, 400)
+
+    def test_blocklist_and_generic_error(self):
+        response = self.submit('Un article clair sur le SEO et les replicas crypto')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(Comment.objects.filter(active=False, rejected=False).exists())
+        for content in ('Gagnez au casino', 'Astuces forex', 'http://a http://b http://c'):
+            with self.subTest(content=content):
+                response = self.submit(content)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Commentaire refusé')
+
+
+class FakeProxyHandler(BaseHTTPRequestHandler):
+    """Point de purge d'un proxy : garde les clés reçues"""
+
+    def do_PURGE(self):
+        self.server.purged.append(self.headers['Surrogate-Key'].split())
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class SurrogateKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Purges de la création envoyées tout de suite, comme après un commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author = User.objects.create(username='auteur')
+            self.category = Category.objects.create(name='Django', slug='django')
+            self.post = BlogPost.objects.create(
+                title='A', slug='a', author=self.author, content='x', status='published', category=self.category
+            )
+
+    def test_public_page_tagged(self):
+        response = self.client.get(self.post.get_absolute_url(), secure=True)
+        keys = response['Surrogate-Key'].split()
+        self.assertEqual(keys[0], surrogates.ALL)
+        self.assertIn(f'post-{self.post.pk}', keys)
+        self.assertIn('category-django', keys)
+        self.assertIn('s-maxage=', response['Cache-Control'])
+
+        self.client.force_login(self.author)
+        response = self.client.get(self.post.get_absolute_url(), secure=True)
+        self.assertFalse(response.has_header('Surrogate-Key'))
+        self.assertNotIn('s-maxage', response['Cache-Control'])
+
+    def test_purge_batched_against_fake_proxy(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeProxyHandler)
+        server.purged = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        purger = {'BACKEND': 'folio.surrogates.HttpPurger',
+                  'OPTIONS': {'url': f'http://127.0.0.1:{server.server_port}/'}}
+        with self.settings(FOLIO_SURROGATE_PURGER=purger):
+            surrogates.get_purger.cache_clear()
+            self.addCleanup(surrogates.get_purger.cache_clear)
+            # Une transaction de l'admin : article enregistré deux fois, tag ajouté
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.title = 'B'
+                self.post.save()
+                self.post.save()
+                self.post.tags.add(Tag.objects.create(name='ORM', slug='orm'))
+
+        self.assertEqual(server.purged, [
+            ['category-django', f'post-{self.post.pk}', 'tag-orm', 'tags']
+        ])
+
+    def test_admin_bulk_actions_purge(self):
+        purger = {'BACKEND': 'folio.surrogates.MemoryPurger'}
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = Comment.objects.create(post=self.post, name='A', email='a@x.fr', content='x', active=False)
+        with self.settings(FOLIO_SURROGATE_PURGER=purger):
+            surrogates.get_purger.cache_clear()
+            self.addCleanup(surrogates.get_purger.cache_clear)
+            with self.captureOnCommitCallbacks(execute=True):
+                BlogPostAdmin(BlogPost, admin.site).make_draft(None, BlogPost.objects.all())
+            with self.captureOnCommitCallbacks(execute=True):
+                CommentAdmin(Comment, admin.site).make_active(None, Comment.objects.filter(pk=comment.pk))
+            self.assertEqual(surrogates.get_purger().requests, [
+                ['category-django', f'post-{self.post.pk}', 'posts'],
+                ['comments', f'post-{self.post.pk}'],
+            ])
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False, FOLIO_NPLUSONE='raise')
+class NPlusOneTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='auteur')
+        tags = [Tag.objects.create(name=f'T{i}', slug=f't{i}') for i in range(4)]
+        for i in range(4):
+            post = BlogPost.objects.create(
+                title=f'A{i}', slug=f'a{i}', author=author, content='x', status='published'
+            )
+            post.tags.set(tags)
+            Comment.objects.create(post=post, name='A', email='a@x.fr', content='Merci')
+
+    def test_shape_ignores_values(self):
+        self.assertEqual(
+            nplusone.shape('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "slug" = \'a\' LIMIT 21'),
+            'SELECT * FROM "t" WHERE "id" IN (...) AND "slug" = ? LIMIT ?',
+        )
+
+    def test_blog_list_has_no_n_plus_one(self):
+        # Commentaires en attente de modération : pas comptés
+        for post in BlogPost.objects.all():
+            Comment.objects.create(post=post, name='B', email='b@x.fr', content='Spam', active=False)
+        response = self.client.get(reverse('folio:blog'), secure=True)
+        self.assertContains(response, '1 commentaires')
+
+    def test_attributed_to_template_line(self):
+        page = Paginator(BlogPost.objects.for_list(), 6).page(1)
+        with self.assertRaises(nplusone.NPlusOneError) as raised:
+            with nplusone.detect('blog_list'):
+                render_to_string('blog_list.html', {'page_obj': page})
+        self.assertIn('"folio_tag"', str(raised.exception))
+        self.assertRegex(str(raised.exception), r'blog_list\.html:\d+ ×4')
+
+    def test_attributed_to_python_frame_and_allowlist(self):
+        with self.assertRaisesRegex(nplusone.NPlusOneError, r'depuis folio/tests\.py:\d+'):
+            with nplusone.detect():
+                [post.comments.count() for post in BlogPost.objects.all()]
+        with self.settings(FOLIO_NPLUSONE_ALLOW=[r'"folio_comment"']):
+            with nplusone.detect():
+                [post.comments.count() for post in BlogPost.objects.all()]
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class BlobTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        storage = {**settings.STORAGES, 'default': {'BACKEND': 'folio.blobs.ContentAddressedStorage'}}
+        media = self.settings(MEDIA_ROOT=tmp.name, STORAGES=storage)
+        media.enable()
+        self.addCleanup(media.disable)
+        # Champs recalculés avec le stockage de ce test
+        blobs.file_fields.cache_clear()
+        self.addCleanup(blobs.file_fields.cache_clear)
+
+    def project(self, filename, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Project.objects.create(title=filename, image=ContentFile(data, name=filename))
+
+    def links(self, project):
+        return os.stat(default_storage.path(project.image.name)).st_nlink
+
+    def test_dedup_release_and_gc(self):
+        first = self.project('a.png', b'x' * 100)
+        second = self.project('b.png', b'x' * 100)
+        same = self.project('a.png', b'x' * 100)
+        # Un blob, trois lignes, deux noms
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertEqual(same.image.name, first.image.name)
+        self.assertEqual(self.links(first), 3)
+        blob = default_storage.blob_path(hashlib.blake2b(b'x' * 100).hexdigest())
+        self.assertTrue(os.path.samefile(blob, default_storage.path(second.image.name)))
+
+        # Nom encore cité par une autre ligne : gardé
+        with self.captureOnCommitCallbacks(execute=True):
+            same.delete()
+        self.assertEqual(self.links(first), 3)
+        # Nom remplacé puis ligne supprimée : le blob perd ses liens
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.image = ContentFile(b'y' * 100, name='a.png')
+            first.save()
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(os.stat(blob).st_nlink, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(os.stat(blob).st_nlink, 1)
+
+        stats = blobs.Collector(default_storage, pause=0, grace=-1).run()
+        self.assertEqual((stats['blobs'], stats['kept'], stats['bytes']), (1, 1, 100))
+        self.assertFalse(os.path.exists(blob))
+        self.assertEqual(default_storage.open(first.image.name).read(), b'y' * 100)
+
+
+@override_settings(FOLIO_JOBS_ENABLED=False)
+class RetentionTests(TestCase):
+    def test_pending_comments_survive(self):
+        author = User.objects.create(username='auteur')
+        post = BlogPost.objects.create(title='A', slug='a', author=author, content='x')
+        old = timezone.now() - timedelta(days=60)
+        pending = Comment.objects.create(post=post, name='A', email='a@x.fr', content='x',
+                                         active=False, created_date=old)
+        Comment.objects.create(post=post, name='B', email='b@x.fr', content='x',
+                               active=False, rejected=True, created_date=old)
+
+        done = retention.Runner(retention.get_policies()['comments'], pause=0).run()
+        self.assertEqual(done['rows'], 1)
+        self.assertEqual(list(Comment.objects.all()), [pending])
+
+
+class AdmissionTests(SimpleTestCase):
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.005)
+
+    def queue_up(self, limiter, priority, order):
+        def wait():
+            if limiter.acquire(priority=priority, timeout=5):
+                order.append(priority)
+                limiter.release()
+        thread = threading.Thread(target=wait)
+        thread.start()
+        return thread
+
+    def test_priority_first_and_queue_sized_by_threads(self):
+        limiter = admission.Limiter('t', limit=1, threads=3)
+        self.assertEqual(limiter.capacity(), 2)
+        self.assertTrue(limiter.acquire())
+        order = []
+        pool = [self.queue_up(limiter, False, order)]
+        self.wait_until(lambda: limiter.waiting() == 1)
+        pool.append(self.queue_up(limiter, True, order))
+        self.wait_until(lambda: limiter.waiting() == 2)
+        # File pleine : rejet sans attendre
+        self.assertFalse(limiter.acquire(timeout=5))
+        limiter.release()
+        for thread in pool:
+            thread.join()
+        self.assertEqual(order, [True, False])
+        self.assertEqual((limiter.stats['queued'], limiter.stats['rejected'], limiter.active), (2, 1, 0))
+
+    def test_timeout(self):
+        limiter = admission.Limiter('t', limit=1, threads=2)
+        self.assertTrue(limiter.acquire())
+        start = time.monotonic()
+        self.assertFalse(limiter.acquire(timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual((limiter.stats['timeouts'], limiter.waiting()), (1, 0))
+        self.assertFalse(limiter.acquire(timeout=0))
+        limiter.release()
+        self.assertTrue(limiter.acquire(timeout=0))
+
+    def test_aimd(self):
+        limiter = admission.Limiter('t', limit=4, min_limit=2, max_limit=5, target=0.1, threads=8)
+        # Au-dessus de la cible : un quart de moins, jusqu'à min_limit
+        for expected in (3, 2, 2):
+            for _ in range(admission.WINDOW):
+                limiter.acquire()
+                limiter.release(0.5)
+            self.assertEqual(limiter.limit, expected)
+        # Sous la cible sans attente : inchangée
+        for _ in range(admission.WINDOW):
+            limiter.acquire()
+            limiter.release(0.01)
+        self.assertEqual(limiter.limit, 2)
+        # Sous la cible avec des requêtes en attente : +1, jusqu'à max_limit
+        limiter.waiters[1].append(threading.Event())
+        for expected in (3, 4, 5, 5):
+            limiter.samples = [0.01] * admission.WINDOW
+            limiter.adapt()
+            self.assertEqual(limiter.limit, expected)
+        self.assertEqual(limiter.capacity(), 3)
+
+    def test_overload_response(self):
+        factory = RequestFactory()
+        url = reverse('folio:blog')
+        limiter = admission.Limiter('list', limit=1, timeout=2.0, threads=1)
+
+        def served(request):
+            return HttpResponse()
+
+        with mock.patch.dict(admission.LIMITERS, {'list': limiter}):
+            # Arrivée datée par nginx (en millisecondes) au-delà du délai : jamais traitée
+            late = factory.get(url, HTTP_X_REQUEST_START=f't={(time.time() - 5) * 1000:.0f}')
+            response = admission.admit(late, lambda request: self.fail("requête traitée"))
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], str(admission.RETRY_AFTER))
+            self.assertEqual(response['Cache-Control'], 'no-store')
+            self.assertEqual(limiter.stats['expired'], 1)
+
+            fresh = factory.get(url, HTTP_X_REQUEST_START=f't={time.time():.3f}')
+            self.assertEqual(admission.admit(fresh, served).status_code, 200)
+            # Worker sync : pas de file, la place occupée renvoie un 503
+            limiter.acquire()
+            self.assertEqual(admission.admit(fresh, served).status_code, 503)
@@ -0,0 +1,423 @@
+"""
+Suggestions de recherche (« typeahead ») sur les titres et noms du site.
+
+Index par préfixe tenu en mémoire dans chaque worker :
+- chaque libellé est normalisé (minuscules, sans accents ni ligatures :
+  « Œuvre éphémère » -> « oeuvre ephemere ») et découpé en mots ;
+- vocabulaire trié des mots, et pour chaque mot la liste (array) des
+  entrées qui le contiennent ; un préfixe est un intervalle du vocabulaire
+  trouvé par bisect ;
+- les entrées sont numérotées dans l'ordre de classement (catégories,
+  tags, compétences, puis articles par vues) : parcourir les
+  listes fusionnées dans l'ordre croissant donne directement les meilleurs
+  résultats, on s'arrête au premier `limit` atteint ;
+- les préfixes partagés par beaucoup de mots (« d ») gardent leur liste
+  fusionnée en mémo ; une requête de plusieurs mots parcourt la liste la
+  plus courte et vérifie les autres termes sur le libellé normalisé.
+
+Partage entre workers via le cache :
+- un instantané de l'index complet, numéroté (SNAPSHOT_KEY) ;
+- un journal de modifications : chaque signal incrémente SEQ_KEY et écrit
+  sa modification sous CHANGE_KEY ; un worker en retard rejoue les
+  modifications manquantes sur son index, sans requête SQL ;
+- journal incomplet ou trop en retard : rechargement de l'instantané, ou
+  reconstruction depuis la base s'il est absent.
+
+Les threads d'un worker (gthread) partagent l'index publié, qui n'est
+jamais modifié sur place : un seul thread à la fois le rattrape sur une
+copie puis la publie d'un bloc ; pendant ce temps, les autres servent
+l'index précédent.
+
+Les écritures qui contournent les signaux (update(), bulk_create) appellent
+refresh() avec les pk concernés, ou invalidate().
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from array import array
+
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import BlogPost, Category, Skill, Tag
+
+# Clés numérotées comme SOURCES : un index d'une autre version n'est jamais relu
+SEQ_KEY = 'folio:typeahead:2:seq'
+SNAPSHOT_KEY = 'folio:typeahead:2:snapshot'
+CHANGE_KEY = 'folio:typeahead:2:change:{}'
+CHANGE_TTL = 24 * 3600
+MAX_CHANGES = 1000
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+MAX_QUERY = 100
+# Au-delà de ce nombre de mots pour un préfixe, listes fusionnées gardées en mémo
+WIDE_PREFIX = 16
+MEMO_IDS = 2_000_000
+
+# Diacritiques séparés de leur lettre par NFKD
+COMBINING = re.compile('[\u0300-\u036f]+')
+SEPARATORS = re.compile(r'[\W_]+')
+# Les expressions Unicode sont lentes : texte ASCII traité par str.translate
+ASCII_SEPARATORS = str.maketrans({c: ' ' for c in map(chr, range(128)) if not c.isalnum()})
+
+
+def normalize(text):
+    """Minuscules, sans accents ni ligatures, mots séparés par une espace"""
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        if 'œ' in text or 'æ' in text:
+            text = text.replace('œ', 'oe').replace('æ', 'ae')
+        text = COMBINING.sub('', text)
+        if not text.isascii():
+            return SEPARATORS.sub(' ', text).strip()
+    return ' '.join(text.translate(ASCII_SEPARATORS).split())
+
+
+class Source:
+    """Modèle indexé : clé de l'URL, libellé, ordre et condition d'inclusion"""
+
+    def __init__(self, kind, model, key, label, url, ordering, filters=None):
+        self.kind = kind
+        self.model = model
+        self.key = key
+        self.label = label
+        self.url = url
+        self.ordering = ordering
+        self.filters = filters or {}
+
+    def rows(self):
+        queryset = self.model.objects.filter(**self.filters).order_by(*self.ordering)
+        return queryset.values_list('pk', self.key, self.label).iterator()
+
+    def includes(self, instance):
+        return all(getattr(instance, field) == value for field, value in self.filters.items())
+
+
+# Dans l'ordre de classement des résultats
+SOURCES = (
+    # Catégories et tags : liste du blog filtrée, sans page propre
+    Source('category', Category, 'slug', 'name',
+           lambda key: f"{reverse('folio:blog')}?{urlencode({'category': key})}", ['name']),
+    Source('tag', Tag, 'slug', 'name',
+           lambda key: f"{reverse('folio:blog')}?{urlencode({'tag': key})}", ['name']),
+    Source('skill', Skill, 'name', 'name',
+           lambda key: f"{reverse('folio:portfolio')}?{urlencode({'tech': key})}", ['name']),
+    Source('post', BlogPost, 'slug', 'title',
+           lambda key: reverse('folio:blog_detail', args=[key]), ['-views', '-published_date'],
+           {'status': 'published'}),
+)
+SOURCE_OF = {source.model: i for i, source in enumerate(SOURCES)}
+
+
+class PrefixIndex:
+    """Entrées dans des listes parallèles, numérotées dans l'ordre de classement.
+
+    Une entrée supprimée devient None (pierre tombale) jusqu'au compactage ;
+    une entrée modifiée est supprimée puis ajoutée en fin de classement.
+    """
+
+    def __init__(self):
+        self.kinds = bytearray()
+        self.pks = array('q')
+        self.keys = []
+        self.labels = []
+        self.normalized = []
+        self.words = []
+        self.postings = []
+        self.removed = 0
+        self.memo = {}
+        self.memo_size = 0
+
+    @classmethod
+    def build(cls):
+        index = cls()
+        for kind, source in enumerate(SOURCES):
+            for pk, key, label in source.rows():
+                index.append(kind, pk, key, label)
+        index.sort_words()
+        return index
+
+    def append(self, kind, pk, key, label):
+        """Ajout sans mise à jour du vocabulaire (voir sort_words)"""
+        self.kinds.append(kind)
+        self.pks.append(pk)
+        self.keys.append(key)
+        self.labels.append(label)
+        # Espace initiale : « ' ' + terme in texte » teste un début de mot
+        self.normalized.append(' ' + normalize(label))
+
+    def sort_words(self):
+        postings = {}
+        for i, text in enumerate(self.normalized):
+            if text is None:
+                continue
+            for word in set(text.split()):
+                postings.setdefault(word, array('I')).append(i)
+        self.words = sorted(postings)
+        self.postings = [postings[word] for word in self.words]
+        self.memo.clear()
+        self.memo_size = 0
+
+    def to_dict(self):
+        return {
+            'kinds': bytes(self.kinds), 'pks': self.pks, 'keys': self.keys, 'labels': self.labels,
+            'normalized': self.normalized, 'words': self.words, 'postings': self.postings,
+            'removed': self.removed,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.kinds = bytearray(data['kinds'])
+        for name in ('pks', 'keys', 'labels', 'normalized', 'words', 'postings', 'removed'):
+            setattr(index, name, data[name])
+        return index
+
+    def copy(self):
+        """Copie modifiable, sans le mémo : l'index publié reste intact"""
+        index = PrefixIndex()
+        index.kinds = bytearray(self.kinds)
+        index.pks = array('q', self.pks)
+        index.keys, index.labels, index.normalized = list(self.keys), list(self.labels), list(self.normalized)
+        index.words = list(self.words)
+        index.postings = [array('I', posting) for posting in self.postings]
+        index.removed = self.removed
+        return index
+
+    def __len__(self):
+        return len(self.labels) - self.removed
+
+    # --- Mises à jour -----------------------------------------------------------
+
+    def apply(self, change):
+        """Rejoue une modification du journal ; False si l'index doit être reconstruit"""
+        if change[0] == 'set':
+            kind, pk, key, label = change[1:]
+            i = self.find(kind, pk)
+            # Libellé inchangé : l'entrée garde son rang
+            if i is None or (self.keys[i], self.labels[i]) != (key, label):
+                self.remove(kind, pk)
+                self.add(kind, pk, key, label)
+        elif change[0] == 'del':
+            self.remove(*change[1:])
+        else:
+            return False
+        return True
+
+    def find(self, kind, pk):
+        start = 0
+        while True:
+            try:
+                i = self.pks.index(pk, start)
+            except ValueError:
+                return None
+            if self.kinds[i] == kind and self.labels[i] is not None:
+                return i
+            start = i + 1
+
+    def add(self, kind, pk, key, label):
+        i = len(self.labels)
+        self.append(kind, pk, key, label)
+        for word in set(self.normalized[i].split()):
+            position = bisect.bisect_left(self.words, word)
+            if position < len(self.words) and self.words[position] == word:
+                self.postings[position].append(i)
+            else:
+                self.words.insert(position, word)
+                self.postings.insert(position, array('I', [i]))
+            self.extend_memo(word, i)
+
+    def remove(self, kind, pk):
+        i = self.find(kind, pk)
+        if i is None:
+            return
+        # Pierre tombale : les listes qui la contiennent l'ignorent
+        self.keys[i] = self.labels[i] = self.normalized[i] = None
+        self.removed += 1
+        if self.removed > max(1000, len(self.labels) // 4):
+            self.compact()
+
+    def compact(self):
+        live = [i for i, label in enumerate(self.labels) if label is not None]
+        self.kinds = bytearray(self.kinds[i] for i in live)
+        self.pks = array('q', (self.pks[i] for i in live))
+        for name in ('keys', 'labels', 'normalized'):
+            values = getattr(self, name)
+            setattr(self, name, [values[i] for i in live])
+        self.removed = 0
+        self.sort_words()
+
+    def extend_memo(self, word, i):
+        """Ajoute l'entrée i (la dernière) aux listes fusionnées des préfixes du mot"""
+        for end in range(1, len(word) + 1):
+            merged = self.memo.get(word[:end])
+            if merged is not None and (not merged or merged[-1] != i):
+                merged.append(i)
+
+    # --- Recherche --------------------------------------------------------------
+
+    def span(self, prefix):
+        """Intervalle [début, fin) des mots commençant par prefix"""
+        start = bisect.bisect_left(self.words, prefix)
+        return start, bisect.bisect_left(self.words, prefix + '\uffff', start)
+
+    def matches(self, prefix):
+        """Entrées contenant un mot commençant par prefix, dans l'ordre de classement.
+
+        Préfixe large : les listes sont fusionnées une fois et gardées en mémo
+        (au plus MEMO_IDS entrées en tout) ; sinon fusion à la volée.
+        """
+        merged = self.memo.get(prefix)
+        if merged is not None:
+            return merged
+        start, end = self.span(prefix)
+        if end - start == 1:
+            return self.postings[start]
+        if end - start <= WIDE_PREFIX:
+            return array('I', sorted(set().union(*self.postings[start:end])))
+        merged = array('I', sorted(set().union(*self.postings[start:end])))
+        self.memo_size += len(merged)
+        if self.memo_size > MEMO_IDS:
+            self.memo.clear()
+            self.memo_size = len(merged)
+        self.memo[prefix] = merged
+        return merged
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Entrées dont chaque mot de la requête commence un mot du libellé"""
+        terms = set(normalize(query[:MAX_QUERY]).split())
+        if not terms:
+            return []
+        # La liste la plus courte fournit les candidats, les autres termes filtrent
+        lists = sorted(((self.matches(term), term) for term in terms), key=lambda item: len(item[0]))
+        candidates, term = lists[0]
+        others = [' ' + other for _, other in lists[1:]]
+        normalized = self.normalized
+        found = []
+        for i in candidates:
+            text = normalized[i]
+            if text is None:
+                continue
+            for other in others:
+                if other not in text:
+                    break
+            else:
+                found.append(i)
+                if len(found) == limit:
+                    break
+        return [self.result(i) for i in found]
+
+    def result(self, i):
+        source = SOURCES[self.kinds[i]]
+        return {'type': source.kind, 'label': self.labels[i], 'url': source.url(self.keys[i])}
+
+
+# --- Partage entre workers --------------------------------------------------------
+
+# Index publié, (numéro, index) remplacé d'un bloc
+_local = {'state': (None, None)}
+_lock = threading.Lock()
+
+
+def replay(index, seq, current):
+    """Applique les modifications seq+1..current ; False si le journal est incomplet"""
+    if current - seq > MAX_CHANGES:
+        return False
+    keys = [CHANGE_KEY.format(n) for n in range(seq + 1, current + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    return all(index.apply(changes[key]) for key in keys)
+
+
+def get_index():
+    """Index courant, rattrapé sur le journal partagé ou rechargé"""
+    seq, index = _local['state']
+    if index is not None and seq is not None and seq == cache.get(SEQ_KEY):
+        return index
+    # Rattrapage en cours dans un autre thread : index précédent en attendant
+    if not _lock.acquire(blocking=index is None):
+        return index
+    try:
+        return update()
+    finally:
+        _lock.release()
+
+
+def update():
+    """Publie un index à jour ; appelé sous _lock"""
+    current = cache.get(SEQ_KEY)
+    seq, index = _local['state']
+    if index is not None and current is not None and seq is not None:
+        if seq == current:
+            return index
+        if seq < current:
+            updated = index.copy()
+            if replay(updated, seq, current):
+                _local['state'] = (current, updated)
+                return updated
+
+    snapshot = cache.get(SNAPSHOT_KEY) if current is not None else None
+    if snapshot is not None and snapshot['seq'] <= current:
+        index = PrefixIndex.from_dict(snapshot)
+        if replay(index, snapshot['seq'], current):
+            if current > snapshot['seq']:
+                cache.set(SNAPSHOT_KEY, dict(index.to_dict(), seq=current), None)
+            _local['state'] = (current, index)
+            return index
+
+    # Numéro lu avant la base : une modification concurrente sera rejouée
+    cache.add(SEQ_KEY, 0, None)
+    current = cache.get(SEQ_KEY, 0)
+    index = PrefixIndex.build()
+    cache.set(SNAPSHOT_KEY, dict(index.to_dict(), seq=current), None)
+    _local['state'] = (current, index)
+    return index
+
+
+def record(changes):
+    """Ajoute des modifications au journal, après le commit de la transaction"""
+    def publish():
+        try:
+            last = cache.incr(SEQ_KEY, len(changes))
+        except ValueError:
+            # Aucun index construit : le prochain le sera depuis la base
+            return
+        first = last - len(changes) + 1
+        cache.set_many({CHANGE_KEY.format(first + n): change for n, change in enumerate(changes)}, CHANGE_TTL)
+
+    if changes:
+        transaction.on_commit(publish)
+
+
+def change_for(instance):
+    kind = SOURCE_OF[type(instance)]
+    source = SOURCES[kind]
+    if not source.includes(instance):
+        return ('del', kind, instance.pk)
+    return ('set', kind, instance.pk, getattr(instance, source.key), getattr(instance, source.label))
+
+
+def saved(instance):
+    record([change_for(instance)])
+
+
+def deleted(instance):
+    record([('del', SOURCE_OF[type(instance)], instance.pk)])
+
+
+def refresh(model, pks):
+    """Relit les pk donnés après une écriture sans signaux (update())"""
+    record([change_for(instance) for instance in model.objects.filter(pk__in=list(pks))])
+
+
+def invalidate():
+    """Reconstruction complète depuis la base dans tous les workers"""
+    record([('reset',)])
+    cache.delete(SNAPSHOT_KEY)
+
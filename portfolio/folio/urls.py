@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 
 
@@ -18,6 +18,7 @@ urlpatterns = [
     path('portfolio/', views.portfolio, name='portfolio'),
     path('project/<int:project_id>/', views.project_detail, name='project_detail'),
     path('contact/', views.contact, name='contact'),
+    path('csrf/', views.csrf_token, name='csrf_token'),
 
 
         # Blog URLs
@@ -25,6 +26,14 @@ urlpatterns = [
     path('blog/<slug:slug>/', views.blog_detail, name='blog_detail'),
     path('blog/category/<slug:slug>/', views.blog_category, name='blog_category'),
     path('blog/tag/<slug:slug>/', views.blog_tag, name='blog_tag'),
+    path('blog/archives/<int:year>/', views.blog_archive_year, name='blog_archive_year'),
+    path('blog/archives/<int:year>/<int:month>/', views.blog_archive_month, name='blog_archive_month'),
+    path('comments/', views.add_comment, name='add_comment'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
+
+        # API JSON (lecture seule)
+    path('api/<slug:resource>/', api.resource_list, name='api_list'),
+    path('api/<slug:resource>/<str:key>/', api.resource_detail, name='api_detail'),
     
 
 
@@ -7,37 +7,59 @@
 
 # class Home(TemplateView):
 #     template_name ='index.html'
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, Prefetch, Q
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_POST, require_safe
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
+from django.middleware.csrf import get_token
+from django.utils.formats import date_format
+from urllib.parse import urlsplit
 import json
+import logging
 
 from .models import (
     Project, Skill, Experience, Education, Profile,
-    BlogPost, Category, Tag, Comment, ContactMessage
+    BlogPost, Category, Tag, Comment
 )
+from . import archive, caching, facets, jobs, preload, spam, surrogates, typeahead
+
+logger = logging.getLogger('folio')
 
 # Vues Portfolio
+def _home_context():
+    return {
+        'profile': Profile.objects.select_related('user').first(),
+        'featured_projects': list(
+            Project.objects.for_list().filter(featured=True).prefetch_related('technologies')[:3]
+        ),
+        'skills': list(Skill.objects.all().order_by('category', '-level')),
+        'latest_posts': list(
+            BlogPost.objects.for_list().filter(status='published').select_related('category')[:3]
+        ),
+    }
+
+@preload.page('home.html')
 def home(request):
     """Page d'accueil avec aperçu du portfolio"""
-    profile = Profile.objects.first()
-    featured_projects = Project.objects.filter(featured=True)[:3]
-    skills = Skill.objects.all().order_by('category', '-level')
-    latest_posts = BlogPost.objects.filter(status='published')[:3]
-    
-    context = {
-        'profile': profile,
-        'featured_projects': featured_projects,
-        'skills': skills,
-        'latest_posts': latest_posts,
-    }
+    context = caching.get_or_compute('home', _home_context)
+    if context['profile'] and context['profile'].avatar:
+        preload.add(request, context['profile'].avatar.url)
+    surrogates.add(
+        request, 'profile', 'skills', 'projects', 'posts', *context['featured_projects'],
+        *context['latest_posts'], *(post.category for post in context['latest_posts'])
+    )
     return render(request, 'home.html', context)
 
+@preload.page('about.html')
 def about(request):
     """Page à propos"""
     profile = Profile.objects.first()
@@ -51,42 +73,100 @@ def about(request):
         'education': education,
         'skills': skills,
     }
+    surrogates.add(request, 'profile', 'experiences', 'education', 'skills')
     return render(request, 'about.html', context)
 
+def _portfolio_context():
+    return {
+        'projects': Project.objects.for_list().prefetch_related('technologies').in_bulk(),
+        'skills': list(Skill.objects.all().order_by('name')),
+    }
+
+@preload.page('portfolio.html')
 def portfolio(request):
     """Page portfolio avec tous les projets"""
-    projects = Project.objects.all()
-    skills = Skill.objects.all().order_by('name')
+    index = facets.get_index()
     
-    # Filtrage par technologie
-    tech_filter = request.GET.get('tech')
-    if tech_filter:
-        projects = projects.filter(technologies__name__icontains=tech_filter)
+    # Filtrage par technologies / catégories, sans requête SQL
+    # ex: ?tech=django&tech=react&category=backend&mode=or
+    tech_filter = request.GET.getlist('tech')
+    category_filter = request.GET.getlist('category')
+    mode = 'or' if request.GET.get('mode') == 'or' else 'and'
+    project_ids, facet_counts = index.filter(tech_filter, category_filter, mode)
+    
+    # Projets et compétences en cache, invalidés par les signaux
+    data = caching.get_or_compute('portfolio', _portfolio_context)
+    projects = [data['projects'][pk] for pk in project_ids if pk in data['projects']]
+    for project in projects:
+        project.data_tags = index.tags_for(project.id)
+    
+    skills = data['skills']
+    for skill in skills:
+        skill.facet_count = facet_counts.get(skill.id, 0)
+        skill.selected = skill.name.lower() in tech_filter
+    
+    category_counts = index.category_counts(project_ids)
+    categories = [
+        {'value': value, 'label': label, 'count': category_counts.get(value, 0),
+         'selected': value in category_filter}
+        for value, label in Skill._meta.get_field('category').choices
+    ]
     
     context = {
         'projects': projects,
         'skills': skills,
+        'categories': categories,
         'current_tech': tech_filter,
+        'current_categories': category_filter,
+        'filter_mode': mode,
     }
+    surrogates.add(request, 'projects', 'skills', *projects)
     return render(request, 'portfolio.html', context)
 
+@preload.page('project_detail.html')
 def project_detail(request, project_id):
     """Détail d'un projet"""
     project = get_object_or_404(Project, id=project_id)
-    related_projects = Project.objects.exclude(id=project.id)[:3]
+    related_projects = Project.objects.for_list().exclude(id=project.id)[:3]
+    if project.image:
+        # Image d'en-tête : élément le plus grand de la page (LCP)
+        preload.add(request, project.image.url)
     
     context = {
         'project': project,
         'related_projects': related_projects,
     }
+    surrogates.add(request, project, 'projects', 'skills')
     return render(request, 'project_detail.html', context)
 
 # Vues Blog
+def _blog_sidebar():
+    published = BlogPost.objects.for_list().filter(status='published')
+    return {
+        'categories': list(Category.objects.annotate(post_count=Count('blogpost'))),
+        'tags': list(Tag.objects.all()),
+        'popular_posts': list(published.order_by('-views')[:5]),
+        'recent_posts': list(published[:5]),
+        'archive_years': archive.years(),
+    }
+
+def _post_cards(posts):
+    """Catégorie, tags et nombre de commentaires publiés des cartes, sans requête par carte"""
+    # Avec le GROUP BY du COUNT, l'ordre de Meta.ordering n'est plus appliqué
+    return posts.select_related('category').prefetch_related('tags').annotate(
+        comment_count=Count('comments', filter=Q(comments__active=True), distinct=True)
+    ).order_by(*BlogPost._meta.ordering)
+
+def _tag_list(request, page_obj, sidebar=None):
+    """Clés d'une liste d'articles et de sa barre latérale"""
+    surrogates.add(request, 'posts', *page_obj, *(post.category for post in page_obj))
+    if sidebar:
+        surrogates.add(request, 'categories', 'tags', *sidebar['popular_posts'], *sidebar['recent_posts'])
+
+@preload.page('blog_list.html')
 def blog(request):
     """Liste des articles de blog"""
-    posts = BlogPost.objects.filter(status='published')
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+    posts = BlogPost.objects.for_list().filter(status='published')
     
     # Filtrage
     category_slug = request.GET.get('category')
@@ -107,57 +187,191 @@ def blog(request):
         )
     
     # Pagination
-    paginator = Paginator(posts, 6)
+    paginator = Paginator(_post_cards(posts), 6)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Articles populaires et récents
-    popular_posts = BlogPost.objects.filter(status='published').order_by('-views')[:5]
-    recent_posts = BlogPost.objects.filter(status='published')[:5]
-    
     context = {
         'page_obj': page_obj,
-        'categories': categories,
-        'tags': tags,
-        'popular_posts': popular_posts,
-        'recent_posts': recent_posts,
         'current_category': category_slug,
         'current_tag': tag_slug,
         'search_query': search,
     }
+    # Barre latérale : catégories, tags, articles populaires et récents
+    context.update(caching.get_or_compute('blog:sidebar', _blog_sidebar))
+    _tag_list(request, page_obj, context)
+    return render(request, 'blog_list.html', context)
+
+def _blog_archive(request, year, month=None):
+    try:
+        start, end = archive.month_range(year, month)
+    except ValueError:
+        raise Http404("Date invalide")
+    # Intervalle sur published_date : parcours de l'index, sans extraction de date
+    posts = BlogPost.objects.for_list().filter(
+        status='published', published_date__gte=start, published_date__lt=end
+    )
+    
+    paginator = Paginator(_post_cards(posts), 6)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'page_obj': page_obj,
+        'archive_year': year,
+        'archive_month': month,
+        'archive_label': date_format(start, 'YEAR_MONTH_FORMAT') if month else str(year),
+    }
+    context.update(caching.get_or_compute('blog:sidebar', _blog_sidebar))
+    _tag_list(request, page_obj, context)
     return render(request, 'blog_list.html', context)
 
+@preload.page('blog_list.html')
+def blog_archive_year(request, year):
+    """Articles publiés dans l'année"""
+    return _blog_archive(request, year)
+
+@preload.page('blog_list.html')
+def blog_archive_month(request, year, month):
+    """Articles publiés dans le mois"""
+    return _blog_archive(request, year, month)
+
+@require_safe
+def search_suggest(request):
+    """Suggestions pendant la saisie : articles, catégories, tags, projets, compétences"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', typeahead.DEFAULT_LIMIT)), 1), typeahead.MAX_LIMIT)
+    except ValueError:
+        limit = typeahead.DEFAULT_LIMIT
+    results = typeahead.get_index().search(query, limit) if query.strip() else []
+    response = JsonResponse({'query': query, 'results': results})
+    patch_cache_control(response, public=True, max_age=60)
+    surrogates.add(request, *(surrogates.COLLECTIONS[source.model._meta.model_name] for source in typeahead.SOURCES))
+    return response
+
+def _blog_detail_context(slug):
+    post = get_object_or_404(
+        BlogPost.objects.select_related('author', 'category').prefetch_related('tags'),
+        slug=slug, status='published'
+    )
+    # Articles similaires
+    related_posts = list(
+        BlogPost.objects.for_list().filter(status='published', category=post.category)
+        .exclude(id=post.id).select_related('category')[:3]
+    )
+    return {'post': post, 'related_posts': related_posts}
+
+post_views = jobs.BufferedCounter(
+    'blog.view', getattr(settings, 'FOLIO_VIEWS_FLUSH_INTERVAL', 60))
+
+
+@preload.page('blog_details.html')
 def blog_detail(request, slug):
     """Détail d'un article de blog"""
-    post = get_object_or_404(BlogPost, slug=slug, status='published')
+    context = caching.get_or_compute(f'blog_detail:{slug}', lambda: _blog_detail_context(slug))
+    post = context['post']
+    if post.featured_image:
+        preload.add(request, post.featured_image.url)
+    surrogates.add(request, post, post.category, *post.tags.all(), *context['related_posts'])
     
-    # Incrémenter les vues
-    post.views += 1
-    post.save()
+    # Vues cumulées en mémoire, une tâche par intervalle et par worker
+    post_views.add(post.pk)
     
-    # Commentaires
-    comments = post.comments.filter(active=True, parent=None)
+    # Commentaires approuvés et leurs réponses approuvées
+    comments = post.comments.filter(active=True, parent=None).prefetch_related(
+        Prefetch('replies', queryset=Comment.objects.filter(active=True))
+    )
     
-    # Articles similaires
-    related_posts = BlogPost.objects.filter(
-        status='published',
-        category=post.category
-    ).exclude(id=post.id)[:3]
+    context = dict(context, comments=comments)
+    return render(request, 'blog_details.html', context)
+
+MAX_COMMENT_BODY = 16 * 1024
+
+def _same_origin(request):
+    origin = request.META.get('HTTP_ORIGIN')
+    # Sans en-tête Origin (client hors navigateur), pas de cookie à détourner
+    return not origin or urlsplit(origin).netloc == request.get_host()
+
+@csrf_exempt
+@require_POST
+def add_comment(request):
+    """Soumission d'un commentaire en JSON, mis en file pour modération"""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Requête invalide'}, status=400)
+    if length > MAX_COMMENT_BODY:
+        return JsonResponse({'success': False, 'error': 'Requête trop volumineuse'}, status=413)
+    if not _same_origin(request):
+        return JsonResponse({'success': False, 'error': 'Origine refusée'}, status=403)
+    if spam.rate_limited(spam.client_ip(request)):
+        response = JsonResponse({'success': False, 'error': 'Trop de commentaires, réessayez plus tard'}, status=429)
+        response['Retry-After'] = spam.retry_after()
+        return response
     
-    context = {
-        'post': post,
-        'comments': comments,
-        'related_posts': related_posts,
-    }
-    return render(request, 'blog/blog_detail.html', context)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'JSON invalide'}, status=400)
+    
+    # Champ piège rempli : un robot, à qui l'on répond comme si tout allait bien
+    if data.get('website'):
+        return JsonResponse({'success': True, 'pending': True}, status=202)
+    
+    name = str(data.get('name') or '').strip()
+    email = str(data.get('email') or '').strip()
+    content = str(data.get('content') or '').strip()
+    if not (name and email and content):
+        return JsonResponse({'success': False, 'error': 'Veuillez remplir tous les champs.'}, status=400)
+    if len(name) > 100 or len(content) > 5000:
+        return JsonResponse({'success': False, 'error': 'Nom ou commentaire trop long'}, status=400)
+    try:
+        validate_email(email)
+    except ValidationError:
+        return JsonResponse({'success': False, 'error': 'Adresse email invalide'}, status=400)
+    reason = spam.classify(name, content)
+    if reason:
+        # Raison gardée pour le journal : l'annoncer aiderait à contourner le filtre
+        logger.info("Commentaire refusé (%s) depuis %s", reason, spam.client_ip(request))
+        return JsonResponse({'success': False, 'error': 'Commentaire refusé'}, status=400)
+    
+    slug = str(data.get('post_slug') or '')
+    try:
+        post = caching.get_or_compute(f'blog_detail:{slug}', lambda: _blog_detail_context(slug))['post']
+    except Http404:
+        return JsonResponse({'success': False, 'error': 'Article introuvable'}, status=404)
+    try:
+        parent_id = int(data['parent_id']) if data.get('parent_id') else None
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'Commentaire parent invalide'}, status=400)
+    
+    # Écriture groupée par le worker ; le parent est vérifié à ce moment-là
+    jobs.enqueue(
+        'comment.submit',
+        post_id=post.pk,
+        parent_id=parent_id,
+        name=name,
+        email=email,
+        content=content
+    )
+    
+    comment = Comment(post=post, parent_id=parent_id, name=name, email=email, content=content, active=False)
+    if parent_id:
+        html = render_to_string('partials/comment_reply.html', {'reply': comment, 'pending': True}, request)
+    else:
+        html = render_to_string('partials/comment.html', {'comment': comment, 'pending': True}, request)
+    return JsonResponse({'success': True, 'pending': True, 'html': html, 'parent_id': parent_id}, status=202)
 
+@preload.page('blog/blog_category.html')
 def blog_category(request, slug):
     """Articles par catégorie"""
     category = get_object_or_404(Category, slug=slug)
-    posts = BlogPost.objects.filter(status='published', category=category)
+    posts = BlogPost.objects.for_list().filter(status='published', category=category)
     
     # Pagination
-    paginator = Paginator(posts, 6)
+    paginator = Paginator(_post_cards(posts), 6)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -165,15 +379,18 @@ def blog_category(request, slug):
         'category': category,
         'page_obj': page_obj,
     }
+    surrogates.add(request, category)
+    _tag_list(request, page_obj)
     return render(request, 'blog/blog_category.html', context)
 
+@preload.page('blog/blog_tag.html')
 def blog_tag(request, slug):
     """Articles par tag"""
     tag = get_object_or_404(Tag, slug=slug)
-    posts = BlogPost.objects.filter(status='published', tags=tag)
+    posts = BlogPost.objects.for_list().filter(status='published', tags=tag)
     
     # Pagination
-    paginator = Paginator(posts, 6)
+    paginator = Paginator(_post_cards(posts), 6)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -181,9 +398,17 @@ def blog_tag(request, slug):
         'tag': tag,
         'page_obj': page_obj,
     }
+    surrogates.add(request, tag)
+    _tag_list(request, page_obj)
     return render(request, 'blog/blog_tag.html', context)
 
 # Vue Contact
+@never_cache
+def csrf_token(request):
+    """Jeton CSRF demandé par le formulaire de contact au moment de l'envoi"""
+    return JsonResponse({'token': get_token(request)})
+
+@preload.page('contact.html')
 def contact(request):
     """Page de contact"""
     if request.method == 'POST':
@@ -193,14 +418,15 @@ def contact(request):
         message = request.POST.get('message')
         
         if name and email and subject and message:
-            ContactMessage.objects.create(
+            jobs.enqueue(
+                'contact.message',
                 name=name,
                 email=email,
                 subject=subject,
                 message=message
             )
             messages.success(request, 'Votre message a été envoyé avec succès!')
-            return redirect('contact')
+            return redirect('folio:contact')
         else:
             messages.error(request, 'Veuillez remplir tous les champs.')
     
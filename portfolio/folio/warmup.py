@@ -0,0 +1,126 @@
+"""
+Préchauffage d'un processus avant sa première requête (voir gunicorn.conf.py).
+
+- compile tous les templates des dossiers du projet (templates/, jinja2/),
+  gardés ensuite par le loader en cache de Django et l'environnement Jinja ;
+- peuple le résolveur d'URL et résout chaque route du folio ;
+- relève les ressources à précharger des templates de chaque vue ;
+- remplit les caches de données (accueil, barre latérale du blog, facettes) ;
+- rend une fois chaque page publique en lecture seule, pour charger ce qui
+  ne l'est qu'au premier rendu (processeurs de contexte, filtres, etc.).
+
+Avec preload_app, le tout est fait une fois dans le maître et partagé par
+les workers après le fork ; les connexions à la base sont alors fermées
+pour ne pas être héritées.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve, reverse
+from django.urls.converters import IntConverter
+
+logger = logging.getLogger('folio')
+
+TEMPLATE_SUFFIXES = ('.html', '.txt', '.xml')
+# Vues sans effet de bord en GET
+PAGES = ['folio:home', 'folio:about', 'folio:portfolio', 'folio:blog', 'folio:contact']
+
+
+def compile_templates():
+    """Charge chaque template de chaque moteur ; renvoie (compilés, en erreur)"""
+    compiled, failed = 0, 0
+    for backend in engines.all():
+        for directory in backend.dirs:
+            directory = Path(directory)
+            for path in sorted(directory.rglob('*')):
+                if path.suffix not in TEMPLATE_SUFFIXES:
+                    continue
+                name = path.relative_to(directory).as_posix()
+                try:
+                    backend.get_template(name)
+                    compiled += 1
+                except (TemplateDoesNotExist, TemplateSyntaxError) as exc:
+                    failed += 1
+                    logger.warning("Préchauffage : %s (%s) : %s", name, backend.name, exc)
+    return compiled, failed
+
+
+def resolve_urls(namespace='folio'):
+    """Peuple le résolveur et résout chaque route nommée du namespace"""
+    resolver = get_resolver()
+    resolver.reverse_dict  # le premier accès construit les tables
+    urlconf = resolver.namespace_dict[namespace][1]
+    count = 0
+    for pattern in urlconf.url_patterns:
+        if not getattr(pattern, 'name', None):
+            continue
+        kwargs = {
+            name: 1 if isinstance(converter, IntConverter) else 'warmup'
+            for name, converter in pattern.pattern.converters.items()
+        }
+        resolve(reverse(f'{namespace}:{pattern.name}', kwargs=kwargs))
+        count += 1
+    return count
+
+
+def preload_links():
+    from . import preload
+
+    return preload.warm()
+
+
+def prime_caches():
+    from . import caching, facets, views
+
+    caching.get_or_compute('home', views._home_context)
+    caching.get_or_compute('blog:sidebar', views._blog_sidebar)
+    facets.get_index()
+    return 3
+
+
+def render_pages():
+    factory = RequestFactory()
+    count = 0
+    for name in PAGES:
+        path = reverse(name)
+        match = resolve(path)
+        response = match.func(factory.get(path, secure=True), *match.args, **match.kwargs)
+        count += response.status_code == 200
+    return count
+
+
+STEPS = [
+    ('templates', compile_templates),
+    ('urls', resolve_urls),
+    ('preload', preload_links),
+    ('caches', prime_caches),
+    ('pages', render_pages),
+]
+
+
+def run(steps=None):
+    """Exécute les étapes ; renvoie {étape: (résultat, secondes)}"""
+    report = {}
+    for name, func in STEPS:
+        if steps is not None and name not in steps:
+            continue
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception:
+            # Un cache froid vaut mieux qu'un worker qui ne démarre pas
+            logger.exception("Préchauffage : étape %s en échec", name)
+            result = None
+        report[name] = (result, time.perf_counter() - start)
+    connections.close_all()
+    return report
+
+
+def format_report(report):
+    parts = [f"{name} {result} en {seconds * 1000:.0f} ms" for name, (result, seconds) in report.items()]
+    total = sum(seconds for _, seconds in report.values())
+    return f"préchauffage : {', '.join(parts)} (total {total * 1000:.0f} ms)"
@@ -0,0 +1,67 @@
+"""
+Configuration gunicorn du projet, lue automatiquement depuis ce dossier :
+
+    gunicorn portfolio.wsgi
+
+Variables d'environnement :
+- GUNICORN_BIND, GUNICORN_WORKERS, GUNICORN_TIMEOUT ;
+- GUNICORN_WORKER_CLASS (sync) : gthread pour GUNICORN_THREADS (4) threads
+  par worker ; à réserver au code sûr entre threads ;
+- GUNICORN_PRELOAD (1) : l'application est chargée et préchauffée une fois
+  dans le maître, puis partagée par les workers (copy-on-write) ;
+- FOLIO_WARMUP (1) : templates, URL et caches préparés avant la première
+  requête (voir folio/warmup.py) ;
+- FOLIO_GC_FREEZE (1) : avec le préchargement, le ramasse-miettes est
+  suspendu pendant le chargement puis gc.freeze() avant le fork, pour que
+  les workers ne réécrivent pas les pages partagées en les parcourant ;
+  il est réactivé aussitôt après le gel, dans le maître comme dans les
+  workers qu'il lance ensuite.
+"""
+import gc
+import os
+
+
+def env_flag(name, default='1'):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2 * (os.cpu_count() or 1) + 1))
+# gthread : les exports en flux de l'admin ne bloquent pas le worker et le
+# délai d'inactivité ne coupe pas une longue réponse. Avec sync, threads
+# reste à 1 : au-delà, gunicorn passerait de lui-même à gthread
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) if worker_class == 'gthread' else 1
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = env_flag('GUNICORN_PRELOAD')
+
+WARMUP = env_flag('FOLIO_WARMUP')
+GC_FREEZE = preload_app and env_flag('FOLIO_GC_FREEZE')
+
+if GC_FREEZE:
+    # Ce fichier est lu avant le préchargement : les objets créés pendant le
+    # chargement de Django ne seront pas parcourus avant le gel
+    gc.disable()
+
+
+def warm(log):
+    from folio import warmup
+
+    log.info(warmup.format_report(warmup.run()))
+
+
+def when_ready(server):
+    if preload_app and WARMUP:
+        warm(server.log)
+    if GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+        # Objets gelés ignorés par le ramasse-miettes : réactivé sans réécrire les pages partagées
+        gc.enable()
+        server.log.info("gc.freeze() : %d objets partagés", gc.get_freeze_count())
+
+
+def post_worker_init(worker):
+    # Sans préchargement, chaque worker se préchauffe après avoir chargé l'application
+    if not preload_app and WARMUP:
+        warm(worker.log)
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio.settings')
 
 application = get_asgi_application()
+
+if settings.FOLIO_PRELOAD:
+    # 103 Early Hints, si le serveur gère l'extension (voir folio/preload.py)
+    from folio.preload import EarlyHints
+
+    application = EarlyHints(application)
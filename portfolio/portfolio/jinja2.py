@@ -0,0 +1,57 @@
+"""
+Environnement Jinja2 pour les templates publics du portfolio.
+
+Expose les équivalents des tags et filtres Django utilisés par les
+templates portés dans `jinja2/` : url, static, critical_css,
+font_stylesheets, service_worker, linebreaks, truncatewords, date, timesince.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.templatetags.static import static
+from django.template import defaultfilters
+from django.urls import reverse
+from jinja2 import Environment, pass_context
+
+from folio import assets
+
+
+def url(viewname, *args, **kwargs):
+    """Équivalent de {% url %}"""
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def sibling(obj, method_name):
+    """Appelle get_next_by_* / get_previous_by_* sans lever DoesNotExist,
+    comme le fait le moteur Django."""
+    try:
+        return getattr(obj, method_name)()
+    except (ObjectDoesNotExist, AttributeError, ValueError):
+        return None
+
+
+@pass_context
+def critical_css(context, stylesheet='src/output.css'):
+    """Équivalent de {% critical_css %}"""
+    return assets.render_critical_css(context.name, stylesheet)
+
+
+def linebreaks(value):
+    return defaultfilters.linebreaks_filter(value, autoescape=True)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'sibling': sibling,
+        'critical_css': critical_css,
+        'font_stylesheets': assets.render_font_stylesheets,
+        'service_worker': assets.render_service_worker,
+    })
+    env.filters.update({
+        'linebreaks': linebreaks,
+        'truncatewords': defaultfilters.truncatewords,
+        'date': defaultfilters.date,
+        'timesince': defaultfilters.timesince_filter,
+    })
+    return env
@@ -0,0 +1,233 @@
+"""
+Journalisation asynchrone et structurée.
+
+Les loggers déposent les enregistrements dans une file en mémoire
+(QueueHandler) ; un thread QueueListener les écrit, sur la console et en
+JSON lines dans un fichier tourné par taille et par ancienneté, les
+segments tournés étant compressés en gzip. Les messages répétitifs sont
+limités par RateLimitFilter.
+
+Les workers gunicorn écrivent tous dans le même fichier, en ajout. La
+rotation est faite par un seul processus à la fois, sous verrou (fichier
+.lock) : le premier qui la voit due renomme le fichier, les autres
+rouvrent le nouveau à leur écriture suivante (comme WatchedFileHandler).
+Un segment n'est compressé qu'à la rotation suivante : un processus a pu
+y écrire une dernière ligne juste après le renommage.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : un seul processus en développement, pas de verrou
+    fcntl = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Un objet JSON par ligne"""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        if getattr(record, 'suppressed', 0):
+            data['suppressed'] = record.suppressed
+        status = getattr(record, 'status_code', None)
+        if status is not None:
+            data['status'] = status
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Laisse passer au plus `rate` messages identiques par fenêtre de `per` secondes.
+
+    Un message est identifié par son logger, son niveau et son texte ; le
+    nombre de messages écartés est reporté sur le suivant qui passe.
+    """
+
+    def __init__(self, rate=10, per=60.0):
+        super().__init__()
+        self.rate = rate
+        self.per = per
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        # Décision partagée entre les handlers d'un même enregistrement
+        decision = record.__dict__.get('_rate_allowed')
+        if decision is not None:
+            return decision
+        key = (record.name, record.levelno, record.getMessage()[:200])
+        now = time.monotonic()
+        with self.lock:
+            start, count, suppressed = self.windows.get(key, (now, 0, 0))
+            if now - start >= self.per:
+                start, count = now, 0
+            if count >= self.rate:
+                self.windows[key] = (start, count, suppressed + 1)
+                record._rate_allowed = False
+                return False
+            self.windows[key] = (start, count + 1, 0)
+            if len(self.windows) > 10000:
+                self.windows.clear()
+        record.suppressed = suppressed
+        record._rate_allowed = True
+        return True
+
+
+class SharedRotatingFileHandler(WatchedFileHandler):
+    """Fichier partagé entre processus, tourné par taille (max_bytes) et par
+    ancienneté (max_age secondes) ; segments <nom>.1, puis <nom>.2.gz...
+
+    L'ancienneté est celle du fichier .lock, touché à chaque rotation.
+    """
+
+    # Taille et ancienneté vérifiées au plus une fois par intervalle
+    check_interval = 1.0
+
+    def __init__(self, filename, max_bytes=0, max_age=0, backup_count=10, encoding='utf-8'):
+        super().__init__(filename, encoding=encoding)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = max(backup_count, 1)
+        self.lock_path = self.baseFilename + '.lock'
+        self.checked_at = 0.0
+        if not os.path.exists(self.lock_path):
+            open(self.lock_path, 'a').close()
+
+    def emit(self, record):
+        now = time.monotonic()
+        if now - self.checked_at >= self.check_interval:
+            self.checked_at = now
+            if self.due():
+                self.rotate()
+        super().emit(record)
+
+    def due(self):
+        try:
+            size = os.stat(self.baseFilename).st_size
+            rotated_at = os.stat(self.lock_path).st_mtime
+        except FileNotFoundError:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.max_age and size and time.time() - rotated_at >= self.max_age)
+
+    def segment(self, n):
+        return f'{self.baseFilename}.{n}' + ('.gz' if n > 1 else '')
+
+    def rotate(self):
+        with open(self.lock_path, 'a') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Rotation en cours dans un autre processus
+                    return
+            # Déjà faite par un autre processus depuis la vérification ?
+            if not self.due():
+                return
+            # Le plus ancien sort, les autres reculent d'un rang
+            for n in range(self.backup_count - 1, 1, -1):
+                if os.path.exists(self.segment(n)):
+                    os.replace(self.segment(n), self.segment(n + 1))
+            previous = self.segment(1)
+            if os.path.exists(previous):
+                if self.backup_count > 1:
+                    with open(previous, 'rb') as src, gzip.open(self.segment(2), 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                os.remove(previous)
+            os.replace(self.baseFilename, previous)
+            os.utime(self.lock_path)
+        # Nouveau fichier ouvert par ce processus tout de suite, par les autres à leur écriture suivante
+        self.reopenIfNeeded()
+
+
+class AsyncHandler(QueueHandler):
+    """Dépose les enregistrements dans une file bornée vidée par un thread d'écriture.
+
+    La requête ne touche jamais le disque ; si la file est pleine, les
+    enregistrements sont abandonnés et comptés plutôt que de bloquer.
+    """
+
+    def __init__(self, target, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.target = target
+        self.dropped = 0
+        self.listener = None
+        self.start()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            # Le thread d'écriture ne survit pas au fork des workers gunicorn
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.start()
+
+    def start(self):
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+
+    def close(self):
+        # File vidée avant la fermeture du fichier
+        self.stop()
+        super().close()
+
+    def prepare(self, record):
+        # Interpolation et trace calculées ici ; le formatage JSON se fait
+        # dans le thread d'écriture
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.__dict__.pop('request', None)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def async_file_handler(filename, max_bytes=10 * 1024 * 1024, max_age=86400,
+                       backup_count=10, queue_size=10000):
+    """Fabrique utilisable depuis LOGGING ('()': 'portfolio.log.async_file_handler')"""
+    target = SharedRotatingFileHandler(filename, max_bytes=max_bytes, max_age=max_age, backup_count=backup_count)
+    target.setFormatter(JSONFormatter())
+    return AsyncHandler(target, queue_size=queue_size)
+
+
+def async_console_handler(format='{levelname} {message}', queue_size=10000):
+    """Console (stderr) écrite par le thread de la file : la requête n'attend pas le terminal"""
+    target = logging.StreamHandler()
+    target.setFormatter(logging.Formatter(format, style='{'))
+    return AsyncHandler(target, queue_size=queue_size)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config
 import dj_database_url
 
@@ -48,23 +49,42 @@ COMPRESS_ROOT = BASE_DIR / 'static'
 
 COMPRESS_ENABLED = True
 
-STATICFILES_FINDERS = ('compressor.finders.CompressorFinder',)
+STATICFILES_FINDERS = (
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'compressor.finders.CompressorFinder',
+)
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'folio.middleware.CompressionMiddleware',
+    'folio.middleware.PreloadMiddleware',
+    # Surrogate-Key et s-maxage des pages publiques (voir folio/surrogates.py)
+    'folio.middleware.SurrogateKeyMiddleware',
+    # Visiteurs anonymes : session, CSRF, auth et messages sautés (voir folio/middleware.py)
+    'folio.middleware.PublicRequestMiddleware',
+    # Délestage sous surcharge, 503 + Retry-After (voir folio/admission.py)
+    'folio.middleware.AdmissionMiddleware',
+    # Requêtes N+1 signalées (voir folio/nplusone.py)
+    'folio.middleware.NPlusOneMiddleware',
+    'folio.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'folio.middleware.CsrfViewMiddleware',
+    'folio.middleware.AuthenticationMiddleware',
+    'folio.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'folio.middleware.ProfilingMiddleware',
 ]
 
 
 STORAGES = {
-    # ...
+    # Un fichier par contenu, noms avec empreinte (voir folio/blobs.py)
+    "default": {
+        "BACKEND": "folio.blobs.ContentAddressedStorage",
+    },
+    # WhiteNoise, plus le service worker et son précache (voir folio/offline.py)
     "staticfiles": {
-        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+        "BACKEND": "folio.offline.ServiceWorkerStorage",
     },
 }
 
@@ -84,8 +104,29 @@ TEMPLATES = [
             ],
         },
     },
+    # Moteur Jinja2 pour les pages publiques portées dans jinja2/
+    {
+        'NAME': 'jinja2',
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [BASE_DIR / 'jinja2'],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': 'portfolio.jinja2.environment',
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
 ]
 
+# Jinja2 est optionnel : s'il est activé, il passe en premier et les
+# templates non portés retombent sur le moteur Django.
+USE_JINJA2 = config('USE_JINJA2', default=False, cast=bool)
+if USE_JINJA2:
+    TEMPLATES.reverse()
+
 WSGI_APPLICATION = 'portfolio.wsgi.application'
 
 
@@ -167,6 +208,8 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'error',
 }
+# Cookie signé plutôt que la session : pas de session créée pour un message flash
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 
 # Email Configuration (pour les formulaires de contact)
 # En développement, utilisez la console
@@ -182,6 +225,11 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # DEFAULT_FROM_EMAIL = 'Portfolio <votre-email@gmail.com>'
 
 # Logging
+# Console et fichier en JSON lines écrits par un thread dédié
+# (portfolio/log.py) : rotation à 10 Mo ou 24 h par un seul processus à la
+# fois, segments compressés, messages répétés limités. FOLIO_LOG_FILE vide :
+# console seule.
+LOG_FILE = config('FOLIO_LOG_FILE', default=str(BASE_DIR / 'logs' / 'folio.log'))
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -195,35 +243,48 @@ LOGGING = {
             'style': '{',
         },
     },
-    'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs' / 'django.log',
-            'formatter': 'verbose',
+    'filters': {
+        'ratelimit': {
+            '()': 'portfolio.log.RateLimitFilter',
+            'rate': 10,
+            'per': 60,
         },
+    },
+    'handlers': {
         'console': {
             'level': 'INFO',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            '()': 'portfolio.log.async_console_handler',
+            'format': '{levelname} {message}',
+            'filters': ['ratelimit'],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['console'],
             'level': 'INFO',
             'propagate': True,
         },
         'folio': {
-            'handlers': ['file', 'console'],
+            'handlers': ['console'],
             'level': 'INFO',
             'propagate': True,
         },
     },
 }
 
-# Créer le dossier logs s'il n'existe pas
-os.makedirs(BASE_DIR / 'logs', exist_ok=True)
+if LOG_FILE:
+    os.makedirs(os.path.dirname(os.path.abspath(LOG_FILE)), exist_ok=True)
+    LOGGING['handlers']['file'] = {
+        'level': 'INFO',
+        '()': 'portfolio.log.async_file_handler',
+        'filename': LOG_FILE,
+        'max_bytes': 10 * 1024 * 1024,
+        'max_age': 24 * 3600,
+        'backup_count': 10,
+        'filters': ['ratelimit'],
+    }
+    for logger in LOGGING['loggers'].values():
+        logger['handlers'].append('file')
 
 # Configuration de sécurité pour la production
 if not DEBUG:
@@ -255,12 +316,121 @@ if not DEBUG:
 PAGINATION_PER_PAGE = 6
 
 # Cache (pour améliorer les performances en production)
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': 'redis://127.0.0.1:6379/1',
-#     }
-# }
+# Avec REDIS_URL (paquet redis requis) le cache est partagé entre workers ;
+# sans, chaque worker garde son propre cache en mémoire.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Pages et agrégats du folio (voir folio/caching.py), en secondes
+FOLIO_CACHE_TTL = 300
+FOLIO_CACHE_STALE_TTL = 3600
+FOLIO_CACHE_LOCK_TIMEOUT = 30
+FOLIO_FACETS_TTL = 3600  # index des facettes du portfolio (voir folio/facets.py)
+
+# Tâches différées (voir folio/jobs.py) : sans worker `manage.py runworker`,
+# laisser désactivé pour exécuter les tâches directement dans la requête.
+FOLIO_JOBS_ENABLED = config('FOLIO_JOBS_ENABLED', default=False, cast=bool)
+FOLIO_JOBS_RETRY_DELAY = 10  # secondes, doublé à chaque tentative
+FOLIO_JOBS_LEASE = 300  # secondes ; au-delà, une tâche en cours est reprise par un autre worker
+FOLIO_VIEWS_FLUSH_INTERVAL = 60  # secondes entre deux écritures des vues d'articles
+
+# Compression des réponses dynamiques (voir folio/compression.py)
+FOLIO_COMPRESS_MIN_SIZE = 1024  # octets ; en dessous, le gain ne paie pas le CPU
+FOLIO_COMPRESS_LEVELS = {'br': 5, 'zstd': 3, 'gzip': 6}
+FOLIO_COMPRESS_CACHE_TTL = 600  # durée de vie des pages déjà compressées, 0 pour désactiver
+
+# Rétention des commentaires rejetés, des messages lus et des tâches
+# terminées (voir folio/retention.py)
+FOLIO_RETENTION = {
+    'comments': {'days': 30, 'archive': 'table'},
+    'messages': {'days': 365, 'archive': 'jsonl'},
+    'jobs': {'days': 14, 'archive': None},
+}
+FOLIO_ARCHIVE_DIR = BASE_DIR / 'archives'
+
+# Commentaires (voir folio/spam.py) : (nombre, fenêtre en secondes) par IP
+FOLIO_COMMENT_RATE = (5, 60)
+# Mots refusés en plus de spam.BLOCKLIST, selon le sujet des articles
+FOLIO_COMMENT_BLOCKLIST = ['poker', 'betting', 'loan', 'loans', 'forex', 'backlinks']
+# Derrière un proxy : en-tête portant l'IP du client, ex. 'HTTP_X_FORWARDED_FOR'
+FOLIO_CLIENT_IP_HEADER = config('FOLIO_CLIENT_IP_HEADER', default=None)
+
+# Fichiers envoyés (voir folio/media.py) : derrière nginx, 'x-accel' ;
+# derrière Apache ou lighttpd, 'x-sendfile' ; sinon servis par Django
+FOLIO_MEDIA_ACCEL = config('FOLIO_MEDIA_ACCEL', default=None)
+FOLIO_MEDIA_ACCEL_PREFIX = '/protected-media/'  # location interne de nginx
+FOLIO_MEDIA_MAX_AGE = 3600  # fichiers sans empreinte dans le nom
+FOLIO_MEDIA_FLUSH_INTERVAL = 60  # secondes entre deux écritures des compteurs
+
+# Profilage à la demande (voir folio/profiling.py), désactivé par défaut
+FOLIO_PROFILING = config('FOLIO_PROFILING', default=False, cast=bool)
+FOLIO_PROFILE_DIR = BASE_DIR / 'profiles'
+FOLIO_PROFILE_KEEP = 50  # profils conservés, les plus anciens sont supprimés
+
+# Chemin public sans session ni cookie (voir folio/middleware.py) : préfixes
+# toujours traités avec session, CSRF et authentification
+FOLIO_PRIVATE_PATHS = ('/admin/', '/csrf/')
+
+# En-têtes Link: rel=preload et 103 Early Hints en ASGI (voir folio/preload.py)
+FOLIO_PRELOAD = config('FOLIO_PRELOAD', default=True, cast=bool)
+FOLIO_PRELOAD_MAX = 8  # ressources préchargées par page au plus
+
+# Service worker généré par collectstatic (voir folio/offline.py), servi à /sw.js
+FOLIO_SERVICE_WORKER = config('FOLIO_SERVICE_WORKER', default=True, cast=bool)
+FOLIO_PRECACHE_EXCLUDE = ('admin/',)  # préfixes des fichiers statiques jamais précachés
+
+# Contrôle d'admission par worker (voir folio/admission.py). Mécanisme
+# principal : une requête arrivée depuis plus de `timeout` secondes d'après
+# X-Request-Start (posé par nginx) reçoit un 503 sans être traitée ; c'est
+# le seul actif avec le worker sync, qui ne sert qu'une requête à la fois.
+# Avec gthread s'y ajoutent les requêtes simultanées par classe de route et
+# une file bornée par les threads libres (FOLIO_ADMISSION_THREADS - limite :
+# une requête en attente garde son thread).
+FOLIO_ADMISSION_ENABLED = config('FOLIO_ADMISSION_ENABLED', default=True, cast=bool)
+# Threads d'un worker, lus comme dans gunicorn.conf.py
+FOLIO_ADMISSION_THREADS = (
+    config('GUNICORN_THREADS', default=4, cast=int)
+    if config('GUNICORN_WORKER_CLASS', default='sync') == 'gthread' else 1
+)
+FOLIO_ADMISSION = {
+    'search': {'limit': 1, 'max_limit': 2, 'timeout': 0.5, 'target': 0.3},
+    'list': {'limit': 3, 'max_limit': 4, 'timeout': 2.0, 'target': 0.2},
+    'detail': {'limit': 3, 'max_limit': 4, 'timeout': 2.0, 'target': 0.2},
+    'contact': {'limit': 2, 'max_limit': 2, 'timeout': 2.0, 'target': 1.0},
+    'admin': {'limit': 2, 'max_limit': 4, 'timeout': 5.0, 'target': 2.0},
+}
+# Limites communes à tous les workers, via le cache partagé : {classe: places}
+FOLIO_ADMISSION_SHARED = {}
+FOLIO_ADMISSION_RETRY_AFTER = 5  # secondes
+FOLIO_ADMISSION_DEEP_PAGE = 10  # page à partir de laquelle une liste compte comme une recherche
+
+# Pages publiques gardées par le CDN ou le proxy inverse, purgées par clés
+# de substitution à chaque modification (voir folio/surrogates.py)
+FOLIO_SURROGATE_HEADER = 'Surrogate-Key'  # Cache-Tag pour Cloudflare
+FOLIO_SURROGATE_MAX_AGE = 86400  # s-maxage (s)
+FOLIO_SURROGATE_BATCH = 256  # clés par requête de purge
+# Ex. Varnish : {'BACKEND': 'folio.surrogates.HttpPurger',
+#                'OPTIONS': {'url': 'http://varnish/', 'header': 'xkey-purge'}}
+FOLIO_SURROGATE_PURGER = {'BACKEND': 'folio.surrogates.NullPurger'}
+
+# Requêtes N+1 (voir folio/nplusone.py) : off, log, warn ou raise ; raise
+# sous manage.py test, échantillonné en production avec log
+FOLIO_NPLUSONE = config('FOLIO_NPLUSONE', default='raise' if sys.argv[1:2] == ['test'] else 'off')
+FOLIO_NPLUSONE_SAMPLE = config('FOLIO_NPLUSONE_SAMPLE', default=1.0, cast=float)  # part des requêtes surveillées
+FOLIO_NPLUSONE_THRESHOLD = 3  # exécutions d'une même forme à partir desquelles elle est signalée
+FOLIO_NPLUSONE_ALLOW = ()  # expressions cherchées dans la forme ou l'endroit des répétitions tolérées
 
 # Configuration des sessions
 SESSION_COOKIE_AGE = 86400  # 1 jour
@@ -19,12 +19,23 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+from folio import media, offline, profiling
 
 
 
 urlpatterns = [
+    # Profils de requêtes (voir folio/profiling.py), réservés au staff
+    path('admin/profiles/', admin.site.admin_view(profiling.profile_list), name='profile_list'),
+    path('admin/profiles/diff/', admin.site.admin_view(profiling.profile_diff), name='profile_diff'),
+    path('admin/profiles/<str:profile_id>/', admin.site.admin_view(profiling.profile_detail), name='profile_detail'),
+    path('admin/profiles/<str:profile_id>/<str:kind>/', admin.site.admin_view(profiling.profile_download),
+         name='profile_download'),
     path('admin/', admin.site.urls),
      path('', include('folio.urls')),
+     # Service worker à la racine pour contrôler tout le site (voir folio/offline.py)
+     path('sw.js', offline.service_worker, name='service_worker'),
+     # Fichiers envoyés (voir folio/media.py)
+     path(f"{settings.MEDIA_URL.strip('/')}/<path:name>", media.serve, name='media'),
      
 ]
 
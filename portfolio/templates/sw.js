@@ -0,0 +1,130 @@
+// Service worker généré par collectstatic (voir folio/offline.py) : ne pas modifier sw.js directement.
+const MANIFEST = {{ manifest|safe }};
+const PRIVATE_PATHS = {{ private_paths|safe }};
+const FORM_PAGES = {{ form_pages|safe }};
+// Cookies de session et de messages : pages propres au visiteur (voir PublicRequestMiddleware)
+const VISITOR_COOKIES = {{ visitor_cookies|safe }};
+const MAX_PAGES = {{ max_pages }};
+
+const STATIC_CACHE = `static-${MANIFEST.version}`;
+const PAGES_CACHE = `pages-${MANIFEST.version}`;
+// STATIC_URL peut désigner une autre origine (CDN)
+const STATIC_URLS = new Set(MANIFEST.static.map(url => new URL(url, self.location).href));
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        await (await caches.open(STATIC_CACHE)).addAll(MANIFEST.static);
+        const pages = await caches.open(PAGES_CACHE);
+        // Une page en erreur ne doit pas empêcher l'installation
+        await Promise.all(MANIFEST.pages.map(url => fetchPage(new Request(url), pages).catch(() => null)));
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        // Caches d'une version précédente : fichiers et pages ont changé
+        const keep = [STATIC_CACHE, PAGES_CACHE];
+        await Promise.all((await caches.keys()).filter(key => !keep.includes(key)).map(key => caches.delete(key)));
+        await self.clients.claim();
+    })());
+});
+
+function cacheable(response) {
+    // Une navigation ne peut pas recevoir une réponse redirigée depuis le cache
+    if (!response.ok || response.type !== 'basic' || response.redirected) {
+        return false;
+    }
+    const control = response.headers.get('Cache-Control') || '';
+    const vary = response.headers.get('Vary') || '';
+    // Page propre au visiteur (session, messages) : jamais gardée
+    return !/private|no-store/i.test(control) && !/cookie/i.test(vary);
+}
+
+async function trim(cache) {
+    const keys = await cache.keys();
+    await Promise.all(keys.slice(0, Math.max(0, keys.length - MAX_PAGES)).map(key => cache.delete(key)));
+}
+
+async function fetchPage(request, cache) {
+    const response = await fetch(request);
+    if (cacheable(response)) {
+        await cache.delete(request);
+        await cache.put(request, response.clone());
+        await trim(cache);
+    }
+    return response;
+}
+
+async function cacheFirst(request) {
+    const cached = await caches.match(request);
+    if (cached) {
+        return cached;
+    }
+    const response = await fetch(request);
+    if (response.ok) {
+        await (await caches.open(STATIC_CACHE)).put(request, response.clone());
+    }
+    return response;
+}
+
+async function staleWhileRevalidate(event) {
+    const cache = await caches.open(PAGES_CACHE);
+    const cached = await cache.match(event.request);
+    const network = fetchPage(event.request, cache);
+    if (cached) {
+        // Rafraîchie en arrière-plan pour la prochaine visite
+        event.waitUntil(network.catch(() => null));
+        return cached;
+    }
+    return network;
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(PAGES_CACHE);
+    try {
+        return await fetchPage(request, cache);
+    } catch (error) {
+        // Hors ligne : dernière copie publique de la page
+        const cached = await cache.match(request);
+        if (cached) {
+            return cached;
+        }
+        throw error;
+    }
+}
+
+async function hasVisitorCookie() {
+    // Cookie Store API (Chromium) ; ailleurs, seules les pages à formulaire passent par le réseau
+    if (!self.cookieStore) {
+        return false;
+    }
+    const found = await Promise.all(VISITOR_COOKIES.map(name => self.cookieStore.get(name).catch(() => null)));
+    return found.some(Boolean);
+}
+
+async function navigate(event) {
+    // Après un POST redirigé, la copie gardée perdrait le message flash
+    const url = new URL(event.request.url);
+    if (FORM_PAGES.includes(url.pathname) || await hasVisitorCookie()) {
+        return networkFirst(event.request);
+    }
+    return staleWhileRevalidate(event);
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET') {
+        return;
+    }
+    if (STATIC_URLS.has(url.href)) {
+        event.respondWith(cacheFirst(request));
+    } else if (
+        request.mode === 'navigate'
+        && url.origin === self.location.origin
+        && !PRIVATE_PATHS.some(path => url.pathname.startsWith(path))
+    ) {
+        event.respondWith(navigate(event));
+    }
+});